@@ -0,0 +1,173 @@
+"""Times the case manager hot paths on synthetic case trees by driving SliceTrackerCaseManagerLogic (and the case
+catalog of NewCaseSelectionNameWidget) through getNextCaseNumber, importDICOMSeries,
+createLoadableFileListForSeries, loadCaseData, hasCaseBeenCompleted and closeCase. Outside of Slicer the Slicer
+modules are replaced by the stubs in slicerStubs.py. Results are written as JSON and can be compared against a
+baseline:
+
+  python Benchmarks/CaseManagerBenchmark.py --output baseline.json
+  python Benchmarks/CaseManagerBenchmark.py --compare baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import slicerStubs
+
+slicerStubs.install()
+
+from SlicerCaseManager import NewCaseSelectionNameWidget, SliceTrackerCaseManagerLogic
+from SlicerCaseManagerUtils.catalog import CaseCatalog
+from SlicerCaseManagerUtils.helpers import writeJSONAtomically
+
+from syntheticCases import createCases
+
+IMPORT_POLL_INTERVAL = 0.001
+
+
+def getNextCaseNumber(rootDirectory, cold):
+  if cold:
+    try:
+      os.remove(os.path.join(rootDirectory, CaseCatalog.FILE_NAME))
+    except OSError:
+      pass
+  catalog = NewCaseSelectionNameWidget.createCaseCatalog(rootDirectory)
+  catalog.refresh()
+  return catalog.getNextCaseNumber()
+
+
+def waitForImport(logic):
+  """Calls the import timer slot until the import is idle, like the QTimer of the logic does in Slicer."""
+  while not logic.isImportIdle():
+    logic.processImportedBatches()
+    time.sleep(IMPORT_POLL_INTERVAL)
+
+
+def openCase(logic, caseDirectory):
+  logic.resetAndInitializeData()
+  logic.caseDirectory = caseDirectory
+  # there is no DICOM receiver outside of Slicer, so the case is opened like a completed one
+  logic.caseCompleted = True
+  logic.intraopDataDir = os.path.join(caseDirectory, "DICOM", "Intraop")
+  waitForImport(logic)
+
+
+def importDICOMSeries(logic, caseDirectory):
+  """Imports the intraop files of a case without any index or cached header."""
+  logic.caseDirectory = None
+  for name in logic.CASE_INDEX_FILES:
+    path = os.path.join(caseDirectory, name)
+    if os.path.isdir(path):
+      shutil.rmtree(path)
+    elif os.path.exists(path):
+      os.remove(path)
+  logic.metadataCache.clear()
+  openCase(logic, caseDirectory)
+
+
+def createLoadableFileListForSeries(logic):
+  return [logic.createLoadableFileListForSeries(series) for series in logic.seriesList]
+
+
+def loadCaseData(logic, caseDirectory):
+  openCase(logic, caseDirectory)
+  sessions = logic.getSessionEntries(caseDirectory)
+  if sessions:
+    logic.loadFromJSON(os.path.join(sessions[0][0], "MRgBiopsy"))
+
+
+def hasCaseBeenCompleted(logic, caseDirectory):
+  sessions = logic.getSavedSessions(caseDirectory)
+  return logic.hasCaseBeenCompleted(os.path.join(sessions[0], "MRgBiopsy")) if sessions else None
+
+
+def closeCase(logic, caseDirectory):
+  logic.closeCase(caseDirectory)
+
+
+def measure(function, repeat):
+  timings = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function()
+    timings.append(time.perf_counter() - start)
+  timings.sort()
+  return {"min": timings[0], "median": timings[len(timings) // 2], "repeat": repeat}
+
+
+def run(parameters, repeat):
+  rootDirectory = tempfile.mkdtemp(prefix="CaseManagerBenchmark")
+  try:
+    caseDirectories = createCases(rootDirectory, **parameters)
+    caseDirectory = caseDirectories[-1]
+    logic = SliceTrackerCaseManagerLogic()
+    importDICOMSeries(logic, caseDirectory)
+    results = {
+      "getNextCaseNumber.cold": measure(lambda: getNextCaseNumber(rootDirectory, True), repeat),
+      "getNextCaseNumber.warm": measure(lambda: getNextCaseNumber(rootDirectory, False), repeat),
+      "importDICOMSeries": measure(lambda: importDICOMSeries(logic, caseDirectory), repeat),
+      "createLoadableFileListForSeries": measure(lambda: createLoadableFileListForSeries(logic), repeat),
+      "loadCaseData": measure(lambda: loadCaseData(logic, caseDirectory), repeat),
+      "hasCaseBeenCompleted": measure(lambda: hasCaseBeenCompleted(logic, caseDirectory), repeat),
+      "closeCase": measure(lambda: closeCase(logic, caseDirectory), repeat)}
+    logic.resetAndInitializeData()
+    logic.caseDirectory = None
+  finally:
+    shutil.rmtree(rootDirectory)
+  return {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "parameters": parameters,
+          "environment": {"python": platform.python_version(), "platform": platform.platform()},
+          "results": results}
+
+
+def compare(current, baseline, tolerance):
+  """Prints the ratio of current to baseline medians and returns the names of benchmarks slower than the tolerance
+  allows."""
+  if current["parameters"] != baseline["parameters"]:
+    print("Warning: parameters differ from the baseline (%s)" % baseline["parameters"])
+  regressions = []
+  print("%-34s %12s %12s %8s" % ("benchmark", "baseline [s]", "current [s]", "ratio"))
+  for name, result in sorted(current["results"].items()):
+    if name not in baseline["results"]:
+      continue
+    reference = baseline["results"][name]["median"]
+    ratio = result["median"] / reference if reference else float("inf")
+    if ratio > 1 + tolerance:
+      regressions.append(name)
+    print("%-34s %12.6f %12.6f %8.2f%s" % (name, reference, result["median"], ratio,
+                                           " REGRESSION" if name in regressions else ""))
+  return regressions
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--cases", type=int, default=20)
+  parser.add_argument("--preop-series", type=int, default=4)
+  parser.add_argument("--intraop-series", type=int, default=20)
+  parser.add_argument("--slices", type=int, default=30)
+  parser.add_argument("--sessions", type=int, default=5)
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument("--output", help="JSON file to write the results to, e.g. a new baseline")
+  parser.add_argument("--compare", help="baseline JSON file to compare the results against")
+  parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown relative to the baseline")
+  args = parser.parse_args(argv)
+  parameters = {"cases": args.cases, "preopSeries": args.preop_series, "intraopSeries": args.intraop_series,
+                "slices": args.slices, "sessions": args.sessions, "completed": True}
+  current = run(parameters, args.repeat)
+  if args.output:
+    writeJSONAtomically(args.output, current, indent=2)
+  if args.compare:
+    with open(args.compare) as f:
+      return 1 if compare(current, json.load(f), args.tolerance) else 0
+  if not args.output:
+    print(json.dumps(current, indent=2))
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,87 @@
+"""Compares the former per-series directory rescan of createLoadableFileListForSeries with the import of
+SliceTrackerCaseManagerLogic, which fills its SeriesFileIndex while reading the headers, on synthetic DICOM cases.
+Runs without Slicer (see slicerStubs.py):
+
+  python Benchmarks/SeriesIndexBenchmark.py --files 500 2000 --series 5 20 40
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from CaseManagerBenchmark import importDICOMSeries
+from SlicerCaseManager import SliceTrackerCaseManagerLogic
+from SlicerCaseManagerUtils.metadata import HEADERTAGS, DICOMHeaderReader, getSeriesNumberDescription
+
+from syntheticCases import createCase
+
+
+class HeaderReader(object):
+  """Reads headers without any cache, like the former import did through the DICOM database."""
+
+  def __init__(self):
+    self.reader = DICOMHeaderReader()
+    self.reads = 0
+
+  def read(self, path, tags):
+    self.reads += 1
+    return self.reader.read(path, tags)
+
+
+def rescanImport(directory, reader):
+  seriesList = []
+  loadableList = {}
+  for name in sorted(os.listdir(directory)):
+    series = getSeriesNumberDescription(reader.read(os.path.join(directory, name),
+                                                    [HEADERTAGS.SERIES_NUMBER, HEADERTAGS.SERIES_DESCRIPTION]))
+    if series and series not in seriesList:
+      seriesList.append(series)
+      seriesNumber = series.split(":")[0]
+      loadableList[series] = [os.path.join(directory, f) for f in os.listdir(directory)
+                              if reader.read(os.path.join(directory, f),
+                                             [HEADERTAGS.SERIES_NUMBER])[HEADERTAGS.SERIES_NUMBER] == seriesNumber]
+  return loadableList
+
+
+def createLoadableFileLists(logic):
+  return [logic.createLoadableFileListForSeries(series) for series in logic.seriesList]
+
+
+def run(fileCounts, seriesCounts, repeat):
+  print("%8s %8s %14s %12s %14s %12s %12s" % ("files", "series", "rescan reads", "rescan [s]", "import reads",
+                                               "import [s]", "lookup [s]"))
+  logic = SliceTrackerCaseManagerLogic()
+  for fileCount in fileCounts:
+    for seriesCount in seriesCounts:
+      rootDirectory = tempfile.mkdtemp(prefix="SeriesIndexBenchmark")
+      try:
+        caseDirectory = createCase(rootDirectory, 1, preopSeries=0, intraopSeries=seriesCount,
+                                   slices=max(1, fileCount // seriesCount))
+        intraopDirectory = os.path.join(caseDirectory, "DICOM", "Intraop")
+        reader = HeaderReader()
+        rescanImport(intraopDirectory, reader)
+        rescanSeconds = min(timeit.repeat(lambda: rescanImport(intraopDirectory, HeaderReader()), number=1,
+                                          repeat=repeat))
+        importSeconds = min(timeit.repeat(lambda: importDICOMSeries(logic, caseDirectory), number=1, repeat=repeat))
+        importReads = logic.metadataCache.misses
+        lookupSeconds = min(timeit.repeat(lambda: createLoadableFileLists(logic), number=1, repeat=repeat))
+        print("%8d %8d %14d %12.4f %14d %12.4f %12.6f" % (len(os.listdir(intraopDirectory)), seriesCount, reader.reads,
+                                                          rescanSeconds, importReads, importSeconds, lookupSeconds))
+        logic.resetAndInitializeData()
+        logic.caseDirectory = None
+      finally:
+        shutil.rmtree(rootDirectory)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--files", type=int, nargs="+", default=[250, 1000, 2000])
+  parser.add_argument("--series", type=int, nargs="+", default=[5, 20, 40])
+  parser.add_argument("--repeat", type=int, default=3)
+  args = parser.parse_args(argv)
+  run(args.files, args.series, args.repeat)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,176 @@
+"""Minimal stand-ins for the Slicer, Qt, VTK, CTK and SlicerProstate modules, so that SlicerCaseManager.py can be
+imported and its logic driven outside of Slicer, e.g. by the benchmarks. Widgets cannot be instantiated with these
+stubs; only the logic classes are usable. Modules which can be imported for real are left alone.
+
+  import slicerStubs
+  slicerStubs.install()
+  from SlicerCaseManager import SliceTrackerCaseManagerLogic
+"""
+import importlib
+import os
+import sys
+import types
+
+
+class _StubType(type):
+
+  def __getattr__(cls, name):
+    if name.startswith("__"):
+      raise AttributeError(name)
+    return _StubObject()
+
+
+class _StubObject(object, metaclass=_StubType):
+  """Accepts any arguments and attribute access, for the parts of the GUI which are only touched by widgets."""
+
+  def __init__(self, *args, **kwargs):
+    pass
+
+  def __getattr__(self, name):
+    if name.startswith("__"):
+      raise AttributeError(name)
+    return _StubObject()
+
+  def __call__(self, *args, **kwargs):
+    return _StubObject()
+
+  def __bool__(self):
+    return False
+
+
+class _Signal(object):
+
+  def __init__(self):
+    self._slots = []
+
+  def connect(self, slot):
+    self._slots.append(slot)
+
+  def emit(self, *args):
+    for slot in list(self._slots):
+      slot(*args)
+
+
+class QTimer(object):
+  """Never fires on its own; the caller triggers timeout() while isActive(), e.g. to drive the import polling."""
+
+  def __init__(self, *args):
+    self.timeout = _Signal()
+    self.interval = 0
+    self._active = False
+
+  def setInterval(self, interval):
+    self.interval = interval
+
+  def start(self, *args):
+    self._active = True
+
+  def stop(self):
+    self._active = False
+
+  def isActive(self):
+    return self._active
+
+  @staticmethod
+  def singleShot(delay, function):
+    pass
+
+
+class ScriptedLoadableModuleLogic(object):
+
+  def __init__(self, parent=None):
+    self.parent = parent
+
+
+class ModuleLogicMixin(object):
+
+  def invokeEvent(self, event, callData=None):
+    pass
+
+  @staticmethod
+  def getDICOMValue(inputArg, tagName, default=""):
+    return default
+
+  @staticmethod
+  def getFileList(directory):
+    return [f for f in os.listdir(directory) if not f.startswith(".")]
+
+
+class DICOMTAGS(object):
+  PATIENT_NAME = "0010,0010"
+  PATIENT_ID = "0010,0020"
+  PATIENT_BIRTH_DATE = "0010,0030"
+  STUDY_DATE = "0008,0020"
+  SERIES_DESCRIPTION = "0008,103E"
+  SERIES_NUMBER = "0020,0011"
+
+
+class SlicerProstateEvents(object):
+  NewFileIndexedEvent = 50001
+  NewImageDataReceivedEvent = 50002
+  StatusChangedEvent = 50003
+  DICOMReceiverStoppedEvent = 50004
+  IncomingDataReceiveFinishedEvent = 50005
+
+
+def _calldataType(calldataType):
+  return lambda function: function
+
+
+class _StubModule(types.ModuleType):
+
+  def __init__(self, name, **attributes):
+    types.ModuleType.__init__(self, name)
+    self.__dict__.update(attributes)
+    self.__all__ = list(attributes)
+    self._classes = {}
+
+  def __getattr__(self, name):
+    if name.startswith("__"):
+      raise AttributeError(name)
+    if name not in self._classes:
+      self._classes[name] = _StubType(name, (_StubObject,), {})
+    return self._classes[name]
+
+
+def _createModules():
+  scriptedLoadableModule = _StubModule("slicer.ScriptedLoadableModule",
+                                       ScriptedLoadableModule=_StubType("ScriptedLoadableModule", (_StubObject,), {}),
+                                       ScriptedLoadableModuleWidget=_StubType("ScriptedLoadableModuleWidget",
+                                                                              (_StubObject,), {}),
+                                       ScriptedLoadableModuleLogic=ScriptedLoadableModuleLogic,
+                                       ScriptedLoadableModuleTest=_StubType("ScriptedLoadableModuleTest",
+                                                                            (_StubObject,), {}))
+  mixins = _StubModule("SlicerProstateUtils.mixins", ModuleLogicMixin=ModuleLogicMixin,
+                       ModuleWidgetMixin=_StubType("ModuleWidgetMixin", (object,), {}))
+  return {
+    "slicer": _StubModule("slicer", ScriptedLoadableModule=scriptedLoadableModule),
+    "slicer.ScriptedLoadableModule": scriptedLoadableModule,
+    "qt": _StubModule("qt", QTimer=QTimer),
+    "vtk": _StubModule("vtk", calldata_type=_calldataType, VTK_STRING=13),
+    "ctk": _StubModule("ctk"),
+    "numpy": _StubModule("numpy"),
+    "SlicerProstateUtils": _StubModule("SlicerProstateUtils"),
+    "SlicerProstateUtils.helpers": _StubModule("SlicerProstateUtils.helpers"),
+    "SlicerProstateUtils.mixins": mixins,
+    "SlicerProstateUtils.constants": _StubModule("SlicerProstateUtils.constants", DICOMTAGS=DICOMTAGS),
+    "SlicerProstateUtils.events": _StubModule("SlicerProstateUtils.events",
+                                              SlicerProstateEvents=SlicerProstateEvents)}
+
+
+def install():
+  """Registers the stand-ins for all modules which cannot be imported. Returns the names of the stubbed modules."""
+  installed = []
+  modules = _createModules()
+  for name in sorted(modules):
+    if name in sys.modules:
+      continue
+    if name.split(".")[0] not in installed:
+      try:
+        importlib.import_module(name)
+        continue
+      except ImportError:
+        pass
+    sys.modules[name] = modules[name]
+    installed.append(name)
+  return installed
@@ -0,0 +1,94 @@
+"""Generates synthetic case trees in the CaseNNN-YYYYMMDD layout with small but valid DICOM Part-10 files:
+
+  python Benchmarks/syntheticCases.py /tmp/cases --cases 3 --preop-series 4 --intraop-series 20 --slices 30 --sessions 5
+"""
+import argparse
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Testing", "Python"))
+
+from SlicerCaseManagerUtils.metadata import HEADERTAGS
+from SlicerCaseManagerUtils.sessions import SessionIndex, SessionStore
+
+from syntheticDICOM import UID_ROOT, writeDICOMFile
+
+PREOP_DESCRIPTIONS = ("T2 AX", "T2 SAG", "ADC", "DWI b1400", "DCE")
+INTRAOP_DESCRIPTIONS = ("COVER PROSTATE", "COVER TEMPLATE", "GUIDANCE")
+
+
+def writeSeries(directory, patient, study, seriesNumber, description, slices, pixelBytes, prefix):
+  seriesUID = "%s.%d" % (study["uid"], seriesNumber)
+  for index in range(slices):
+    values = dict(patient)
+    values.update({HEADERTAGS.STUDY_INSTANCE_UID: study["uid"], HEADERTAGS.STUDY_DATE: study["date"],
+                   HEADERTAGS.STUDY_TIME: study["time"], HEADERTAGS.MODALITY: "MR",
+                   HEADERTAGS.SERIES_INSTANCE_UID: seriesUID, HEADERTAGS.SERIES_NUMBER: str(seriesNumber),
+                   HEADERTAGS.SERIES_DESCRIPTION: description,
+                   HEADERTAGS.SOP_INSTANCE_UID: "%s.%d" % (seriesUID, index + 1)})
+    writeDICOMFile(os.path.join(directory, "%s-%03d-%04d.dcm" % (prefix, seriesNumber, index + 1)), values,
+                   pixelBytes)
+
+
+def writeSessions(caseDirectory, sessions, registrations, completed):
+  outputDirectory = os.path.join(caseDirectory, "SliceTrackerOutputs")
+  index = SessionIndex(outputDirectory)
+  for sessionNumber in range(sessions):
+    sessionDirectory = os.path.join(outputDirectory, "2017-01-01_%02d-00-00" % sessionNumber)
+    store = SessionStore(os.path.join(sessionDirectory, "MRgBiopsy"),
+                         onHeaderWritten=lambda store, header, sessionDirectory=sessionDirectory:
+                         index.update(sessionDirectory, header))
+    for registration in range(registrations):
+      store.append(SessionIndex.REGISTRATION_RECORD_TYPE, {"name": "%d: COVER PROSTATE" % (registration + 1),
+                                                           "status": "approved"}, key=registration)
+    if completed and sessionNumber == sessions - 1:
+      store.setCompleted()
+
+
+def createCase(rootDirectory, caseNumber, preopSeries=4, intraopSeries=10, slices=20, sessions=0, registrations=3,
+               completed=False, pixelBytes=512, date=None):
+  date = date or datetime.date(2017, 1, 1) + datetime.timedelta(days=caseNumber)
+  caseDirectory = os.path.join(rootDirectory, "Case%03d-%s" % (caseNumber, date.strftime("%Y%m%d")))
+  patient = {HEADERTAGS.PATIENT_NAME: "Synthetic^%03d" % caseNumber, HEADERTAGS.PATIENT_ID: "SYN%05d" % caseNumber,
+             HEADERTAGS.PATIENT_BIRTH_DATE: "19500101"}
+  for phase, seriesCount, descriptions in (("Preop", preopSeries, PREOP_DESCRIPTIONS),
+                                           ("Intraop", intraopSeries, INTRAOP_DESCRIPTIONS)):
+    directory = os.path.join(caseDirectory, "DICOM", phase)
+    os.makedirs(directory)
+    study = {"uid": "%s.%d.%d" % (UID_ROOT, caseNumber, phase == "Intraop"), "date": date.strftime("%Y%m%d"),
+             "time": "090000" if phase == "Preop" else "130000"}
+    for seriesNumber in range(1, seriesCount + 1):
+      writeSeries(directory, patient, study, seriesNumber, descriptions[(seriesNumber - 1) % len(descriptions)],
+                  slices, pixelBytes, phase)
+  if sessions:
+    writeSessions(caseDirectory, sessions, registrations, completed)
+  return caseDirectory
+
+
+def createCases(rootDirectory, cases, **kwargs):
+  if not os.path.exists(rootDirectory):
+    os.makedirs(rootDirectory)
+  return [createCase(rootDirectory, caseNumber, **kwargs) for caseNumber in range(1, cases + 1)]
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("rootDirectory")
+  parser.add_argument("--cases", type=int, default=3)
+  parser.add_argument("--preop-series", type=int, default=4)
+  parser.add_argument("--intraop-series", type=int, default=10)
+  parser.add_argument("--slices", type=int, default=20)
+  parser.add_argument("--sessions", type=int, default=0)
+  parser.add_argument("--registrations", type=int, default=3)
+  parser.add_argument("--completed", action="store_true")
+  args = parser.parse_args(argv)
+  for caseDirectory in createCases(args.rootDirectory, args.cases, preopSeries=args.preop_series,
+                                   intraopSeries=args.intraop_series, slices=args.slices, sessions=args.sessions,
+                                   registrations=args.registrations, completed=args.completed):
+    print(caseDirectory)
+
+
+if __name__ == "__main__":
+  main()
@@ -1,6 +1,6 @@
 import os
-import csv, re, numpy, json, ast, re
-import shutil, datetime, logging
+import csv, re, numpy, ast, re
+import shutil, datetime, logging, time
 import ctk, vtk, qt, slicer
 from collections import OrderedDict
 
@@ -12,6 +12,27 @@ from SlicerProstateUtils.mixins import ModuleWidgetMixin, ModuleLogicMixin, Para
 from SlicerProstateUtils.constants import DICOMTAGS, COLOR, STYLE, FileExtension
 from SlicerProstateUtils.events import SlicerProstateEvents
 
+from SlicerCaseManagerUtils.archive import CaseArchive, CaseArchiver
+from SlicerCaseManagerUtils.catalog import CASE_NUMBER_DIGITS, CASE_PREFIX, CASE_SUFFIX_PATTERN, CaseCatalog, \
+  formatCaseName
+from SlicerCaseManagerUtils.database import CaseDICOMDatabase
+from SlicerCaseManagerUtils.events import EventChannel, FileIndexed, ImageDataReceived, StatusChanged
+from SlicerCaseManagerUtils.helpers import directoryContainsData, directoryHasEntries
+from SlicerCaseManagerUtils.instances import InstanceIndex
+from SlicerCaseManagerUtils.instrumentation import Instrumentation, Stopwatch, getSharedInstrumentation
+from SlicerCaseManagerUtils.layout import CaseLayout
+from SlicerCaseManagerUtils.manifest import CaseManifest
+from SlicerCaseManagerUtils.metadata import DICOMHeaderError, getSeriesNumberDescription, getSharedMetadataCache, \
+  readHeaderWithPydicom
+from SlicerCaseManagerUtils.pipeline import HeaderParsingPipeline, RateLimiter, ReceivePipeline
+from SlicerCaseManagerUtils.preprocessing import CONVERSION_SCRIPT, REQUIRED_PREOP_SERIES_PATTERN, PreopPreprocessor
+from SlicerCaseManagerUtils.series import SeriesFileIndex, SeriesRegistry
+from SlicerCaseManagerUtils.sessions import SessionIndex, SessionStore
+from SlicerCaseManagerUtils.storage import CaseSizeAccount
+from SlicerCaseManagerUtils.summary import CaseSummaryLoader
+from SlicerCaseManagerUtils.watcher import DirectoryWatcher
+from SlicerCaseManagerUtils.volumes import VolumeCache, VolumePrefetcher
+
 class SlicerCaseManager(ScriptedLoadableModule):
   def __init__(self, parent):
     ScriptedLoadableModule.__init__(self, parent)
@@ -26,6 +47,12 @@ class SlicerCaseManager(ScriptedLoadableModule):
                                         R01 CA111288 and P41 EB015898. The code is originated from the module SliceTracker"""
 
 class SlicerCaseManagerWidget(ModuleWidgetMixin, ScriptedLoadableModuleWidget):
+
+  REQUIRED_PREOP_SERIES_PATTERN = REQUIRED_PREOP_SERIES_PATTERN
+  PREPROCESSING_POLL_INTERVAL = 200
+  ARCHIVE_POLL_INTERVAL = 1000
+  CASE_LAYOUT = CaseLayout(directories=["DICOM/Preop"])
+
   @property
   def caseRootDir(self):
     return self.casesRootDirectoryButton.directory
@@ -41,15 +68,27 @@ class SlicerCaseManagerWidget(ModuleWidgetMixin, ScriptedLoadableModuleWidget):
     self.casesRootDirectoryButton.toolTip = path
     self.openCaseButton.enabled = exists
     self.createNewCaseButton.enabled = exists
+
+  @property
+  def caseCatalog(self):
+    rootDirectory = self.caseRootDir
+    if not rootDirectory or not os.path.exists(rootDirectory):
+      self._caseCatalog = None
+    elif not self._caseCatalog or self._caseCatalog.rootDirectory != rootDirectory:
+      self._caseCatalog = NewCaseSelectionNameWidget.createCaseCatalog(rootDirectory)
+    return self._caseCatalog
   
   @property
   def caseDirectoryList(self):
-    return self._caseDirectoryList
+    """Deprecated: the directories of CASE_LAYOUT. Assigning a list replaces the directories of the layout used by
+    this widget; declare CASE_LAYOUT in subclasses instead."""
+    return set(self.CASE_LAYOUT.directories)
 
   @caseDirectoryList.setter
-  def caseDirectoryList(self,list):
-    self._caseDirectoryList = list      
-  
+  def caseDirectoryList(self, directories):
+    logging.warning("%s.caseDirectoryList is deprecated, declare CASE_LAYOUT instead" % self.__class__.__name__)
+    self.CASE_LAYOUT = self.CASE_LAYOUT.withDirectories(directories)
+
   @property
   def preopDataDir(self):
     return self._preopDataDir
@@ -100,9 +139,14 @@ class SlicerCaseManagerWidget(ModuleWidgetMixin, ScriptedLoadableModuleWidget):
 
   @currentCaseDirectory.setter
   def currentCaseDirectory(self, path):
+    previousCaseDirectory = self._currentCaseDirectory
     self._currentCaseDirectory = path
+    self.logic.caseDirectory = path
+    if previousCaseDirectory and previousCaseDirectory != path and self.logic.isCaseUnpacked(previousCaseDirectory):
+      self.archiveCase(previousCaseDirectory)
     valid = path is not None
     self.closeCaseButton.enabled = valid
+    self.addToDICOMDatabaseButton.enabled = valid
     if not valid:
       self.caseWatchBox.reset()
 
@@ -116,6 +160,7 @@ class SlicerCaseManagerWidget(ModuleWidgetMixin, ScriptedLoadableModuleWidget):
       self.logic.createDirectory(path)
     exists = os.path.exists(path)
     self._generatedOutputDirectory = path if exists else ""
+    self.logic.recordCaseDirectory(self._generatedOutputDirectory)
     self.completeCaseButton.enabled = exists and not self.logic.caseCompleted
 
   def __init__(self, parent=None):
@@ -123,8 +168,20 @@ class SlicerCaseManagerWidget(ModuleWidgetMixin, ScriptedLoadableModuleWidget):
     self.logic = SlicerCaseManagerLogic()
     self.modulePath = os.path.dirname(slicer.util.modulePath(self.moduleName))
     self._currentCaseDirectory = None
-    self._caseDirectoryList = {}
-    self.caseDirectoryList = {"DICOM/Preop"}
+    self._generatedOutputDirectory = ""
+    self._caseCatalog = None
+    self.lazyLoading = True
+    self.prefetchMostRecentSeries = True
+    self.caseOpenTimer = Stopwatch()
+    self.timeToInteractiveCase = None
+    self.preopPreprocessor = None
+    self.preopDataContinued = False
+    self.preprocessingTimer = qt.QTimer()
+    self.preprocessingTimer.setInterval(self.PREPROCESSING_POLL_INTERVAL)
+    self.preprocessingTimer.timeout.connect(self.onPreprocessingTimeout)
+    self.archiveTimer = qt.QTimer()
+    self.archiveTimer.setInterval(self.ARCHIVE_POLL_INTERVAL)
+    self.archiveTimer.timeout.connect(self.onArchiveTimeout)
 
   def setup(self):
     ScriptedLoadableModuleWidget.setup(self)
@@ -143,6 +200,8 @@ class SlicerCaseManagerWidget(ModuleWidgetMixin, ScriptedLoadableModuleWidget):
     self.createPatientWatchBox()
     #self.createIntraopWatchBox()
     self.createCaseInformationArea()
+    self.createCaseBrowserArea()
+    self.createPerformanceArea()
     self.setupConnections()
     self.layout.addWidget(self.mainGUIGroupBox)
 
@@ -157,6 +216,7 @@ class SlicerCaseManagerWidget(ModuleWidgetMixin, ScriptedLoadableModuleWidget):
       finalDirectory = self.patientWatchBox.getInformation("PatientID") + "-biopsy-" + \
                        str(qt.QDate().currentDate()) + "-" + qt.QTime().currentTime().toString().replace(":", "")
       self.generatedOutputDirectory = os.path.join(self.outputDir, finalDirectory, "MRgBiopsy")
+      self.logic.invalidateSessionIndex(self.currentCaseDirectory)
     else:
       self.generatedOutputDirectory = ""
 
@@ -165,14 +225,14 @@ class SlicerCaseManagerWidget(ModuleWidgetMixin, ScriptedLoadableModuleWidget):
                                        WatchBoxAttribute('PatientName', 'Patient Name: ', DICOMTAGS.PATIENT_NAME),
                                        WatchBoxAttribute('DOB', 'Date of Birth: ', DICOMTAGS.PATIENT_BIRTH_DATE),
                                        WatchBoxAttribute('StudyDate', 'Preop Study Date: ', DICOMTAGS.STUDY_DATE)]
-    self.patientWatchBox = DICOMBasedInformationWatchBox(self.patientWatchBoxInformation)
+    self.patientWatchBox = CachedDICOMInformationWatchBox(self.patientWatchBoxInformation)
     self.layout.addWidget(self.patientWatchBox)
   
   def createIntraopWatchBox(self):
     intraopWatchBoxInformation = [WatchBoxAttribute('StudyDate', 'Intraop Study Date: ', DICOMTAGS.STUDY_DATE),
                                   WatchBoxAttribute('CurrentSeries', 'Current Series: ', [DICOMTAGS.SERIES_NUMBER,
                                                                                           DICOMTAGS.SERIES_DESCRIPTION])]
-    self.intraopWatchBox = DICOMBasedInformationWatchBox(intraopWatchBoxInformation)
+    self.intraopWatchBox = CachedDICOMInformationWatchBox(intraopWatchBoxInformation)
     self.registrationDetailsButton = self.createButton("", styleSheet="border:none;",
                                                        maximumWidth=16)
     self.layout.addWidget(self.intraopWatchBox)
@@ -189,8 +249,39 @@ class SlicerCaseManagerWidget(ModuleWidgetMixin, ScriptedLoadableModuleWidget):
     self.directoryConfigurationLayout.addWidget(qt.QLabel("Cases Root Directory"), 1, 0, 1, 1)
     self.directoryConfigurationLayout.addWidget(self.casesRootDirectoryButton, 1, 1, 1, 1)
     self.directoryConfigurationLayout.addWidget(self.caseWatchBox, 2, 0, 1, qt.QSizePolicy.ExpandFlag)
+    self.addToDICOMDatabaseButton = self.createButton("Add case to DICOM database", enabled=False,
+                                                      toolTip="Make the DICOM files of the current case available "
+                                                              "in the DICOM browser")
+    self.directoryConfigurationLayout.addWidget(self.addToDICOMDatabaseButton, 3, 0, 1, 2)
     self.layout.addWidget(self.collapsibleDirectoryConfigurationArea)
 
+  def createCaseBrowserArea(self):
+    self.collapsibleCaseBrowserArea = ctk.ctkCollapsibleButton()
+    self.collapsibleCaseBrowserArea.collapsed = True
+    self.collapsibleCaseBrowserArea.text = "Case Browser"
+    self.caseBrowser = CaseBrowserWidget(completionResolver=self.getCaseCompletedState)
+    self.caseBrowserLayout = qt.QGridLayout(self.collapsibleCaseBrowserArea)
+    self.caseBrowserLayout.addWidget(self.caseBrowser, 0, 0)
+    self.layout.addWidget(self.collapsibleCaseBrowserArea)
+
+  def createPerformanceArea(self):
+    self.collapsiblePerformanceArea = ctk.ctkCollapsibleButton()
+    self.collapsiblePerformanceArea.collapsed = True
+    self.collapsiblePerformanceArea.text = "Performance"
+    self.performancePanel = PerformancePanelWidget(self.logic.instrumentation,
+                                                   memoryUsageResolver=self.getVolumeMemoryUsage)
+    self.performancePanel.enabledCheckBox.checked = self.getSetting('InstrumentationEnabled') == "True"
+    self.performanceLayout = qt.QGridLayout(self.collapsiblePerformanceArea)
+    self.performanceLayout.addWidget(self.performancePanel, 0, 0)
+    self.layout.addWidget(self.collapsiblePerformanceArea)
+
+  def getCaseCompletedState(self, caseDirectory):
+    return None
+
+  def getVolumeMemoryUsage(self):
+    """Returns (resident size, memory budget) in bytes of the volumes kept in memory, or None if not tracked."""
+    return None
+
   def createCaseWatchBox(self):
     watchBoxInformation = [WatchBoxAttribute('CurrentCaseDirectory', 'Directory')]
     self.caseWatchBox = BasicInformationWatchBox(watchBoxInformation, title="Current Case")
@@ -203,31 +294,62 @@ class SlicerCaseManagerWidget(ModuleWidgetMixin, ScriptedLoadableModuleWidget):
                                                                            self.casesRootDirectoryButton.directory))
     self.completeCaseButton.clicked.connect(self.onCompleteCaseButtonClicked)
     self.closeCaseButton.clicked.connect(self.clearData)
+    self.addToDICOMDatabaseButton.clicked.connect(self.onAddToDICOMDatabaseButtonClicked)
+    self.collapsibleCaseBrowserArea.contentsCollapsed.connect(self.onCaseBrowserCollapsed)
+    self.caseBrowser.table.cellDoubleClicked.connect(self.onCaseBrowserCellDoubleClicked)
+    self.collapsiblePerformanceArea.contentsCollapsed.connect(self.performancePanel.setPaused)
+    self.performancePanel.enabledCheckBox.toggled.connect(lambda enabled: self.setSetting('InstrumentationEnabled',
+                                                                                          str(enabled)))
+
+  def onAddToDICOMDatabaseButtonClicked(self):
+    slicer.util.showStatusMessage("Adding %s to the DICOM database" % os.path.basename(self.currentCaseDirectory))
+    self.logic.addCaseToDICOMDatabase()
+    slicer.util.showStatusMessage("Added %s to the DICOM database" % os.path.basename(self.currentCaseDirectory),
+                                  5000)
+
+  def onCaseBrowserCollapsed(self, collapsed):
+    if not collapsed:
+      self.caseBrowser.catalog = self.caseCatalog
+
+  def onCaseBrowserCellDoubleClicked(self, row, column):
+    if not self.checkAndWarnUserIfCaseInProgress():
+      return
+    self.openCase(self.caseCatalog.getCaseDirectory(self.caseBrowser.table.item(row, 0).text()))
 
   def onCreateNewCaseButtonClicked(self):
     if not self.checkAndWarnUserIfCaseInProgress():
       return
     self.clearData()
-    self.caseDialog = NewCaseSelectionNameWidget(self.caseRootDir)
+    self.caseDialog = NewCaseSelectionNameWidget(self.caseRootDir, catalog=self.caseCatalog)
     selectedButton = self.caseDialog.exec_()
     if selectedButton == qt.QMessageBox.Ok:
-      newCaseDirectory = self.caseDialog.newCaseDirectory
-      os.mkdir(newCaseDirectory)
-      for direcory in self.caseDirectoryList:
-        subDirectory = direcory.split("/")
-        for iIndex in range(len(subDirectory)+1):
-          fullPath = ""
-          for jIndex in range(iIndex):
-            fullPath = os.path.join(fullPath,subDirectory[jIndex])
-          if not os.path.exists(os.path.join(newCaseDirectory,fullPath)): 
-            os.mkdir(os.path.join(newCaseDirectory,fullPath))      
+      newCaseDirectory = self.CASE_LAYOUT.materialize(self.caseDialog.newCaseDirectory)
+      self.caseCatalog.add(os.path.basename(newCaseDirectory))
       self.currentCaseDirectory = newCaseDirectory      
       self.startPreopDICOMReceiver()
   
   def onCompleteCaseButtonClicked(self):
     self.logic.caseCompleted = True
+    if self.caseCatalog and self.currentCaseDirectory:
+      self.caseCatalog.setCompleted(os.path.basename(self.currentCaseDirectory))
     self.save(showDialog=True)
+    caseDirectory = self.currentCaseDirectory
     self.clearData()
+    if self.getSetting('ArchiveCompletedCases') == "True" and caseDirectory and os.path.exists(caseDirectory):
+      self.archiveCase(caseDirectory)
+
+  def archiveCase(self, caseDirectory):
+    self.logic.archiveCase(caseDirectory)
+    self.archiveTimer.start()
+
+  def onArchiveTimeout(self):
+    for caseDirectory, error in self.logic.caseArchiver.poll():
+      if error:
+        slicer.util.showStatusMessage("Archiving %s failed: %s" % (os.path.basename(caseDirectory), error), 10000)
+      else:
+        slicer.util.showStatusMessage("Archived %s" % os.path.basename(caseDirectory), 5000)
+    if self.logic.caseArchiver.idle:
+      self.archiveTimer.stop()
   
   def onOpenCaseButtonClicked(self):
     if not self.checkAndWarnUserIfCaseInProgress():
@@ -235,13 +357,51 @@ class SlicerCaseManagerWidget(ModuleWidgetMixin, ScriptedLoadableModuleWidget):
     path = qt.QFileDialog.getExistingDirectory(self.parent.window(), "Select Case Directory", self.caseRootDir)
     if not path:
       return
+    self.openCase(path)
+
+  def openCase(self, path):
+    if not self.logic.waitForCaseArchiving(path):
+      slicer.util.warningDisplay("The selected case is still being archived. Please try again later.", windowTitle="")
+      return
+    self.caseOpenTimer.start()
+    if self.logic.isCaseArchived(path):
+      slicer.util.showStatusMessage("Unpacking archived case %s" % os.path.basename(path))
+      self.logic.unpackCase(path)
     self.currentCaseDirectory = path
     if not os.path.exists(os.path.join(path, "DICOM", "Preop")):
       slicer.util.warningDisplay("The selected case directory seems not to be valid", windowTitle="")
       self.clearData()
     else:
-      slicer.util.loadVolume(self.preopImagePath, returnNode=True)
+      if not self.lazyLoading:
+        self.loadPreopVolume()
       self.loadCaseData()
+      self.notifyWhenCaseInteractive()
+
+  def loadPreopVolume(self):
+    with self.logic.instrumentation.span("preopVolumeLoading"):
+      success, volume = slicer.util.loadVolume(self.preopImagePath, returnNode=True)
+    return volume if success else None
+
+  def runExcludedFromCaseOpenTime(self, function, *args, **kwargs):
+    """Runs a modal dialog while a case is being opened without counting the time the user takes to answer it."""
+    return self.caseOpenTimer.runExcluded(function, *args, **kwargs)
+
+  def notifyWhenCaseInteractive(self):
+    if self.preopPreprocessor and self.preopPreprocessor.running and not self.preopDataContinued:
+      # onPreprocessingTimeout calls this again once the first required preop series is ready
+      return
+    self.logic.callWhenImportIdle(self.onCaseInteractive)
+
+  def onCaseInteractive(self):
+    if not self.caseOpenTimer.running:
+      return
+    self.timeToInteractiveCase = self.caseOpenTimer.stop()
+    self.logic.instrumentation.record("timeToInteractive", self.timeToInteractiveCase,
+                                      case=os.path.basename(self.currentCaseDirectory or ""))
+    logging.info("Case %s ready after %.2f s" % (self.currentCaseDirectory, self.timeToInteractiveCase))
+    slicer.util.showStatusMessage("Case ready after %.2f s" % self.timeToInteractiveCase, 5000)
+    if self.prefetchMostRecentSeries:
+      self.logic.prefetchMostRecentSeries()
 
   def checkAndWarnUserIfCaseInProgress(self):
     proceed = True
@@ -278,17 +438,74 @@ class SlicerCaseManagerWidget(ModuleWidgetMixin, ScriptedLoadableModuleWidget):
 
   def startPreProcessingPreopData(self, caller=None, event=None):
     self.cleanupPreopDICOMReceiver()
-    pass
+    self.logic.recordCaseDirectory(self.preopDICOMDataDirectory)
+    files = [os.path.join(path, name) for path, _, names in os.walk(self.preopDICOMDataDirectory)
+             for name in names if name != ".DS_Store"]
+    self.cancelPreProcessing()
+    self.preopPreprocessor = self.logic.createPreopPreprocessor(self.mpReviewPreprocessedOutput)
+    self.preopPreprocessor.start(files, self.REQUIRED_PREOP_SERIES_PATTERN)
+    self.preopDataContinued = False
+    self.preprocessingTimer.start()
+
+  def cancelPreProcessing(self):
+    self.preprocessingTimer.stop()
+    if self.preopPreprocessor:
+      self.preopPreprocessor.cancel()
+      self.preopPreprocessor = None
+
+  def onPreprocessingTimeout(self):
+    if not self.preopPreprocessor:
+      self.preprocessingTimer.stop()
+      return
+    if self.preopPreprocessor.poll():
+      slicer.util.showStatusMessage("Preprocessing preop data: %d of %d series done"
+                                    % (self.preopPreprocessor.done, self.preopPreprocessor.total))
+    if not self.preopDataContinued and self.preopPreprocessor.isFirstRequiredSeriesReady():
+      self.preopDataContinued = True
+      self.continueWithPreprocessedPreopData(self.preopPreprocessor.getFirstReadyStudyDirectory())
+      self.notifyWhenCaseInteractive()
+    if not self.preopPreprocessor.running:
+      self.preprocessingTimer.stop()
+      self.logic.recordCaseDirectory(self.mpReviewPreprocessedOutput)
+      if not self.preopDataContinued:
+        self.caseOpenTimer.cancel()
+        slicer.util.warningDisplay("Preprocessing of the preop data failed.", windowTitle="")
+
+  def continueWithPreprocessedPreopData(self, studyDirectory):
+    self.preopDataDir = studyDirectory
 
 
   def loadCaseData(self):
 
     pass
+
+  def getSessionData(self):
+    return self.logic.getSessionData()
+
+  def save(self, showDialog=False, changedItems=None):
+    if not self.generatedOutputDirectory:
+      return False
+    self.logic.saveSessionData(self.generatedOutputDirectory, self.getSessionData(), changedItems)
+    self.logic.recordCaseDirectory(self.generatedOutputDirectory)
+    if showDialog:
+      slicer.util.infoDisplay("Results have been saved to %s" % self.generatedOutputDirectory, windowTitle="")
+    return True
   
   def clearData(self):
-    pass
+    self.cancelPreProcessing()
+    if self.generatedOutputDirectory:
+      self.logic.recordCaseDirectory(self.generatedOutputDirectory)
+      self._generatedOutputDirectory = ""
+    self.caseOpenTimer.cancel()
+
+class SlicerCaseManagerLogic(ModuleLogicMixin, ScriptedLoadableModuleLogic):
+
+  PROGRESS_EVENT_INTERVAL = 0.1
+  ARCHIVE_WAIT_TIMEOUT = 30.0
 
-class SlicerCaseManagerLogic(ScriptedLoadableModuleLogic):
+  LAZY_ARCHIVE_DIRECTORIES = ()
+  CASE_INDEX_FILES = {CaseManifest.FILE_NAME, CaseSizeAccount.FILE_NAME, InstanceIndex.FILE_NAME,
+                      Instrumentation.TRACE_DIRECTORY_NAME} | CaseDICOMDatabase.FILE_NAMES
   
   @property
   def caseCompleted(self):
@@ -299,11 +516,66 @@ class SlicerCaseManagerLogic(ScriptedLoadableModuleLogic):
     self._caseCompleted = value
     if value is True:
       self.stopSmartDICOMReceiver()
+
+  @property
+  def caseDirectory(self):
+    return self._caseDirectory
+
+  @caseDirectory.setter
+  def caseDirectory(self, path):
+    self._caseDirectory = path
+    valid = path and os.path.isdir(path)
+    self.caseManifest = CaseManifest(path) if valid else None
+    self.caseSizeAccount = CaseSizeAccount(path) if valid else None
+    self.instanceIndex = InstanceIndex(path) if valid else None
+    if self.caseDatabase:
+      self.caseDatabase.close()
+    self.caseDatabase = CaseDICOMDatabase(path) if valid else None
+    caseArchive = CaseArchive(path, self.metadataCache) if valid else None
+    self.lazyCaseArchive = caseArchive if caseArchive and caseArchive.isLazilyUnpacked() else None
+    self.sessionStores = {}
+    self.instrumentation.startTrace(path if valid else None)
   
   def __init__(self):
     ScriptedLoadableModuleLogic.__init__(self)
+    self.instrumentation = getSharedInstrumentation()
+    self.events = EventChannel(scheduler=lambda delay, function: qt.QTimer.singleShot(int(delay * 1000), function))
+    self.connectObserverEvents()
+    self.caseDatabase = None
+    self.sessionStores = {}
+    self.caseDirectory = None
+    self.importIdleCallbacks = []
     self.caseCompleted = True
     self.DEFAULT_JSON_FILE_NAME = "results.json"
+    self.metadataCache = getSharedMetadataCache()
+    if not self.metadataCache.fallbackReader:
+      self.metadataCache.fallbackReader = readHeaderWithPydicom
+    self.caseArchiver = CaseArchiver(self.metadataCache)
+
+  def connectObserverEvents(self):
+    """Forwards channel events to VTK observers of the logic with the former string payloads. Progress is
+    forwarded at most every PROGRESS_EVENT_INTERVAL seconds."""
+    self.events.subscribe(FileIndexed, lambda payload: self.invokeEvent(
+      SlicerProstateEvents.NewFileIndexedEvent,
+      ["Indexing file %s" % payload.path, payload.total, payload.current].__str__()),
+      minInterval=self.PROGRESS_EVENT_INTERVAL)
+    self.events.subscribe(ImageDataReceived, lambda payload: self.invokeEvent(
+      SlicerProstateEvents.NewImageDataReceivedEvent, payload.files.__str__()))
+    self.events.subscribe(StatusChanged, lambda payload: self.invokeEvent(
+      SlicerProstateEvents.StatusChangedEvent, payload.status))
+
+  def getDICOMValue(self, inputArg, tagName, default=""):
+    if isinstance(inputArg, str) and os.path.isfile(inputArg):
+      return self.metadataCache.getValue(inputArg, tagName, default)
+    return ModuleLogicMixin.getDICOMValue(inputArg, tagName, default)
+
+  def makeSeriesNumberDescription(self, dcmFile):
+    seriesDescription = self.getDICOMValue(dcmFile, DICOMTAGS.SERIES_DESCRIPTION)
+    seriesNumber = self.getDICOMValue(dcmFile, DICOMTAGS.SERIES_NUMBER)
+    seriesNumberDescription = None
+    if seriesDescription and seriesNumber:
+      seriesNumberDescription = seriesNumber + ": " + seriesDescription
+    return seriesNumberDescription
   
   def stopSmartDICOMReceiver(self):
     self.smartDicomReceiver = getattr(self, "smartDicomReceiver", None)
@@ -315,18 +587,115 @@ class SlicerCaseManagerLogic(ScriptedLoadableModuleLogic):
     self.stopSmartDICOMReceiver()
     if os.path.exists(directory):
       self.caseCompleted = False
-      if self.getDirectorySize(directory) == 0:
+      if not directoryContainsData(directory, ignoredNames=self.CASE_INDEX_FILES):
+        self.instrumentation.stopTrace()
+        if self.caseDatabase:
+          self.caseDatabase.close()
         shutil.rmtree(directory)
+      else:
+        self.saveCaseIndexes()
+
+  def saveCaseIndexes(self):
+    if self.caseManifest:
+      self.caseManifest.save()
+    if self.caseSizeAccount:
+      self.caseSizeAccount.save()
+    if self.instanceIndex:
+      self.instanceIndex.save()
+
+  def indexDICOMFiles(self, files):
+    """Adds (path, header values) of received files to the index database of the case. The global
+    slicer.dicomDatabase is only used when no case is open or through addCaseToDICOMDatabase()."""
+    with self.instrumentation.span("dicomDatabaseIndexing", files=len(files)):
+      if self.caseDatabase:
+        self.caseDatabase.addFiles(files)
+      else:
+        ctk.ctkDICOMIndexer().addListOfFiles(slicer.dicomDatabase, [path for path, values in files], None)
+
+  def addCaseToDICOMDatabase(self):
+    if self.caseDatabase:
+      ctk.ctkDICOMIndexer().addListOfFiles(slicer.dicomDatabase, self.caseDatabase.getFiles(), None)
+
+  def isDuplicateInstance(self, path, values):
+    return self.instanceIndex.isDuplicate(path, values) if self.instanceIndex else False
+
+  def recordCaseDirectory(self, directory):
+    if self.caseSizeAccount and directory and os.path.exists(directory):
+      self.caseSizeAccount.recordDirectory(directory)
+      self.caseSizeAccount.save()
+
+  def archiveCase(self, directory):
+    self.caseArchiver.archive(directory)
+
+  def waitForCaseArchiving(self, directory):
+    return self.caseArchiver.wait(directory, self.ARCHIVE_WAIT_TIMEOUT)
+
+  def isCaseArchived(self, directory):
+    return CaseArchive(directory, self.metadataCache).isPacked()
+
+  def isCaseUnpacked(self, directory):
+    return os.path.exists(directory) and CaseArchive(directory, self.metadataCache).isUnpacked()
+
+  def unpackCase(self, directory):
+    with self.instrumentation.span("caseUnpacking"):
+      CaseArchive(directory, self.metadataCache).unpack(self.LAZY_ARCHIVE_DIRECTORIES)
+
+  def createPreopPreprocessor(self, outputDirectory):
+    command = [slicer.app.launcherExecutableFilePath, "--no-splash", "--no-main-window", "--python-script",
+               CONVERSION_SCRIPT]
+    return PreopPreprocessor(outputDirectory, command, metadataCache=self.metadataCache)
+
+  def isImportIdle(self):
+    return True
+
+  def callWhenImportIdle(self, callback):
+    if self.isImportIdle():
+      callback()
+    else:
+      self.importIdleCallbacks.append(callback)
+
+  def notifyImportIdle(self):
+    callbacks, self.importIdleCallbacks = self.importIdleCallbacks, []
+    for callback in callbacks:
+      callback()
+
+  def prefetchMostRecentSeries(self):
+    pass
+
+  def getCaseSize(self):
+    return self.caseSizeAccount.getTotalSize() if self.caseSizeAccount else 0
         
   def hasCaseBeenCompleted(self, directory):
     self.caseCompleted = False
-    filename = os.path.join(directory, self.DEFAULT_JSON_FILE_NAME)
-    if not os.path.exists(filename):
+    completed = self.readCompletedFlag(directory)
+    if completed is None:
       return
-    with open(filename) as data_file:
-      data = json.load(data_file)
-      self.caseCompleted = data["completed"]
-    return self.caseCompleted    
+    self.caseCompleted = completed
+    return self.caseCompleted
+
+  def createSessionStore(self, directory):
+    return SessionStore(directory)
+
+  def getSessionStore(self, directory):
+    directory = os.path.normpath(directory)
+    if directory not in self.sessionStores:
+      self.sessionStores[directory] = self.createSessionStore(directory)
+    return self.sessionStores[directory]
+
+  def readCompletedFlag(self, directory):
+    return self.getSessionStore(directory).isCompleted()
+
+  def invalidateSessionIndex(self, caseDirectory):
+    pass
+
+  def getSessionData(self):
+    return {"completed": self.caseCompleted}
+
+  def saveSessionData(self, directory, data, changedItems=None):
+    self.getSessionStore(directory).saveDocument(data, changedItems)
+
+  def loadSessionData(self, directory):
+    return self.getSessionStore(directory).loadDocument()
 
 class SliceTrackerCaseManager(ScriptedLoadableModule):
   def __init__(self, parent):
@@ -343,13 +712,53 @@ class SliceTrackerCaseManager(ScriptedLoadableModule):
 
 
 class SliceTrackerCaseManagerWidget(SlicerCaseManagerWidget):
+
+  CASE_LAYOUT = CaseLayout()
+
   def __init__(self, parent=None):
     ScriptedLoadableModuleWidget.__init__(self, parent)
     self.logic = SliceTrackerCaseManagerLogic()
     
   def setup(self):
     SlicerCaseManagerWidget.setup(self)  
-    self.caseDirectoryList = {""}
+    self.logic.seriesRegistry.addListener(self.onSeriesRegistryChanged)
+    self.logic.watchIntraopDirectory = self.getSetting('WatchIntraopDirectory') == "True"
+    memoryBudget = self.getSetting('VolumeCacheMemoryBudgetMB')
+    if memoryBudget:
+      self.logic.volumeCacheMemoryBudget = int(memoryBudget) * 1024 ** 2
+    if getattr(self, "intraopSeriesSelector", None):
+      self.intraopSeriesSelector.connect('currentIndexChanged(QString)', self.onIntraopSeriesSelectionChanged)
+
+  def onIntraopSeriesSelectionChanged(self, selectedSeries=None):
+    """Reads the pixel data of a series only when it is selected for display."""
+    self.logic.setDisplayedSeries(selectedSeries or None)
+    return self.logic.loadSeriesVolume(selectedSeries) if selectedSeries else None
+
+  def onSeriesRegistryChanged(self, addedSeries, changedSeries):
+    if self.seriesModel.rowCount() != len(self.logic.seriesList) - len(addedSeries):
+      self.updateIntraopSeriesSelectorTable()
+      return
+    for index, series in addedSeries:
+      self.seriesModel.insertRow(index, self.createSeriesItem(series))
+    for series in changedSeries:
+      self.updateSeriesItem(self.seriesModel.item(self.logic.seriesList.index(series)), series)
+
+  def updateIntraopSeriesSelectorTable(self):
+    """Rebuilds the series model only when it is out of sync with the series registry, e.g. after it was cleared.
+    Series received during the case are inserted incrementally by onSeriesRegistryChanged."""
+    if self.seriesModel.rowCount() == len(self.logic.seriesList):
+      return
+    self.seriesModel.clear()
+    for series in self.logic.seriesList:
+      self.seriesModel.appendRow(self.createSeriesItem(series))
+
+  def createSeriesItem(self, series):
+    item = qt.QStandardItem(series)
+    self.updateSeriesItem(item, series)
+    return item
+
+  def updateSeriesItem(self, item, series):
+    item.setToolTip("%d file(s)" % len(self.logic.loadableList.get(series, [])))
   
   def onCreateNewCaseButtonClicked(self):
     Super(SliceTrackerCaseManagerWidget,self).onCreateNewCaseButtonClicked()
@@ -371,7 +780,7 @@ class SliceTrackerCaseManagerWidget(SlicerCaseManagerWidget):
   def loadCaseData(self):
     Super(SliceTrackerCaseManagerWidget, self).loadCaseData()
     from mpReview import mpReviewLogic
-    savedSessions = self.logic.getSavedSessions(self.currentCaseDirectory)
+    savedSessions = self.logic.getSessionEntries(self.currentCaseDirectory)
     if len(savedSessions) > 0: # After registration(s) has been done
       if not self.openSavedSession(savedSessions):
         self.clearData()
@@ -381,23 +790,57 @@ class SliceTrackerCaseManagerWidget(SlicerCaseManagerWidget):
         self.preopDataDir = self.logic.getFirstMpReviewPreprocessedStudy(self.mpReviewPreprocessedOutput)
         self.intraopDataDir = self.intraopDICOMDataDirectory
       else:
-        if len(os.listdir(self.preopDICOMDataDirectory)):
+        if directoryHasEntries(self.preopDICOMDataDirectory):
           self.startPreProcessingPreopData()
-        elif len(os.listdir(self.intraopDICOMDataDirectory)):
+        elif directoryHasEntries(self.intraopDICOMDataDirectory):
           self.logic.usePreopData = False
           self.intraopDataDir = self.intraopDICOMDataDirectory
         else:
           self.startPreopDICOMReceiver()
     self.configureAllTargetDisplayNodes()
     
+  @property
+  def intraopDataDir(self):
+    return self.logic.intraopDataDir
+
+  @intraopDataDir.setter
+  def intraopDataDir(self, path):
+    self.logic.intraopDataDir = path
+    self.logic.callWhenImportIdle(self.onIntraopDataImported)
+
+  def onIntraopDataImported(self):
+    self.updateIntraopSeriesSelectorTable()
+
+  def getVolumeMemoryUsage(self):
+    return self.logic.getResidentVolumeSize(), self.logic.volumeCacheMemoryBudget
+
+  def getCaseCompletedState(self, caseDirectory):
+    sessions = self.logic.getSessionEntries(caseDirectory, save=False)
+    return sessions[0][1]["completed"] if sessions else None
+
+  def selectSession(self, sessions):
+    if len(sessions) == 1:
+      return sessions[0]
+    labels = ["%s (%s, %d registration(s), last modified %s)"
+              % (os.path.basename(sessionDirectory), "completed" if entry["completed"] else "started",
+                 entry["registrations"], entry["modified"]) for sessionDirectory, entry in sessions]
+    selectedLabel = self.runExcludedFromCaseOpenTime(qt.QInputDialog.getItem, self.parent.window(), "Select Session",
+                                                     "Sessions found for the selected case:", labels, 0, False)
+    return sessions[labels.index(selectedLabel)] if selectedLabel in labels else None
+
   def openSavedSession(self, sessions):
-    # TODO: session selector and if not continuing, ask for creating a new one.
-    latestCase = os.path.join(max(sessions, key=os.path.getmtime), "MRgBiopsy")
-    self.logic.caseCompleted = self.logic.hasCaseBeenCompleted(latestCase)
+    """sessions are the (sessionDirectory, entry) tuples of getSessionEntries(), most recently modified first."""
+    # TODO: if not continuing, ask for creating a new one.
+    selectedSession = self.selectSession(sessions)
+    if not selectedSession:
+      return False
+    sessionDirectory, entry = selectedSession
+    latestCase = os.path.join(sessionDirectory, "MRgBiopsy")
+    self.logic.caseCompleted = entry["completed"]
     message = "A %s session has been found for the selected case. Do you want to %s?" \
               % ("completed" if self.logic.caseCompleted else "started",
                  "open it" if self.logic.caseCompleted else "continue this session")
-    if slicer.util.confirmYesNoDisplay(message):
+    if self.runExcludedFromCaseOpenTime(slicer.util.confirmYesNoDisplay, message):
       self.continueOldCase = True
       self.logic.loadFromJSON(latestCase)
       if self.logic.usePreopData:
@@ -438,6 +881,10 @@ class SliceTrackerCaseManagerWidget(SlicerCaseManagerWidget):
       self.customStatusProgressBar.reset()
       self.customStatusProgressBar.hide()   
       
+  def continueWithPreprocessedPreopData(self, studyDirectory):
+    Super(SliceTrackerCaseManagerWidget, self).continueWithPreprocessedPreopData(studyDirectory)
+    self.intraopDataDir = self.intraopDICOMDataDirectory
+
   def continueWithoutPreopData(self, caller, event):
     Super(SliceTrackerCaseManagerWidget, self).continueWithoutPreopData(caller, event)
     self.logic.usePreopData = False
@@ -445,10 +892,57 @@ class SliceTrackerCaseManagerWidget(SlicerCaseManagerWidget):
     self.simulateIntraopPhaseButton.enabled = True    
 
 class SliceTrackerCaseManagerLogic(SlicerCaseManagerLogic):
+
+  IMPORT_POLL_INTERVAL = 50
+  IMPORT_CANCEL_TIMEOUT = 2.0
+  WATCH_POLL_INTERVAL = 100
+  DEFAULT_VOLUME_CACHE_MEMORY_BUDGET = 2 * 1024 ** 3
+  LAZY_ARCHIVE_DIRECTORIES = (CaseArchive.INTRAOP_DIRECTORY,)
+
   def __init__(self):
-    ScriptedLoadableModuleLogic.__init__(self)
-    self.seriesList = []
-    self.loadableList = {}
+    SlicerCaseManagerLogic.__init__(self)
+    self.seriesRegistry = SeriesRegistry()
+    self.volumeCache = VolumeCache(self.DEFAULT_VOLUME_CACHE_MEMORY_BUDGET,
+                                   sizeOf=lambda volume: volume.GetImageData().GetActualMemorySize() * 1024,
+                                   release=lambda volume: slicer.mrmlScene.RemoveNode(volume))
+    self.displayedSeries = None
+    self.approvedSeries = set()
+    self.usePreopData = True
+    self.preopTargets = None
+    self.volumePrefetcher = VolumePrefetcher()
+    self.seriesFileIndex = SeriesFileIndex()
+    self.archivedSeries = set()
+    self._intraopDataDir = None
+    self.pipelineMode = True
+    self.importPipeline = HeaderParsingPipeline(self.metadataCache, deduplicator=self.isDuplicateInstance)
+    self.receivePipeline = ReceivePipeline(self.metadataCache, deduplicator=self.isDuplicateInstance)
+    self.pendingReceivedBatches = []
+    self.pendingEligibleSeriesFiles = []
+    self.progressRateLimiter = RateLimiter(self.PROGRESS_EVENT_INTERVAL)
+    self.importTimer = qt.QTimer()
+    self.importTimer.setInterval(self.IMPORT_POLL_INTERVAL)
+    self.importTimer.timeout.connect(self.processImportedBatches)
+    self.watchIntraopDirectory = False
+    self.directoryWatcher = None
+    self.watchTimer = qt.QTimer()
+    self.watchTimer.setInterval(self.WATCH_POLL_INTERVAL)
+    self.watchTimer.timeout.connect(self.onWatchTimeout)
+
+  @property
+  def loadableList(self):
+    return self.seriesFileIndex
+
+  @property
+  def seriesList(self):
+    return self.seriesRegistry
+
+  @property
+  def volumeCacheMemoryBudget(self):
+    return self.volumeCache.memoryBudget
+
+  @volumeCacheMemoryBudget.setter
+  def volumeCacheMemoryBudget(self, memoryBudget):
+    self.volumeCache.setMemoryBudget(memoryBudget)
     
   @property
   def intraopDataDir(self):
@@ -457,12 +951,18 @@ class SliceTrackerCaseManagerLogic(SlicerCaseManagerLogic):
   @intraopDataDir.setter
   def intraopDataDir(self, path):
     self._intraopDataDir = path
+    self.stopDirectoryWatcher()
     if not self.caseCompleted:
-      self.startSmartDICOMReceiver(runStoreSCP=not self.trainingMode)
+      if self.trainingMode or self.watchIntraopDirectory:
+        self.startDirectoryWatcher()
+      if self.trainingMode:
+        self.stopSmartDICOMReceiver()
+      else:
+        self.startSmartDICOMReceiver()
     else:
       self.invokeEvent(SlicerProstateEvents.DICOMReceiverStoppedEvent)
-    self.importDICOMSeries(self.getFileList(self.intraopDataDir))
-    if self.smartDicomReceiver:
+    self.importNewDICOMFiles()
+    if getattr(self, "smartDicomReceiver", None) and not self.trainingMode:
       self.smartDicomReceiver.forceStatusChangeEvent()
       
   def startSmartDICOMReceiver(self, runStoreSCP=True):
@@ -476,64 +976,539 @@ class SliceTrackerCaseManagerLogic(SlicerCaseManagerLogic):
                                         self.onSmartDICOMReceiverStopped)
     self.smartDicomReceiver.start(runStoreSCP)
 
+  def startDirectoryWatcher(self):
+    """Watches the intraop directory for files copied in by hand or by the training simulation, instead of listing
+    it repeatedly. Only the new files are passed on to the import."""
+    self.directoryWatcher = DirectoryWatcher([self._intraopDataDir])
+    self.directoryWatcher.start()
+    self.watchTimer.start()
+    self.events.publish(StatusChanged("Watching %s (%s)" % (self._intraopDataDir, self.directoryWatcher.backendName)))
+
+  def stopDirectoryWatcher(self):
+    self.watchTimer.stop()
+    if self.directoryWatcher:
+      self.directoryWatcher.stop()
+      self.directoryWatcher = None
+
+  def onWatchTimeout(self):
+    newFileList = self.directoryWatcher.poll()
+    if not newFileList:
+      return
+    self.instrumentation.count("watchedFiles", len(newFileList))
+    if self.pipelineMode:
+      self.queueReceivedFiles(newFileList)
+    else:
+      self.importDICOMSeries(newFileList)
+
   def onSmartDICOMReceiverStopped(self, caller, event, callData=None):
     self.invokeEvent(SlicerProstateEvents.DICOMReceiverStoppedEvent)
 
   @vtk.calldata_type(vtk.VTK_STRING)
   def onDICOMReceiverStatusChanged(self, caller, event, callData):
-    self.invokeEvent(SlicerProstateEvents.StatusChangedEvent, callData)
+    self.events.publish(StatusChanged(callData))
 
   @vtk.calldata_type(vtk.VTK_STRING)
   def onDICOMSeriesReceived(self, caller, event, callData):
     newFileList = ast.literal_eval(callData)
-    self.importDICOMSeries(newFileList)
+    self.instrumentation.count("receivedFiles", len(newFileList))
+    with self.instrumentation.span("receiverEvent", files=len(newFileList)):
+      if self.pipelineMode:
+        self.receiveFiles(newFileList)
+      else:
+        self.importDICOMSeries(self.claimFiles(newFileList))
     if self.trainingMode is True:
       self.stopSmartDICOMReceiver()
 
-  def importDICOMSeries(self, newFileList):
-    indexer = ctk.ctkDICOMIndexer()
+  def importNewDICOMFiles(self):
+    if self.lazyCaseArchive and os.path.normpath(self.intraopDataDir) == \
+        os.path.join(self.caseDirectory, *CaseArchive.INTRAOP_DIRECTORY.split("/")):
+      self.restoreArchivedSeries()
+      return
+    if not self.caseManifest:
+      self.importDICOMSeries(self.claimFiles(self.getFileList(self.intraopDataDir)))
+      return
+    changedFiles, unchangedFiles = self.caseManifest.scan(self.intraopDataDir)
+    changedFiles = self.claimFiles(changedFiles)
+    restoredFiles = []
+    for fileName, series in unchangedFiles:
+      if series:
+        currentFile = os.path.join(self.intraopDataDir, fileName)
+        self.registerSeriesFile(series, currentFile)
+        restoredFiles.append(currentFile)
+    self.saveCaseIndexes()
+    if len(restoredFiles):
+      self.seriesRegistry.flush()
+      self.publishImageDataReceived(restoredFiles)
+    if len(changedFiles):
+      self.importDICOMSeries(changedFiles)
+
+  def restoreArchivedSeries(self):
+    """Registers the intraop series of a lazily unpacked case from the archive index without reading or extracting
+    their files. createLoadableFileListForSeries() extracts a series when it is loaded; only the most recent one is
+    extracted right away."""
+    archive = self.lazyCaseArchive
+    for series in archive.getSeries():
+      self.archivedSeries.add(series)
+      for member in archive.getSeriesMembers(series):
+        self.registerSeriesFile(series, os.path.join(self.caseDirectory, *member.split("/")))
+    self.seriesRegistry.flush()
+    if len(self.seriesList):
+      self.publishImageDataReceived(self.createLoadableFileListForSeries(self.seriesList[-1]))
+
+  def extractArchivedSeries(self, series):
+    if series not in self.archivedSeries:
+      return
+    with self.instrumentation.span("seriesExtraction", series=series):
+      self.lazyCaseArchive.extractSeries(series)
+    self.archivedSeries.discard(series)
+
+  def claimFiles(self, fileList):
+    if not self.directoryWatcher:
+      return fileList
+    return self.directoryWatcher.claim([os.path.join(self._intraopDataDir, f) for f in fileList])
 
+  def importDICOMSeries(self, newFileList):
+    if self.pipelineMode:
+      self.importDICOMSeriesInBackground(newFileList)
+      return
     eligibleSeriesFiles = []
     size = len(newFileList)
     for currentIndex, currentFile in enumerate(newFileList, start=1):
-      self.invokeEvent(SlicerProstateEvents.NewFileIndexedEvent, ["Indexing file %s" % currentFile, size, currentIndex].__str__())
-      slicer.app.processEvents()
+      self.events.publish(FileIndexed(currentFile, size, currentIndex), force=currentIndex == size)
+      if self.progressRateLimiter.ready(force=currentIndex == size):
+        slicer.app.processEvents()
       currentFile = os.path.join(self._intraopDataDir, currentFile)
-      indexer.addFile(slicer.dicomDatabase, currentFile, None)
-      series = self.makeSeriesNumberDescription(currentFile)
-      if series:
+      values = self.getHeaderValues(currentFile)
+      if self.isDuplicateInstance(currentFile, values):
+        continue
+      self.indexDICOMFiles([(currentFile, values)])
+      if self.addSeriesFile(currentFile, values):
         eligibleSeriesFiles.append(currentFile)
-        if series not in self.seriesList:
-          self.seriesList.append(series)
-          self.createLoadableFileListForSeries(series)
 
-    self.seriesList = sorted(self.seriesList, key=lambda s: RegistrationResult.getSeriesNumberFromString(s))
+    self.seriesRegistry.flush()
+    self.saveCaseIndexes()
 
     if len(eligibleSeriesFiles):
-      self.invokeEvent(SlicerProstateEvents.NewImageDataReceivedEvent, eligibleSeriesFiles.__str__())
+      self.publishImageDataReceived(eligibleSeriesFiles)
+
+  def importDICOMSeriesInBackground(self, newFileList):
+    self.importPipeline.submit([os.path.join(self._intraopDataDir, f) for f in newFileList])
+    if not self.importTimer.isActive():
+      self.importTimer.start()
+
+  def processImportedBatches(self):
+    self.offerPendingReceivedFiles()
+    receivedBatches = self.receivePipeline.poll()
+    for batch in receivedBatches:
+      self.instrumentation.record("receiveLatency", batch.loadedTime - batch.receivedTime, files=len(batch.files))
+    batches = self.importPipeline.poll() + [batch.results for batch in receivedBatches]
+    idle = self.importPipeline.idle and self.receivePipeline.idle and not self.pendingReceivedBatches
+    if batches:
+      for batch in batches:
+        batch = [(path, self.getHeaderValues(path, values)) for path, values in batch]
+        self.indexDICOMFiles(batch)
+        for path, values in batch:
+          if self.addSeriesFile(path, values):
+            self.pendingEligibleSeriesFiles.append(path)
+      self.seriesRegistry.flush()
+      lastFile = next((batch[-1][0] for batch in reversed(batches) if batch), None)
+      if lastFile:
+        self.events.publish(FileIndexed(lastFile, self.importPipeline.submittedFiles + self.receivePipeline.files +
+                                        self.getPendingReceivedFileCount(),
+                                        self.importPipeline.deliveredFiles + self.receivePipeline.files), force=idle)
+    if idle:
+      self.importTimer.stop()
+      self.saveCaseIndexes()
+      logging.debug("DICOM receive pipeline: %s" % self.receivePipeline.getStatistics())
+      eligibleSeriesFiles, self.pendingEligibleSeriesFiles = self.pendingEligibleSeriesFiles, []
+      if len(eligibleSeriesFiles):
+        self.publishImageDataReceived(eligibleSeriesFiles)
+      self.notifyImportIdle()
+
+  def publishImageDataReceived(self, files):
+    # throttled progress must not arrive after the files it reported on
+    self.events.flush(FileIndexed)
+    self.events.publish(ImageDataReceived(files))
+
+  def getHeaderValues(self, path, values=None):
+    """Returns values unless they are missing or the error a header parsing worker got, in which case the header is
+    read again, including the fallback reader. Returns {} for unreadable files."""
+    if values is not None and not isinstance(values, Exception):
+      return values
+    try:
+      return self.metadataCache.getValues(path)
+    except (DICOMHeaderError, IOError, OSError, ValueError) as exc:
+      logging.debug("Could not read header of %s: %s" % (path, exc))
+      return {}
+
+  def isImportIdle(self):
+    return not self.importTimer.isActive()
+
+  def receiveFiles(self, filePaths):
+    self.queueReceivedFiles(self.claimFiles(filePaths))
+
+  def queueReceivedFiles(self, filePaths):
+    """Batches which do not fit into the bounded receive queue are kept in pendingReceivedBatches and offered again
+    on every tick of the import timer, so the GUI thread never waits for the loader."""
+    if not filePaths:
+      return
+    self.pendingReceivedBatches.append([os.path.join(self._intraopDataDir, f) for f in filePaths])
+    self.offerPendingReceivedFiles()
+    if not self.importTimer.isActive():
+      self.importTimer.start()
+
+  def offerPendingReceivedFiles(self):
+    while self.pendingReceivedBatches and self.receivePipeline.offer(self.pendingReceivedBatches[0], timeout=0):
+      self.pendingReceivedBatches.pop(0)
+
+  def getPendingReceivedFileCount(self):
+    return sum(len(batch) for batch in self.pendingReceivedBatches)
+
+  def getReceiveStatistics(self):
+    statistics = self.receivePipeline.getStatistics()
+    statistics["pendingFiles"] = self.getPendingReceivedFileCount()
+    return statistics
+
+  def addSeriesFile(self, currentFile, values):
+    with self.instrumentation.span("dicomIndexing"):
+      series = getSeriesNumberDescription(values)
+      if self.caseManifest:
+        entry = self.caseManifest.record(currentFile, series)
+        if self.caseSizeAccount:
+          self.caseSizeAccount.record(currentFile, entry["size"])
+      if not series:
+        return False
+      self.registerSeriesFile(series, currentFile)
+      return True
+
+  def registerSeriesFile(self, series, currentFile):
+    self.seriesFileIndex.add(series, currentFile)
+    self.seriesRegistry.add(series)
+
+  def loadSeriesVolume(self, series):
+    volume = self.volumeCache.get(series)
+    if volume and slicer.mrmlScene.IsNodePresent(volume):
+      return volume
+    self.volumeCache.remove(series)
+    from DICOMScalarVolumePlugin import DICOMScalarVolumePluginClass
+    plugin = DICOMScalarVolumePluginClass()
+    loadables = plugin.examineFiles(self.createLoadableFileListForSeries(series))
+    if not loadables:
+      return None
+    volume = plugin.load(max(loadables, key=lambda loadable: loadable.confidence))
+    if volume:
+      self.volumeCache.put(series, volume)
+      logging.debug("Volume cache: %s" % self.volumeCache.getStatistics())
+    return volume
+
+  def setDisplayedSeries(self, series):
+    if self.displayedSeries == series:
+      return
+    if self.displayedSeries and self.displayedSeries not in self.approvedSeries:
+      self.volumeCache.unpin(self.displayedSeries)
+    self.displayedSeries = series
+    if series:
+      self.volumeCache.pin(series)
+
+  def setSeriesApproved(self, series, approved=True):
+    if approved:
+      self.approvedSeries.add(series)
+      self.volumeCache.pin(series)
+    else:
+      self.approvedSeries.discard(series)
+      if series != self.displayedSeries:
+        self.volumeCache.unpin(series)
+
+  def getResidentVolumeSize(self):
+    return self.volumeCache.residentSize
+
+  def prefetchMostRecentSeries(self):
+    if len(self.seriesList) and self.seriesList[-1] not in self.volumeCache:
+      self.volumePrefetcher.prefetch(self.createLoadableFileListForSeries(self.seriesList[-1]))
+
+  def loadFromJSON(self, directory):
+    data = self.loadSessionData(directory)
+    if data is None:
+      return False
+    self.applySessionData(data)
+    return True
+
+  def getSessionData(self):
+    data = SlicerCaseManagerLogic.getSessionData(self)
+    data.update(usePreopData=self.usePreopData, preopTargets=self.preopTargets)
+    return data
+
+  def applySessionData(self, data):
+    self.caseCompleted = data.get("completed", False)
+    self.usePreopData = data.get("usePreopData", True)
+    self.preopTargets = data.get("preopTargets")
+    for result in data.get(SessionIndex.REGISTRATION_RECORD_TYPE, []):
+      if isinstance(result, dict) and result.get("status") == "approved" and result.get("name"):
+        self.setSeriesApproved(result["name"])
+
+  def getSessionIndex(self, caseDirectory):
+    return SessionIndex(os.path.join(caseDirectory, "SliceTrackerOutputs"))
+
+  def createSessionStore(self, directory):
+    sessionDirectory = os.path.dirname(os.path.normpath(directory))
+    outputDirectory = os.path.dirname(sessionDirectory)
+    return SessionStore(directory, onHeaderWritten=lambda store, header:
+                        SessionIndex(outputDirectory).update(sessionDirectory, header))
+
+  def getSessionEntries(self, caseDirectory, save=True):
+    index = self.getSessionIndex(caseDirectory)
+    index.synchronize(lambda sessionDirectory: SessionStore(os.path.join(sessionDirectory, "MRgBiopsy")), save=save)
+    return index.getSessions()
+
+  def getSavedSessions(self, caseDirectory):
+    return [sessionDirectory for sessionDirectory, entry in self.getSessionEntries(caseDirectory)]
+
+  def invalidateSessionIndex(self, caseDirectory):
+    self.getSessionIndex(caseDirectory).invalidate()
 
   def createLoadableFileListForSeries(self, selectedSeries):
-    selectedSeriesNumber = int(selectedSeries.split(": ")[0])
-    self.loadableList[selectedSeries] = []
-    for dcm in self.getFileList(self._intraopDataDir):
-      currentFile = os.path.join(self._intraopDataDir, dcm)
-      currentSeriesNumber = int(self.getDICOMValue(currentFile, DICOMTAGS.SERIES_NUMBER))
-      if currentSeriesNumber and currentSeriesNumber == selectedSeriesNumber:
-        self.loadableList[selectedSeries].append(currentFile)    
+    self.extractArchivedSeries(selectedSeries)
+    return self.seriesFileIndex.getFiles(selectedSeries)
+
+  def resetAndInitializeData(self):
+    self.stopDirectoryWatcher()
+    self.volumePrefetcher.cancel()
+    self.volumeCache.clear()
+    self.displayedSeries = None
+    self.approvedSeries = set()
+    self.usePreopData = True
+    self.preopTargets = None
+    self.importTimer.stop()
+    self.importIdleCallbacks = []
+    if not self.importPipeline.cancel(self.IMPORT_CANCEL_TIMEOUT):
+      logging.warning("Header parsing of the closed case did not stop within %.1f s" % self.IMPORT_CANCEL_TIMEOUT)
+    self.progressRateLimiter.reset()
+    self.pendingReceivedBatches = []
+    if not self.receivePipeline.cancel(self.IMPORT_CANCEL_TIMEOUT):
+      logging.warning("Indexing of received files did not stop within %.1f s" % self.IMPORT_CANCEL_TIMEOUT)
+    self.receivePipeline.resetStatistics()
+    self.pendingEligibleSeriesFiles = []
+    self.seriesRegistry.clear()
+    self.seriesFileIndex.clear()
+    self.archivedSeries = set()
     
+class CachedDICOMInformationWatchBox(DICOMBasedInformationWatchBox):
+
+  def updateInformationFromWatchBoxAttribute(self, attribute):
+    if attribute.tags and self.sourceFile:
+      values = []
+      for tag in attribute.tags:
+        currentValue = getSharedMetadataCache().getValue(self.sourceFile, tag)
+        if tag in self.DATE_TAGS_TO_FORMAT:
+          currentValue = self.formatDate(currentValue)
+        elif tag == DICOMTAGS.PATIENT_NAME:
+          currentValue = self.formatPatientName(currentValue)
+        values.append(currentValue)
+      return self.DEFAULT_TAG_VALUE_SEPARATOR.join(values)
+    return ""
+
+
+class CaseBrowserWidget(qt.QWidget, ModuleWidgetMixin):
+
+  COLUMNS = ["Case", "Patient ID", "Case Date", "Study Date", "Series", "Completed", "Size"]
+  SUMMARY_KEYS = [None, "patientID", "caseDate", "studyDate", "seriesCount", "completed", "diskSize"]
+  POLL_INTERVAL = 100
+
+  @property
+  def catalog(self):
+    return self._catalog
+
+  @catalog.setter
+  def catalog(self, catalog):
+    self._catalog = catalog
+    self.refresh()
+
+  def __init__(self, completionResolver=None, parent=None):
+    qt.QWidget.__init__(self, parent)
+    self._catalog = None
+    self.rows = {}
+    self.loader = CaseSummaryLoader(completionResolver=completionResolver)
+    self.pollTimer = qt.QTimer()
+    self.pollTimer.setInterval(self.POLL_INTERVAL)
+    self.setupUI()
+    self.setupConnections()
+
+  def setupUI(self):
+    self.setLayout(qt.QVBoxLayout())
+    self.table = qt.QTableWidget(0, len(self.COLUMNS))
+    self.table.setHorizontalHeaderLabels(self.COLUMNS)
+    self.table.setSelectionBehavior(qt.QAbstractItemView.SelectRows)
+    self.table.setEditTriggers(qt.QAbstractItemView.NoEditTriggers)
+    self.table.verticalHeader().hide()
+    self.refreshButton = self.createButton("Refresh")
+    self.layout().addWidget(self.table)
+    self.layout().addWidget(self.refreshButton)
+
+  def setupConnections(self):
+    self.table.verticalScrollBar().valueChanged.connect(self.requestVisibleSummaries)
+    self.refreshButton.clicked.connect(self.refresh)
+    self.pollTimer.timeout.connect(self.onPollTimeout)
+
+  def resizeEvent(self, event):
+    qt.QWidget.resizeEvent(self, event)
+    self.requestVisibleSummaries()
+
+  def refresh(self):
+    self.loader.cancel()
+    self.rows = {}
+    self.table.setRowCount(0)
+    if not self.catalog:
+      return
+    self.catalog.refresh()
+    names = self.catalog.getCaseNames()
+    self.table.setRowCount(len(names))
+    for row, name in enumerate(names):
+      self.rows[name] = row
+      self.table.setItem(row, 0, qt.QTableWidgetItem(name))
+      summary, stamp = self.catalog.getSummary(name)
+      if summary:
+        self.updateRow(row, summary)
+    self.requestVisibleSummaries()
+
+  def getVisibleRows(self):
+    if not self.table.rowCount:
+      return []
+    first = max(self.table.rowAt(0), 0)
+    last = self.table.rowAt(self.table.viewport().height - 1)
+    return range(first, (last if last >= 0 else self.table.rowCount - 1) + 1)
+
+  def requestVisibleSummaries(self, *args):
+    if not self.catalog or not self.rows:
+      return
+    names = [self.table.item(row, 0).text() for row in self.getVisibleRows()]
+    self.loader.request([self.catalog.getCaseDirectory(name) for name in names],
+                        {self.catalog.getCaseDirectory(name): self.catalog.getSummary(name)[1] for name in names})
+    self.pollTimer.start()
+
+  def onPollTimeout(self):
+    results = self.loader.poll()
+    for caseDirectory, stamp, summary in results:
+      name = os.path.basename(caseDirectory)
+      self.catalog.setSummary(name, summary, stamp)
+      if name in self.rows:
+        self.updateRow(self.rows[name], summary)
+    if results:
+      self.catalog.save()
+    if self.loader.idle:
+      self.pollTimer.stop()
+
+  def updateRow(self, row, summary):
+    for column, key in enumerate(self.SUMMARY_KEYS):
+      if key:
+        self.table.setItem(row, column, qt.QTableWidgetItem(self.formatValue(key, summary.get(key))))
+
+  @staticmethod
+  def formatValue(key, value):
+    if value is None:
+      return ""
+    if key == "completed":
+      return "Yes" if value else "No"
+    if key == "diskSize":
+      return "%.1f MB" % (value / 1048576.0)
+    return str(value)
+
+
+class PerformancePanelWidget(qt.QWidget, ModuleWidgetMixin):
+
+  COLUMNS = ["Span", "Count", "Total [ms]", "Mean [ms]", "Max [ms]", "Last [ms]"]
+  REFRESH_INTERVAL = 1000
+
+  def __init__(self, instrumentation, memoryUsageResolver=None, parent=None):
+    qt.QWidget.__init__(self, parent)
+    self.instrumentation = instrumentation
+    self.memoryUsageResolver = memoryUsageResolver
+    self.paused = True
+    self.refreshTimer = qt.QTimer()
+    self.refreshTimer.setInterval(self.REFRESH_INTERVAL)
+    self.setupUI()
+    self.setupConnections()
+
+  def setupUI(self):
+    self.setLayout(qt.QVBoxLayout())
+    self.enabledCheckBox = qt.QCheckBox("Record timings")
+    self.enabledCheckBox.checked = self.instrumentation.enabled
+    self.table = qt.QTableWidget(0, len(self.COLUMNS))
+    self.table.setHorizontalHeaderLabels(self.COLUMNS)
+    self.table.setEditTriggers(qt.QAbstractItemView.NoEditTriggers)
+    self.table.verticalHeader().hide()
+    self.countersLabel = qt.QLabel()
+    self.countersLabel.wordWrap = True
+    self.memoryUsageLabel = qt.QLabel()
+    self.resetButton = self.createButton("Reset")
+    self.layout().addWidget(self.enabledCheckBox)
+    self.layout().addWidget(self.table)
+    self.layout().addWidget(self.countersLabel)
+    self.layout().addWidget(self.memoryUsageLabel)
+    self.layout().addWidget(self.resetButton)
+
+  def setupConnections(self):
+    self.enabledCheckBox.toggled.connect(self.onEnabledToggled)
+    self.resetButton.clicked.connect(self.onResetButtonClicked)
+    self.refreshTimer.timeout.connect(self.refresh)
+
+  def onEnabledToggled(self, enabled):
+    self.instrumentation.enabled = enabled
+    self.updateRefreshTimer()
+
+  def onResetButtonClicked(self):
+    self.instrumentation.reset()
+    self.refresh()
+
+  def setPaused(self, paused):
+    self.paused = paused
+    self.updateRefreshTimer()
+    if not paused:
+      self.refresh()
+
+  def updateRefreshTimer(self):
+    if self.instrumentation.enabled and not self.paused:
+      self.refreshTimer.start()
+    else:
+      self.refreshTimer.stop()
+
+  def refresh(self):
+    statistics = self.instrumentation.getStatistics()
+    spans = sorted(statistics["spans"].items(), key=lambda item: item[1]["total"], reverse=True)
+    self.table.setRowCount(len(spans))
+    for row, (name, span) in enumerate(spans):
+      values = [name, str(span["count"])] + ["%.1f" % (value * 1000) for value in
+                                             (span["total"], span["total"] / span["count"], span["max"], span["last"])]
+      for column, value in enumerate(values):
+        self.table.setItem(row, column, qt.QTableWidgetItem(value))
+    self.countersLabel.text = ", ".join("%s: %d" % item for item in sorted(statistics["counters"].items()))
+    memoryUsage = self.memoryUsageResolver() if self.memoryUsageResolver else None
+    self.memoryUsageLabel.text = "" if not memoryUsage else \
+      "Volumes in memory: %.1f of %.1f MB" % tuple(value / 1048576.0 for value in memoryUsage)
+
+
 class NewCaseSelectionNameWidget(qt.QMessageBox, ModuleWidgetMixin):
 
-  PREFIX = "Case"
+  PREFIX = CASE_PREFIX
   SUFFIX = "-" + datetime.date.today().strftime("%Y%m%d")
-  SUFFIX_PATTERN = "-[0-9]{8}"
-  CASE_NUMBER_DIGITS = 3
+  SUFFIX_PATTERN = CASE_SUFFIX_PATTERN
+  CASE_NUMBER_DIGITS = CASE_NUMBER_DIGITS
   PATTERN = PREFIX+"[0-9]{"+str(CASE_NUMBER_DIGITS-1)+"}[0-9]{1}"+SUFFIX_PATTERN
 
-  def __init__(self, destination, parent=None):
+  @staticmethod
+  def formatCaseName(caseNumber):
+    return formatCaseName(caseNumber)
+
+  @classmethod
+  def createCaseCatalog(cls, destination):
+    return CaseCatalog(destination, prefix=cls.PREFIX, suffixPattern=cls.SUFFIX_PATTERN, digits=cls.CASE_NUMBER_DIGITS)
+
+  def __init__(self, destination, parent=None, catalog=None):
     super(NewCaseSelectionNameWidget, self).__init__(parent)
     if not os.path.exists(destination):
       raise
     self.destinationRoot = destination
+    self.catalog = catalog or self.createCaseCatalog(destination)
+    self.catalog.refresh()
     self.newCaseDirectory = None
     self.minimum = self.getNextCaseNumber()
     self.setupUI()
@@ -541,13 +1516,7 @@ class NewCaseSelectionNameWidget(qt.QMessageBox, ModuleWidgetMixin):
     self.onCaseNumberChanged(self.minimum)
 
   def getNextCaseNumber(self):
-    import re
-    caseNumber = 0
-    for dirName in [dirName for dirName in os.listdir(self.destinationRoot)
-                     if os.path.isdir(os.path.join(self.destinationRoot, dirName)) and re.match(self.PATTERN, dirName)]:
-      number = int(re.split(self.SUFFIX_PATTERN, dirName)[0].split(self.PREFIX)[1])
-      caseNumber = caseNumber if caseNumber > number else number
-    return caseNumber+1
+    return self.catalog.getNextCaseNumber()
 
   def setupUI(self):
     self.setWindowTitle("Case Number Selection")
@@ -568,10 +1537,9 @@ class NewCaseSelectionNameWidget(qt.QMessageBox, ModuleWidgetMixin):
     self.spinbox.valueChanged.connect(self.onCaseNumberChanged)
 
   def onCaseNumberChanged(self, caseNumber):
-    formatString = '%0'+str(self.CASE_NUMBER_DIGITS)+'d'
-    caseNumber = formatString % caseNumber
-    directory = self.PREFIX+caseNumber+self.SUFFIX
+    directory = self.formatCaseName(caseNumber)
     self.newCaseDirectory = os.path.join(self.destinationRoot, directory)
     self.preview.setText("New case directory: " + self.newCaseDirectory)
-    self.okButton.enabled = not os.path.exists(self.newCaseDirectory)
-    self.notice.text = "" if not os.path.exists(self.newCaseDirectory) else "Note: Directory already exists."
\ No newline at end of file
+    exists = self.catalog.exists(directory)
+    self.okButton.enabled = not exists
+    self.notice.text = "" if not exists else "Note: Directory already exists."
\ No newline at end of file
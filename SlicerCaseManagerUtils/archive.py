@@ -0,0 +1,252 @@
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import zipfile
+
+from SlicerCaseManagerUtils.manifest import CaseManifest
+from SlicerCaseManagerUtils.metadata import HEADERTAGS, DICOMHeaderError, getSeriesNumberDescription, \
+  getSharedMetadataCache
+from SlicerCaseManagerUtils.storage import CaseSizeAccount
+
+
+class CaseArchive(object):
+  """Zip container for the DICOM directory of a completed case. The archive holds an index (series -> members per
+  directory, modification times and a few header values), so the case can be summarized without unpacking it.
+  Unpacking restores the modification times, so the case manifest stays valid, and keeps the archive: packing the
+  case again only removes the DICOM directory unless files were added or modified in the meantime.
+
+  unpack() can leave the series of some directories in the archive; they are extracted one at a time with
+  extractSeries() when they are needed. Packing such a case keeps the members which were never extracted."""
+
+  FILE_NAME = "DICOM.zip"
+  INDEX_MEMBER = "archiveIndex.json"
+  DICOM_DIRECTORY = "DICOM"
+  INTRAOP_DIRECTORY = "DICOM/Intraop"
+  VERSION = 1
+
+  def __init__(self, caseDirectory, metadataCache=None):
+    self.caseDirectory = caseDirectory
+    self.path = os.path.join(caseDirectory, self.FILE_NAME)
+    self.lazyMarkerPath = self.path + ".lazy"
+    self.dicomDirectory = os.path.join(caseDirectory, self.DICOM_DIRECTORY)
+    self.metadataCache = metadataCache or getSharedMetadataCache()
+    self._index = None
+
+  def exists(self):
+    return os.path.exists(self.path)
+
+  def isPacked(self):
+    return self.exists() and not os.path.exists(self.dicomDirectory)
+
+  def isUnpacked(self):
+    return self.exists() and os.path.exists(self.dicomDirectory)
+
+  def isLazilyUnpacked(self):
+    """Returns True if series were left in the archive by unpack()."""
+    return self.isUnpacked() and os.path.exists(self.lazyMarkerPath)
+
+  @property
+  def index(self):
+    if self._index is None:
+      with zipfile.ZipFile(self.path) as archive:
+        self._index = json.loads(archive.read(self.INDEX_MEMBER).decode("utf-8"))
+      if self._index.get("version") != self.VERSION:
+        raise ValueError("Unsupported archive version in %s" % self.path)
+    return self._index
+
+  def getSeries(self, directory=INTRAOP_DIRECTORY):
+    return sorted(self.index["series"].get(directory, {}))
+
+  def getSeriesMembers(self, series, directory=INTRAOP_DIRECTORY):
+    return list(self.index["series"].get(directory, {}).get(series, []))
+
+  def getHeaderValues(self):
+    return dict(self.index.get("header", {}))
+
+  def pack(self, compression=zipfile.ZIP_DEFLATED):
+    """Writes the archive next to the DICOM directory and removes the directory once the archive is complete. An
+    existing archive which still matches the directory is not written again."""
+    if not os.path.exists(self.dicomDirectory):
+      return
+    members = []
+    for path, _, names in os.walk(self.dicomDirectory):
+      for name in sorted(names):
+        if name not in CaseManifest.IGNORED_FILES:
+          members.append(os.path.relpath(os.path.join(path, name), self.caseDirectory).replace(os.sep, "/"))
+    keptMembers = self._getKeptMembers(members) if os.path.exists(self.lazyMarkerPath) else []
+    if not self.exists() or not self._matches(members, keptMembers):
+      self._write(members, compression, keptMembers)
+    shutil.rmtree(self.dicomDirectory)
+    if os.path.exists(self.lazyMarkerPath):
+      os.remove(self.lazyMarkerPath)
+    self._updateSizeAccount()
+
+  def _getKeptMembers(self, members):
+    """Returns the members of a lazily unpacked case which are still only in the archive."""
+    members = set(members)
+    return [member for member in self.index["modifiedTimes"] if member not in members]
+
+  def _matches(self, members, keptMembers=()):
+    try:
+      modifiedTimes = self.index["modifiedTimes"]
+    except (KeyError, ValueError, zipfile.BadZipfile) as exc:
+      logging.debug("Rewriting archive %s: %s" % (self.path, exc))
+      return False
+    return set(members) | set(keptMembers) == set(modifiedTimes) and \
+      all(os.stat(os.path.join(self.caseDirectory, *member.split("/"))).st_mtime == modifiedTimes[member]
+          for member in members)
+
+  def _write(self, members, compression, keptMembers=()):
+    manifest = CaseManifest(self.caseDirectory)
+    index = {"version": self.VERSION, "series": {}, "modifiedTimes": {}, "header": {}}
+    if keptMembers:
+      previousIndex = self.index
+      index["header"] = dict(previousIndex.get("header", {}))
+      keptSeries = dict((member, (directory, series)) for directory, seriesMembers in previousIndex["series"].items()
+                        for series, seriesMemberList in seriesMembers.items() for member in seriesMemberList)
+    temporaryPath = self.path + ".partial"
+    try:
+      with zipfile.ZipFile(temporaryPath, "w", compression, allowZip64=True) as archive:
+        if keptMembers:
+          with zipfile.ZipFile(self.path) as previousArchive:
+            for member in keptMembers:
+              archive.writestr(previousArchive.getinfo(member), previousArchive.read(member))
+              if member in keptSeries:
+                directory, series = keptSeries[member]
+                index["series"].setdefault(directory, {}).setdefault(series, []).append(member)
+              index["modifiedTimes"][member] = previousIndex["modifiedTimes"][member]
+        for member in members:
+          fullPath = os.path.join(self.caseDirectory, *member.split("/"))
+          entry = manifest.entries.get(member)
+          values = None if entry and index["header"] else self._readHeader(fullPath)
+          if values and not index["header"]:
+            index["header"] = {"patientID": values.get(HEADERTAGS.PATIENT_ID),
+                               "studyDate": values.get(HEADERTAGS.STUDY_DATE)}
+          series = entry.get("series") if entry else getSeriesNumberDescription(values)
+          if series:
+            index["series"].setdefault(os.path.dirname(member), {}).setdefault(series, []).append(member)
+          index["modifiedTimes"][member] = os.stat(fullPath).st_mtime
+          archive.write(fullPath, member)
+        archive.writestr(self.INDEX_MEMBER, json.dumps(index))
+      with zipfile.ZipFile(temporaryPath) as archive:
+        if len(archive.namelist()) != len(members) + len(keptMembers) + 1:
+          raise IOError("Archive %s is incomplete" % temporaryPath)
+      os.replace(temporaryPath, self.path)
+    except BaseException:
+      if os.path.exists(temporaryPath):
+        os.remove(temporaryPath)
+      raise
+    self._index = index
+
+  def _readHeader(self, path):
+    try:
+      return self.metadataCache.getValues(path, allowFallback=False)
+    except (DICOMHeaderError, IOError, OSError, ValueError):
+      return None
+
+  def extract(self, members, destination=None):
+    destination = destination or self.caseDirectory
+    modifiedTimes = self.index["modifiedTimes"]
+    with zipfile.ZipFile(self.path) as archive:
+      for member in members:
+        archive.extract(member, destination)
+        if member in modifiedTimes:
+          path = os.path.join(destination, *member.split("/"))
+          os.utime(path, (modifiedTimes[member], modifiedTimes[member]))
+    return [os.path.join(destination, *member.split("/")) for member in members]
+
+  def extractSeries(self, series, destination=None, directory=INTRAOP_DIRECTORY):
+    """Extracts the members of a series which are not unpacked yet and returns the paths of all its members."""
+    destination = destination or self.caseDirectory
+    members = self.getSeriesMembers(series, directory)
+    self.extract([member for member in members if not os.path.exists(os.path.join(destination, *member.split("/")))],
+                 destination)
+    return [os.path.join(destination, *member.split("/")) for member in members]
+
+  def unpack(self, lazyDirectories=()):
+    """Restores the DICOM directory next to the archive, so the case can be opened and modified again. The series of
+    lazyDirectories (e.g. INTRAOP_DIRECTORY) stay in the archive until extractSeries() is called for them."""
+    lazyMembers = set(member for directory in lazyDirectories
+                      for members in self.index["series"].get(directory, {}).values() for member in members)
+    if lazyMembers:
+      with open(self.lazyMarkerPath, "w"):
+        pass
+    self.extract([member for member in self.index["modifiedTimes"] if member not in lazyMembers])
+    if not lazyMembers and os.path.exists(self.lazyMarkerPath):
+      os.remove(self.lazyMarkerPath)
+    for directory in lazyDirectories:
+      path = os.path.join(self.caseDirectory, *directory.split("/"))
+      if not os.path.exists(path):
+        os.makedirs(path)
+    self._updateSizeAccount()
+
+  def _updateSizeAccount(self):
+    sizeAccount = CaseSizeAccount(self.caseDirectory)
+    sizeAccount.rebuild()
+    sizeAccount.save()
+
+
+class CaseArchiver(object):
+  """Packs completed cases into CaseArchive containers on a background thread, one case at a time."""
+
+  def __init__(self, metadataCache=None):
+    self.metadataCache = metadataCache
+    self._queue = queue.Queue()
+    self._lock = threading.Lock()
+    self._archived = threading.Condition(self._lock)
+    self._pending = []
+    self._results = queue.Queue()
+    self._thread = None
+
+  def archive(self, caseDirectory):
+    with self._lock:
+      if caseDirectory in self._pending:
+        return
+      self._pending.append(caseDirectory)
+    self._queue.put(caseDirectory)
+    if not self._thread or not self._thread.is_alive():
+      self._thread = threading.Thread(target=self._work, name="CaseArchiver")
+      self._thread.daemon = True
+      self._thread.start()
+
+  def isPending(self, caseDirectory):
+    with self._lock:
+      return caseDirectory in self._pending
+
+  @property
+  def idle(self):
+    with self._lock:
+      return not self._pending
+
+  def wait(self, caseDirectory=None, timeout=None):
+    """Waits until caseDirectory (or every pending case) has been archived. Returns False on timeout."""
+    with self._archived:
+      return self._archived.wait_for(lambda: caseDirectory not in self._pending if caseDirectory else not self._pending,
+                                     timeout)
+
+  def poll(self):
+    """Returns (caseDirectory, error) of the cases archived since the last call."""
+    results = []
+    while True:
+      try:
+        results.append(self._results.get_nowait())
+      except queue.Empty:
+        return results
+
+  def _work(self):
+    while True:
+      caseDirectory = self._queue.get()
+      error = None
+      try:
+        CaseArchive(caseDirectory, self.metadataCache).pack()
+      except Exception as exc:
+        logging.warning("Could not archive case %s: %s" % (caseDirectory, exc))
+        error = str(exc)
+      finally:
+        self._results.put((caseDirectory, error))
+        with self._archived:
+          self._pending.remove(caseDirectory)
+          self._archived.notify_all()
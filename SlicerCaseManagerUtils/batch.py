@@ -0,0 +1,196 @@
+"""Headless case creation, intraop import, manifest building and preprocessing for many cases. Cases are processed on
+parallel worker threads (the work is I/O bound or runs in converter processes, and forking Slicer is unsafe) and a
+JSON summary with the duration of every stage is written at the end. Runs with a
+plain Python interpreter or inside Slicer:
+
+  python batch.py --summary summary.json /data/cases/Case001-20170101 /data/cases/Case002-20170102
+  python batch.py --root /data/cases --create 5 --summary summary.json
+  Slicer --no-splash --no-main-window --python-script batch.py --preprocess --summary summary.json <caseDirectory>...
+
+Preprocessing runs the preop converter in a separate Slicer process per series and needs --slicer (or Slicer itself).
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+if __name__ == "__main__":
+  sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from SlicerCaseManagerUtils.catalog import CaseCatalog, formatCaseName
+from SlicerCaseManagerUtils.database import CaseDICOMDatabase
+from SlicerCaseManagerUtils.helpers import writeJSONAtomically
+from SlicerCaseManagerUtils.instances import InstanceIndex
+from SlicerCaseManagerUtils.layout import CaseLayout
+from SlicerCaseManagerUtils.manifest import CaseManifest
+from SlicerCaseManagerUtils.metadata import DICOMHeaderError, getSeriesNumberDescription, getSharedMetadataCache
+from SlicerCaseManagerUtils.preprocessing import CONVERSION_SCRIPT, REQUIRED_PREOP_SERIES_PATTERN, PreopPreprocessor
+from SlicerCaseManagerUtils.storage import CaseSizeAccount
+
+CASE_LAYOUT = CaseLayout(directories=["DICOM/Preop", "DICOM/Intraop"])
+
+
+def createCases(rootDirectory, count):
+  """Creates count new case directories named like the widget does. Runs before the workers start, because case
+  numbers are handed out by the catalog of the root directory."""
+  catalog = CaseCatalog(rootDirectory)
+  catalog.refresh()
+  firstNumber = catalog.getNextCaseNumber()
+  names = [formatCaseName(number) for number in range(firstNumber, firstNumber + count)]
+  caseDirectories = CASE_LAYOUT.createCases(rootDirectory, names)
+  for name in names:
+    catalog.add(name, save=False)
+  catalog.save()
+  return caseDirectories
+
+
+def importIntraopData(caseDirectory, manifest, sizeAccount, instanceIndex, metadataCache):
+  """Indexes the new and changed intraop files of a case. files counts the instances of the case, i.e. the files
+  which belong to a series; files whose header could not be read or holds none of the read tags (e.g. files which
+  are not DICOM) are only counted as unreadableFiles."""
+  intraopDirectory = os.path.join(caseDirectory, "DICOM", "Intraop")
+  changedFiles, unchangedFiles = manifest.scan(intraopDirectory)
+  series = set(s for _, s in unchangedFiles if s)
+  indexedFiles = []
+  importedFiles = 0
+  duplicates = 0
+  unreadable = 0
+  for name in changedFiles:
+    path = os.path.join(intraopDirectory, name)
+    try:
+      values = metadataCache.getValues(path, allowFallback=False)
+      if not any(values.values()):
+        raise DICOMHeaderError("%s has no DICOM header" % path)
+      if instanceIndex.isDuplicate(path, values):
+        duplicates += 1
+        continue
+      seriesNumberDescription = getSeriesNumberDescription(values)
+      indexedFiles.append((path, values))
+    except (DICOMHeaderError, IOError, OSError, ValueError) as exc:
+      logging.debug("Could not read header of %s: %s" % (path, exc))
+      seriesNumberDescription = None
+      unreadable += 1
+    entry = manifest.record(path, seriesNumberDescription)
+    sizeAccount.record(path, entry["size"])
+    if seriesNumberDescription:
+      series.add(seriesNumberDescription)
+      importedFiles += 1
+  database = CaseDICOMDatabase(caseDirectory)
+  try:
+    database.addFiles(indexedFiles)
+  finally:
+    database.close()
+  return {"files": importedFiles + len([s for _, s in unchangedFiles if s]), "importedFiles": importedFiles,
+          "duplicateFiles": duplicates, "unreadableFiles": unreadable, "series": len(series)}
+
+
+def preprocessPreopData(caseDirectory, command, metadataCache):
+  preopDirectory = os.path.join(caseDirectory, "DICOM", "Preop")
+  files = [os.path.join(path, name) for path, _, names in os.walk(preopDirectory)
+           for name in names if name not in CaseManifest.IGNORED_FILES]
+  preprocessor = PreopPreprocessor(os.path.join(caseDirectory, "mpReviewPreprocessed"), command,
+                                   metadataCache=metadataCache, workers=1)
+  preprocessor.start(files, REQUIRED_PREOP_SERIES_PATTERN)
+  results = preprocessor.wait()
+  return {"preopSeries": preprocessor.total, "convertedSeries": len([r for r in results if not r["skipped"]]),
+          "failedSeries": len([r for r in results if r["error"]])}
+
+
+def processCase(job):
+  """Runs all stages for one case and returns its result with the duration of every stage in seconds."""
+  caseDirectory = job["caseDirectory"]
+  metadataCache = getSharedMetadataCache()
+  result = {"caseDirectory": caseDirectory, "stages": {}, "error": None}
+
+  def runStage(name, function, *args):
+    start = time.time()
+    try:
+      return function(*args)
+    finally:
+      result["stages"][name] = time.time() - start
+
+  try:
+    runStage("create", CASE_LAYOUT.materialize, caseDirectory, True)
+    manifest, sizeAccount, instanceIndex = (CaseManifest(caseDirectory), CaseSizeAccount(caseDirectory),
+                                            InstanceIndex(caseDirectory))
+    result.update(runStage("import", importIntraopData, caseDirectory, manifest, sizeAccount, instanceIndex,
+                           metadataCache))
+    runStage("manifest", lambda: (manifest.save(), sizeAccount.save(), instanceIndex.save()))
+    if job.get("converterCommand"):
+      result.update(runStage("preprocessing", preprocessPreopData, caseDirectory, job["converterCommand"],
+                             metadataCache))
+  except Exception as exc:
+    logging.exception("Processing case %s failed" % caseDirectory)
+    result["error"] = str(exc)
+  return result
+
+
+def runBatch(caseDirectories, workers=None, converterCommand=None):
+  jobs = [{"caseDirectory": os.path.abspath(d), "converterCommand": converterCommand} for d in caseDirectories]
+  workers = min(workers or os.cpu_count() or 1, len(jobs)) or 1
+  start = time.time()
+  if workers == 1:
+    results = [processCase(job) for job in jobs]
+  else:
+    pool = ThreadPool(workers)
+    try:
+      results = pool.map(processCase, jobs, chunksize=1)
+    finally:
+      pool.close()
+      pool.join()
+  stageTotals = {}
+  for result in results:
+    for stage, duration in result["stages"].items():
+      stageTotals[stage] = stageTotals.get(stage, 0.0) + duration
+  return {"started": datetime.datetime.fromtimestamp(start).isoformat(), "duration": time.time() - start,
+          "workers": workers, "cases": results, "stageTotals": stageTotals,
+          "failedCases": len([r for r in results if r["error"]])}
+
+
+def getConverterCommand(slicerExecutable=None):
+  if not slicerExecutable:
+    try:
+      import slicer
+      slicerExecutable = slicer.app.launcherExecutableFilePath
+    except (ImportError, AttributeError):
+      raise ValueError("Preprocessing needs the Slicer executable (--slicer) when not run inside Slicer")
+  return [slicerExecutable, "--no-splash", "--no-main-window", "--python-script", CONVERSION_SCRIPT]
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Creates, imports, indexes and preprocesses cases without the GUI")
+  parser.add_argument("caseDirectories", nargs="*", help="case directories to process")
+  parser.add_argument("--root", help="cases root directory; processes all of its cases unless --create is given")
+  parser.add_argument("--create", type=int, default=0, help="number of new cases to create in --root")
+  parser.add_argument("--preprocess", action="store_true", help="preprocess the preop data of every case")
+  parser.add_argument("--slicer", help="Slicer executable used for preprocessing")
+  parser.add_argument("--workers", type=int, default=None, help="number of worker threads")
+  parser.add_argument("--summary", help="JSON file to write the summary to (default: standard output)")
+  args = parser.parse_args(argv)
+
+  caseDirectories = list(args.caseDirectories)
+  if args.root:
+    if args.create:
+      caseDirectories += createCases(args.root, args.create)
+    elif not caseDirectories:
+      catalog = CaseCatalog(args.root)
+      catalog.refresh()
+      caseDirectories = [catalog.getCaseDirectory(name) for name in catalog.getCaseNames()]
+  if not caseDirectories:
+    parser.error("No case directories given")
+
+  summary = runBatch(caseDirectories, args.workers,
+                     getConverterCommand(args.slicer) if args.preprocess else None)
+  if args.summary:
+    writeJSONAtomically(args.summary, summary, indent=2)
+  else:
+    print(json.dumps(summary, indent=2))
+  return 1 if summary["failedCases"] else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,156 @@
+import datetime
+import json
+import logging
+import os
+import re
+
+from SlicerCaseManagerUtils.helpers import readJSON
+from SlicerCaseManagerUtils.instrumentation import getSharedInstrumentation
+
+CASE_PREFIX = "Case"
+CASE_SUFFIX_PATTERN = "-[0-9]{8}"
+CASE_NUMBER_DIGITS = 3
+
+
+def formatCaseName(caseNumber, date=None):
+  """Returns the directory name of a case, e.g. Case001-20170101; date defaults to today."""
+  date = date or datetime.date.today()
+  return CASE_PREFIX + ("%0" + str(CASE_NUMBER_DIGITS) + "d") % caseNumber + "-" + date.strftime("%Y%m%d")
+
+
+class CaseCatalog(object):
+  """Cached listing of the case directories below a cases root directory. The root is only listed again when its
+  mtime changed, so the next case number and existence checks are answered from memory."""
+
+  FILE_NAME = ".caseCatalog.json"
+  VERSION = 1
+
+  def __init__(self, rootDirectory, prefix=CASE_PREFIX, suffixPattern=CASE_SUFFIX_PATTERN, digits=CASE_NUMBER_DIGITS):
+    self.rootDirectory = rootDirectory
+    self.path = os.path.join(rootDirectory, self.FILE_NAME)
+    self.prefix = prefix
+    self.suffixPattern = suffixPattern
+    self.pattern = re.compile(prefix + "[0-9]{" + str(digits - 1) + "}[0-9]{1}" + suffixPattern)
+    self.cases = {}
+    self.rootModifiedTime = None
+    self.load()
+    self.refresh()
+
+  def load(self):
+    data = readJSON(self.path, default={})
+    if data.get("version") == self.VERSION:
+      self.cases = data.get("cases", {})
+      self.rootModifiedTime = data.get("rootModifiedTime")
+
+  def save(self):
+    # written in place: replacing the file would change the mtime of the root directory and invalidate the catalog
+    created = not os.path.exists(self.path)
+    try:
+      self._write()
+      if created:
+        self._updateRootModifiedTime()
+        self._write()
+    except (IOError, OSError) as exc:
+      logging.warning("Could not write case catalog %s: %s" % (self.path, exc))
+
+  def _write(self):
+    with open(self.path, "w") as f:
+      json.dump({"version": self.VERSION, "rootModifiedTime": self.rootModifiedTime, "cases": self.cases}, f)
+
+  def refresh(self, force=False):
+    try:
+      rootModifiedTime = os.stat(self.rootDirectory).st_mtime
+    except OSError:
+      self.cases = {}
+      return False
+    if not force and rootModifiedTime == self.rootModifiedTime:
+      return False
+    names = set()
+    with getSharedInstrumentation().span("directoryScan", directory=self.rootDirectory):
+      with os.scandir(self.rootDirectory) as entries:
+        for entry in entries:
+          if self.pattern.match(entry.name) and entry.is_dir():
+            names.add(entry.name)
+    for name in set(self.cases) - names:
+      del self.cases[name]
+    for name in names - set(self.cases):
+      self.cases[name] = self._createEntry(name)
+    self.rootModifiedTime = rootModifiedTime
+    self.save()
+    return True
+
+  def _createEntry(self, name):
+    return {"number": self.getCaseNumber(name), "modifiedTime": None, "completed": None}
+
+  def getCaseNumber(self, name):
+    return int(re.split(self.suffixPattern, name)[0].split(self.prefix)[1])
+
+  def getNextCaseNumber(self):
+    return max([entry["number"] for entry in self.cases.values()] or [0]) + 1
+
+  def exists(self, name):
+    return name in self.cases
+
+  def getCaseNames(self):
+    return sorted(self.cases, key=lambda name: (self.cases[name]["number"], name))
+
+  def getCaseDirectory(self, name):
+    return os.path.join(self.rootDirectory, name)
+
+  def add(self, name, save=True):
+    if name not in self.cases and self.pattern.match(name):
+      self.cases[name] = self._createEntry(name)
+      if save:
+        self.save()
+
+  def _updateRootModifiedTime(self):
+    try:
+      self.rootModifiedTime = os.stat(self.rootDirectory).st_mtime
+    except OSError:
+      pass
+
+  def refreshCase(self, name):
+    """Returns True if the case directory changed since it was last seen, which invalidates its cached state."""
+    entry = self.cases.get(name)
+    if entry is None:
+      return False
+    try:
+      modifiedTime = os.stat(self.getCaseDirectory(name)).st_mtime
+    except OSError:
+      return False
+    if modifiedTime == entry["modifiedTime"]:
+      return False
+    if entry["modifiedTime"] is not None:
+      entry["completed"] = None
+    entry["modifiedTime"] = modifiedTime
+    return True
+
+  def isCompleted(self, name):
+    entry = self.cases.get(name)
+    return entry["completed"] if entry else None
+
+  def setCompleted(self, name, completed=True):
+    entry = self.cases.get(name)
+    if entry is None:
+      return
+    summary = entry.get("summary")
+    if entry["completed"] != completed or (summary and summary.get("completed") != completed):
+      entry["completed"] = completed
+      if summary:
+        summary["completed"] = completed
+      self.save()
+
+  def getSummary(self, name):
+    entry = self.cases.get(name)
+    return (entry.get("summary"), entry.get("summaryStamp")) if entry else (None, None)
+
+  def setSummary(self, name, summary, stamp):
+    entry = self.cases.get(name)
+    if entry is None:
+      return
+    if summary.get("completed") is None:
+      summary["completed"] = entry["completed"]
+    else:
+      entry["completed"] = summary["completed"]
+    entry["summary"] = summary
+    entry["summaryStamp"] = stamp
@@ -0,0 +1,83 @@
+import os
+import sqlite3
+
+from SlicerCaseManagerUtils.metadata import HEADERTAGS
+
+
+class CaseDICOMDatabase(object):
+  """Lightweight SQLite index of the DICOM files of one case, stored inside the case directory. It replaces adding
+  every received file to the global slicer.dicomDatabase, so indexing and queries only depend on the size of the
+  case. Paths are stored relative to the case directory; the files of a case can be added to the global database on
+  demand with getFiles()."""
+
+  FILE_NAME = "caseIndex.sqlite"
+  FILE_NAMES = {FILE_NAME, FILE_NAME + "-wal", FILE_NAME + "-shm", FILE_NAME + "-journal"}
+  SCHEMA_VERSION = 1
+
+  COLUMNS = (("sopInstanceUID", HEADERTAGS.SOP_INSTANCE_UID),
+             ("seriesInstanceUID", HEADERTAGS.SERIES_INSTANCE_UID),
+             ("studyInstanceUID", HEADERTAGS.STUDY_INSTANCE_UID),
+             ("patientID", HEADERTAGS.PATIENT_ID),
+             ("patientName", HEADERTAGS.PATIENT_NAME),
+             ("studyDate", HEADERTAGS.STUDY_DATE),
+             ("seriesNumber", HEADERTAGS.SERIES_NUMBER),
+             ("seriesDescription", HEADERTAGS.SERIES_DESCRIPTION),
+             ("modality", HEADERTAGS.MODALITY))
+
+  def __init__(self, caseDirectory):
+    self.caseDirectory = caseDirectory
+    self.path = os.path.join(caseDirectory, self.FILE_NAME)
+    self._connection = None
+
+  @property
+  def connection(self):
+    if self._connection is None:
+      self._connection = sqlite3.connect(self.path)
+      self._connection.execute("PRAGMA journal_mode=WAL")
+      self._connection.execute("PRAGMA synchronous=NORMAL")
+      version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+      if version != self.SCHEMA_VERSION:
+        self._createSchema()
+    return self._connection
+
+  def _createSchema(self):
+    with self._connection:
+      self._connection.execute("DROP TABLE IF EXISTS files")
+      self._connection.execute("CREATE TABLE files (path TEXT PRIMARY KEY, mtime REAL, size INTEGER, %s)"
+                               % ", ".join("%s TEXT" % name for name, _ in self.COLUMNS))
+      self._connection.execute("CREATE INDEX filesSeries ON files (seriesInstanceUID)")
+      self._connection.execute("CREATE INDEX filesSOPInstance ON files (sopInstanceUID)")
+      self._connection.execute("PRAGMA user_version=%d" % self.SCHEMA_VERSION)
+
+  def close(self):
+    if self._connection is not None:
+      self._connection.close()
+      self._connection = None
+
+  def relativePath(self, path):
+    return os.path.relpath(path, self.caseDirectory).replace(os.sep, "/")
+
+  def addFiles(self, files):
+    """Adds or updates (path, values) pairs, values being the header values of the file, in one transaction. Files
+    which no longer exist are skipped."""
+    rows = []
+    for path, values in files:
+      try:
+        stat = os.stat(path)
+      except OSError:
+        continue
+      rows.append([self.relativePath(path), stat.st_mtime, stat.st_size] +
+                  [values.get(tag) or None for _, tag in self.COLUMNS])
+    if not rows:
+      return 0
+    with self.connection:
+      self.connection.executemany("INSERT OR REPLACE INTO files VALUES (%s)" % ", ".join("?" * len(rows[0])), rows)
+    return len(rows)
+
+  def getFiles(self, seriesInstanceUID=None):
+    if seriesInstanceUID is None:
+      cursor = self.connection.execute("SELECT path FROM files ORDER BY path")
+    else:
+      cursor = self.connection.execute("SELECT path FROM files WHERE seriesInstanceUID = ? ORDER BY path",
+                                       (seriesInstanceUID,))
+    return [os.path.join(self.caseDirectory, *path.split("/")) for path, in cursor]
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+
+FileIndexed = namedtuple("FileIndexed", ["path", "total", "current"])
+ImageDataReceived = namedtuple("ImageDataReceived", ["files"])
+StatusChanged = namedtuple("StatusChanged", ["status"])
+
+
+class Subscription(object):
+
+  def __init__(self, eventType, callback, minInterval=None, batch=False):
+    self.eventType = eventType
+    self.callback = callback
+    self.minInterval = minInterval
+    self.batch = batch
+    self.lastDelivery = None
+    self.pending = []
+    self.scheduled = False
+
+
+class EventChannel(object):
+  """Dispatches case logic events with typed payloads (the namedtuples above), passed by reference. A subscription
+  can be rate limited: within minInterval only the latest payload is kept, or all payloads are collected when batch
+  is True, and delivered when the interval has passed. Pending payloads are delivered through scheduler(delay,
+  function) if given, otherwise with the next publish() or flush()."""
+
+  def __init__(self, scheduler=None):
+    self.scheduler = scheduler
+    self._subscriptions = {}
+    self._lock = threading.RLock()
+
+  def subscribe(self, eventType, callback, minInterval=None, batch=False):
+    subscription = Subscription(eventType, callback, minInterval, batch)
+    with self._lock:
+      self._subscriptions.setdefault(eventType, []).append(subscription)
+    return subscription
+
+  def unsubscribe(self, subscription):
+    with self._lock:
+      subscriptions = self._subscriptions.get(subscription.eventType, [])
+      if subscription in subscriptions:
+        subscriptions.remove(subscription)
+
+  def hasSubscribers(self, eventType):
+    return bool(self._subscriptions.get(eventType))
+
+  def publish(self, payload, force=False):
+    """Publishes payload to the subscribers of its type. force delivers immediately, e.g. the final progress."""
+    now = time.time()
+    deliveries = []
+    with self._lock:
+      for subscription in list(self._subscriptions.get(type(payload), [])):
+        if subscription.batch:
+          subscription.pending.append(payload)
+        else:
+          subscription.pending = [payload]
+        if force or subscription.minInterval is None or subscription.lastDelivery is None or \
+           now - subscription.lastDelivery >= subscription.minInterval:
+          deliveries.append(self._take(subscription, now))
+        elif not subscription.scheduled and self.scheduler:
+          subscription.scheduled = True
+          self.scheduler(subscription.lastDelivery + subscription.minInterval - now,
+                         lambda subscription=subscription: self._flushSubscription(subscription))
+    for subscription, payloads in deliveries:
+      self._deliver(subscription, payloads)
+
+  def flush(self, eventType=None):
+    with self._lock:
+      subscriptions = [s for eventSubscriptions in self._subscriptions.values() for s in eventSubscriptions
+                       if eventType is None or s.eventType is eventType]
+    for subscription in subscriptions:
+      self._flushSubscription(subscription)
+
+  def _flushSubscription(self, subscription):
+    with self._lock:
+      subscription.scheduled = False
+      if not subscription.pending:
+        return
+      subscription, payloads = self._take(subscription, time.time())
+    self._deliver(subscription, payloads)
+
+  def _take(self, subscription, now):
+    payloads, subscription.pending = subscription.pending, []
+    subscription.lastDelivery = now
+    return subscription, payloads
+
+  def _deliver(self, subscription, payloads):
+    try:
+      subscription.callback(payloads if subscription.batch else payloads[-1])
+    except Exception:
+      logging.exception("Event subscriber for %s failed" % subscription.eventType.__name__)
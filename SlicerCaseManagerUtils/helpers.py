@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+
+from SlicerCaseManagerUtils.instrumentation import getSharedInstrumentation
+
+
+def writeJSONAtomically(path, data, **kwargs):
+  with getSharedInstrumentation().span("json.save", path=path):
+    _writeJSONAtomically(path, data, **kwargs)
+
+
+def _writeJSONAtomically(path, data, **kwargs):
+  directory = os.path.dirname(path) or "."
+  handle, temporaryPath = tempfile.mkstemp(prefix=".%s." % os.path.basename(path), dir=directory)
+  try:
+    with os.fdopen(handle, "w") as f:
+      json.dump(data, f, **kwargs)
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(temporaryPath, path)
+  except BaseException:
+    if os.path.exists(temporaryPath):
+      os.remove(temporaryPath)
+    raise
+
+
+def readJSON(path, default=None):
+  with getSharedInstrumentation().span("json.load", path=path):
+    try:
+      with open(path) as f:
+        return json.load(f)
+    except (IOError, OSError, ValueError):
+      return default
+
+
+def directoryHasEntries(directory):
+  try:
+    with os.scandir(directory) as entries:
+      for entry in entries:
+        if entry.name != ".DS_Store":
+          return True
+  except OSError:
+    pass
+  return False
+
+
+def directoryContainsData(directory, ignoredNames=()):
+  """Returns True as soon as a non-empty file is found below directory, ignoring files named in ignoredNames."""
+  try:
+    with os.scandir(directory) as entries:
+      subDirectories = []
+      for entry in entries:
+        if entry.name in ignoredNames:
+          continue
+        if entry.is_dir(follow_symlinks=False):
+          subDirectories.append(entry.path)
+        elif entry.stat(follow_symlinks=False).st_size > 0:
+          return True
+  except OSError:
+    return False
+  return any(directoryContainsData(subDirectory, ignoredNames) for subDirectory in subDirectories)
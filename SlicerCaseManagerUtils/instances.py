@@ -0,0 +1,82 @@
+import hashlib
+import logging
+import os
+import threading
+
+from SlicerCaseManagerUtils.helpers import readJSON, writeJSONAtomically
+from SlicerCaseManagerUtils.metadata import HEADERTAGS
+
+
+def computeFileDigest(path, chunkSize=1 << 20):
+  digest = hashlib.sha1()
+  with open(path, "rb") as f:
+    for chunk in iter(lambda: f.read(chunkSize), b""):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+class InstanceIndex(object):
+  """Per-case index of the stored DICOM instances by SOPInstanceUID, with the size and content digest recorded when
+  the instance was indexed. A received file whose SOPInstanceUID is already stored under another path is a repeated
+  send only if it has the same size and digest: it is removed before indexing, so every instance is stored, indexed
+  and loaded once. A file which shares the SOPInstanceUID but differs in content is kept. The stored instance is
+  never read again."""
+
+  FILE_NAME = "instanceIndex.json"
+  VERSION = 3
+
+  def __init__(self, caseDirectory):
+    self.caseDirectory = caseDirectory
+    self.path = os.path.join(caseDirectory, self.FILE_NAME)
+    self.instances = {}
+    self.duplicates = 0
+    self.modified = False
+    self._lock = threading.Lock()
+    self.load()
+
+  def load(self):
+    data = readJSON(self.path, default={})
+    self.instances = data.get("instances", {}) if data.get("version") == self.VERSION else {}
+    self.modified = False
+
+  def save(self):
+    with self._lock:
+      if not self.modified or not os.path.isdir(self.caseDirectory):
+        return
+      data = {"version": self.VERSION, "instances": dict(self.instances)}
+      self.modified = False
+    writeJSONAtomically(self.path, data)
+
+  def relativePath(self, path):
+    return os.path.relpath(path, self.caseDirectory).replace(os.sep, "/")
+
+  def isDuplicate(self, path, values, removeDuplicate=True):
+    """Registers the instance in path and returns False, or returns True (and removes path unless removeDuplicate is
+    False) if the same instance is already stored."""
+    sopInstanceUID = values.get(HEADERTAGS.SOP_INSTANCE_UID)
+    if not sopInstanceUID:
+      return False
+    relativePath = self.relativePath(path)
+    with self._lock:
+      entry = self.instances.get(sopInstanceUID)
+      entry = dict(entry) if entry is not None and entry["path"] != relativePath else None
+    storedPath = os.path.join(self.caseDirectory, entry["path"]) if entry else None
+    size = os.path.getsize(path)
+    digest = computeFileDigest(path)
+    if entry is None or not os.path.exists(storedPath):
+      with self._lock:
+        self._register(sopInstanceUID, relativePath, size, digest)
+      return False
+    if entry["size"] != size or entry["digest"] != digest:
+      logging.warning("%s and %s share SOPInstanceUID %s but differ in content" % (path, storedPath, sopInstanceUID))
+      return False
+    with self._lock:
+      self.duplicates += 1
+    if removeDuplicate:
+      os.remove(path)
+    logging.debug("%s is a repeated send of %s" % (path, storedPath))
+    return True
+
+  def _register(self, sopInstanceUID, relativePath, size, digest):
+    self.instances[sopInstanceUID] = {"path": relativePath, "size": size, "digest": digest}
+    self.modified = True
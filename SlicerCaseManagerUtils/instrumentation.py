@@ -0,0 +1,175 @@
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+
+
+class _NullSpan(object):
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, excType, exc, traceback):
+    return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span(object):
+
+  __slots__ = ("instrumentation", "name", "attributes", "start")
+
+  def __init__(self, instrumentation, name, attributes):
+    self.instrumentation = instrumentation
+    self.name = name
+    self.attributes = attributes
+    self.start = None
+
+  def __enter__(self):
+    self.start = time.perf_counter()
+    return self
+
+  def __exit__(self, excType, exc, traceback):
+    if excType is not None:
+      self.attributes["error"] = excType.__name__
+    self.instrumentation.record(self.name, time.perf_counter() - self.start, **self.attributes)
+    return False
+
+
+class Instrumentation(object):
+  """Collects durations (spans) and counters of the case manager hot paths and appends every span to a rotating
+  trace file of the current case. While disabled, span() returns a shared no-op context manager and count() returns
+  immediately."""
+
+  TRACE_DIRECTORY_NAME = ".caseManagerTrace"
+  TRACE_FILE_NAME = "trace.jsonl"
+  MAX_TRACE_BYTES = 5 * 1024 ** 2
+  TRACE_BACKUP_COUNT = 3
+
+  def __init__(self, enabled=False):
+    self.enabled = enabled
+    self.spans = {}
+    self.counters = {}
+    self.traceDirectory = None
+    self._traceHandler = None
+    self._lock = threading.Lock()
+    self.traceLogger = logging.getLogger("SlicerCaseManager.trace")
+    self.traceLogger.propagate = False
+    self.traceLogger.setLevel(logging.INFO)
+
+  def span(self, name, **attributes):
+    if not self.enabled:
+      return NULL_SPAN
+    return Span(self, name, attributes)
+
+  def count(self, name, value=1):
+    if not self.enabled:
+      return
+    with self._lock:
+      self.counters[name] = self.counters.get(name, 0) + value
+
+  def record(self, name, duration, **attributes):
+    if not self.enabled:
+      return
+    with self._lock:
+      statistics = self.spans.get(name)
+      if statistics is None:
+        statistics = self.spans[name] = {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+      statistics["count"] += 1
+      statistics["total"] += duration
+      statistics["max"] = max(statistics["max"], duration)
+      statistics["last"] = duration
+      handler = self._getTraceHandler()
+    if handler:
+      entry = {"time": time.time(), "span": name, "duration": duration, "thread": threading.current_thread().name}
+      entry.update(attributes)
+      self.traceLogger.info(json.dumps(entry, default=str))
+
+  def getStatistics(self):
+    with self._lock:
+      return {"spans": {name: dict(statistics) for name, statistics in self.spans.items()},
+              "counters": dict(self.counters)}
+
+  def reset(self):
+    with self._lock:
+      self.spans = {}
+      self.counters = {}
+
+  def startTrace(self, caseDirectory):
+    """Traces spans into caseDirectory from now on. The trace file is only created once a span is recorded."""
+    self.stopTrace()
+    with self._lock:
+      self.traceDirectory = os.path.join(caseDirectory, self.TRACE_DIRECTORY_NAME) if caseDirectory else None
+
+  def stopTrace(self):
+    with self._lock:
+      self.traceDirectory = None
+      if self._traceHandler:
+        self.traceLogger.removeHandler(self._traceHandler)
+        self._traceHandler.close()
+        self._traceHandler = None
+
+  def _getTraceHandler(self):
+    if self._traceHandler or not self.traceDirectory:
+      return self._traceHandler
+    try:
+      if not os.path.exists(self.traceDirectory):
+        os.makedirs(self.traceDirectory)
+      self._traceHandler = logging.handlers.RotatingFileHandler(
+        os.path.join(self.traceDirectory, self.TRACE_FILE_NAME), maxBytes=self.MAX_TRACE_BYTES,
+        backupCount=self.TRACE_BACKUP_COUNT)
+    except (IOError, OSError) as exc:
+      logging.warning("Could not create trace in %s: %s" % (self.traceDirectory, exc))
+      self.traceDirectory = None
+      return None
+    self._traceHandler.setFormatter(logging.Formatter("%(message)s"))
+    self.traceLogger.addHandler(self._traceHandler)
+    return self._traceHandler
+
+
+class Stopwatch(object):
+  """Measures the time until something is done, e.g. until an opened case is interactive, leaving out the time
+  spent in calls run through runExcluded(), such as modal dialogs waiting for the user."""
+
+  def __init__(self, clock=time.time):
+    self.clock = clock
+    self.startTime = None
+
+  @property
+  def running(self):
+    return self.startTime is not None
+
+  def start(self):
+    self.startTime = self.clock()
+
+  def cancel(self):
+    self.startTime = None
+
+  def stop(self):
+    """Returns the measured time, or None if the stopwatch was not running."""
+    if self.startTime is None:
+      return None
+    elapsed = self.clock() - self.startTime
+    self.startTime = None
+    return elapsed
+
+  def runExcluded(self, function, *args, **kwargs):
+    start = self.clock()
+    try:
+      return function(*args, **kwargs)
+    finally:
+      if self.startTime is not None:
+        self.startTime += self.clock() - start
+
+
+_sharedInstrumentation = None
+
+
+def getSharedInstrumentation():
+  global _sharedInstrumentation
+  if _sharedInstrumentation is None:
+    _sharedInstrumentation = Instrumentation()
+  return _sharedInstrumentation
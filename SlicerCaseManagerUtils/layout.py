@@ -0,0 +1,53 @@
+import os
+from multiprocessing.pool import ThreadPool
+
+from SlicerCaseManagerUtils.manifest import CaseManifest
+
+
+class CaseLayout(object):
+  """Declarative description of the tree of a new case: directories (relative, "/" separated), placeholder files
+  (relative path -> content) and whether an empty manifest is written. Only the leaf directories are created, each
+  with a single makedirs call."""
+
+  DEFAULT_WORKERS = 8
+
+  def __init__(self, directories=(), placeholderFiles=None, createManifest=True):
+    self.placeholderFiles = dict(placeholderFiles or {})
+    self.createManifest = createManifest
+    directories = set(d.strip("/") for d in directories)
+    directories.update(os.path.dirname(path) for path in self.placeholderFiles)
+    directories.discard("")
+    self.directories = sorted(d for d in directories if not any(other.startswith(d + "/") for other in directories))
+
+  def withDirectories(self, directories):
+    """Returns a copy of this layout with other directories but the same placeholder files and manifest setting."""
+    return CaseLayout(directories, self.placeholderFiles, self.createManifest)
+
+  def materialize(self, caseDirectory, existOk=False):
+    os.makedirs(caseDirectory, exist_ok=existOk)
+    for directory in self.directories:
+      os.makedirs(os.path.join(caseDirectory, *directory.split("/")), exist_ok=True)
+    for path, content in self.placeholderFiles.items():
+      fullPath = os.path.join(caseDirectory, *path.split("/"))
+      if existOk and os.path.exists(fullPath):
+        continue
+      with open(fullPath, "wb" if isinstance(content, bytes) else "w") as f:
+        f.write(content)
+    if self.createManifest and not os.path.exists(os.path.join(caseDirectory, CaseManifest.FILE_NAME)):
+      manifest = CaseManifest(caseDirectory)
+      manifest.modified = True
+      manifest.save()
+    return caseDirectory
+
+  def createCases(self, rootDirectory, names, workers=DEFAULT_WORKERS):
+    """Creates the cases in parallel; most of the time goes into filesystem round trips, which matters on network
+    shares. Returns the case directories in the order of names."""
+    caseDirectories = [os.path.join(rootDirectory, name) for name in names]
+    if len(caseDirectories) < 2:
+      return [self.materialize(caseDirectory) for caseDirectory in caseDirectories]
+    pool = ThreadPool(min(workers, len(caseDirectories)))
+    try:
+      return pool.map(self.materialize, caseDirectories)
+    finally:
+      pool.close()
+      pool.join()
@@ -0,0 +1,76 @@
+import os
+
+from SlicerCaseManagerUtils.helpers import readJSON, writeJSONAtomically
+from SlicerCaseManagerUtils.instrumentation import getSharedInstrumentation
+
+
+class CaseManifest(object):
+  """Per-case record of already indexed files (mtime, size and series assignment), so that reopening a case only
+  needs to stat its files and process the new or changed ones."""
+
+  FILE_NAME = "caseManifest.json"
+  VERSION = 1
+  IGNORED_FILES = {".DS_Store"}
+
+  def __init__(self, caseDirectory):
+    self.caseDirectory = caseDirectory
+    self.path = os.path.join(caseDirectory, self.FILE_NAME)
+    self.entries = {}
+    self.modified = False
+    self.load()
+
+  def load(self):
+    data = readJSON(self.path, default={})
+    self.entries = data.get("files", {}) if data.get("version") == self.VERSION else {}
+    self.modified = False
+
+  def save(self):
+    if not self.modified or not os.path.isdir(self.caseDirectory):
+      return
+    writeJSONAtomically(self.path, {"version": self.VERSION, "files": self.entries})
+    self.modified = False
+
+  def relativePath(self, path):
+    return os.path.relpath(path, self.caseDirectory).replace(os.sep, "/")
+
+  def scan(self, directory):
+    """Returns the names of new or changed files in directory and (name, series) of unchanged ones. Entries of files
+    which disappeared from directory are dropped."""
+    with getSharedInstrumentation().span("directoryScan", directory=directory):
+      return self._scan(directory)
+
+  def _scan(self, directory):
+    changed, unchanged = [], []
+    prefix = self.relativePath(directory) + "/"
+    seen = set()
+    with os.scandir(directory) as entries:
+      for entry in entries:
+        if entry.name in self.IGNORED_FILES or not entry.is_file():
+          continue
+        relativePath = prefix + entry.name
+        seen.add(relativePath)
+        record = self.entries.get(relativePath)
+        stat = entry.stat()
+        if record and record["mtime"] == stat.st_mtime and record["size"] == stat.st_size:
+          unchanged.append((entry.name, record.get("series")))
+        else:
+          changed.append(entry.name)
+    for relativePath in [p for p in self.entries if p.startswith(prefix) and p not in seen]:
+      del self.entries[relativePath]
+      self.modified = True
+    return sorted(changed), sorted(unchanged)
+
+  def record(self, path, series=None, **attributes):
+    stat = os.stat(path)
+    entry = {"mtime": stat.st_mtime, "size": stat.st_size, "series": series}
+    entry.update(attributes)
+    self.entries[self.relativePath(path)] = entry
+    self.modified = True
+    return entry
+
+  def get(self, path):
+    return self.entries.get(self.relativePath(path))
+
+  def remove(self, path):
+    if self.entries.pop(self.relativePath(path), None) is not None:
+      self.modified = True
@@ -0,0 +1,282 @@
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+from SlicerCaseManagerUtils.instrumentation import getSharedInstrumentation
+
+
+class DICOMHeaderError(Exception):
+  pass
+
+
+def normalizeTag(tag):
+  if isinstance(tag, int):
+    return "%04X,%04X" % (tag >> 16, tag & 0xFFFF)
+  group, element = tag.replace("(", "").replace(")", "").split(",")
+  return "%04X,%04X" % (int(group, 16), int(element, 16))
+
+
+def tagToInt(tag):
+  group, element = normalizeTag(tag).split(",")
+  return int(group, 16) << 16 | int(element, 16)
+
+
+class HEADERTAGS(object):
+  PATIENT_NAME = "0010,0010"
+  PATIENT_ID = "0010,0020"
+  PATIENT_BIRTH_DATE = "0010,0030"
+  STUDY_DATE = "0008,0020"
+  STUDY_TIME = "0008,0030"
+  MODALITY = "0008,0060"
+  SOP_INSTANCE_UID = "0008,0018"
+  SERIES_DESCRIPTION = "0008,103E"
+  STUDY_INSTANCE_UID = "0020,000D"
+  SERIES_INSTANCE_UID = "0020,000E"
+  SERIES_NUMBER = "0020,0011"
+
+  DEFAULT = (PATIENT_NAME, PATIENT_ID, PATIENT_BIRTH_DATE, STUDY_DATE, STUDY_TIME, MODALITY, SOP_INSTANCE_UID,
+             SERIES_DESCRIPTION, STUDY_INSTANCE_UID, SERIES_INSTANCE_UID, SERIES_NUMBER)
+
+
+def getSeriesNumberDescription(values):
+  """Returns the "<number>: <description>" name of the series a file with the given header values belongs to."""
+  if not values:
+    return None
+  seriesNumber = values.get(HEADERTAGS.SERIES_NUMBER)
+  seriesDescription = values.get(HEADERTAGS.SERIES_DESCRIPTION)
+  return seriesNumber + ": " + seriesDescription if seriesNumber and seriesDescription else None
+
+
+class DICOMHeaderReader(object):
+  """Minimal DICOM header parser which only decodes the requested tags and stops reading as soon as the largest
+  requested tag (or pixel data) has been passed, so pixel data is never read."""
+
+  PIXEL_DATA = 0x7FE00010
+  ITEM = 0xFFFEE000
+  ITEM_DELIMITER = 0xFFFEE00D
+  SEQUENCE_DELIMITER = 0xFFFEE0DD
+  UNDEFINED_LENGTH = 0xFFFFFFFF
+
+  IMPLICIT_VR_LITTLE_ENDIAN = "1.2.840.10008.1.2"
+  EXPLICIT_VR_BIG_ENDIAN = "1.2.840.10008.1.2.2"
+  DEFLATED_EXPLICIT_VR_LITTLE_ENDIAN = "1.2.840.10008.1.2.1.99"
+
+  LONG_LENGTH_VRS = {b"OB", b"OD", b"OF", b"OL", b"OV", b"OW", b"SQ", b"SV", b"UC", b"UN", b"UR", b"UT", b"UV"}
+  BINARY_VRS = {b"US": "H", b"SS": "h", b"UL": "I", b"SL": "i", b"FL": "f", b"FD": "d"}
+
+  def read(self, path, tags):
+    wanted = {tagToInt(tag): normalizeTag(tag) for tag in tags}
+    values = {tag: "" for tag in wanted.values()}
+    if not wanted:
+      return values
+    with open(path, "rb") as f:
+      explicit, endian = self._readPreamble(f, wanted, values)
+      self._readDataset(f, explicit, endian, wanted, values, max(wanted))
+    return values
+
+  def _readPreamble(self, f, wanted, values):
+    preamble = f.read(132)
+    if len(preamble) == 132 and preamble[128:] == b"DICM":
+      meta = {}
+      while True:
+        position = f.tell()
+        header = f.read(6)
+        if len(header) < 6 or struct.unpack("<H", header[:2])[0] != 0x0002:
+          f.seek(position)
+          break
+        tag, vr, length = self._readElementHeader(f, header, True, "<")
+        meta[tag] = self._decode(f.read(length), vr, "<")
+      transferSyntax = meta.get(0x00020010, "")
+      for tag, name in wanted.items():
+        if tag in meta:
+          values[name] = meta[tag]
+      if transferSyntax == self.DEFLATED_EXPLICIT_VR_LITTLE_ENDIAN:
+        raise DICOMHeaderError("Deflated transfer syntax is not supported")
+      if transferSyntax == self.IMPLICIT_VR_LITTLE_ENDIAN:
+        return False, "<"
+      return True, ">" if transferSyntax == self.EXPLICIT_VR_BIG_ENDIAN else "<"
+    f.seek(0)
+    header = f.read(6)
+    f.seek(0)
+    if len(header) < 6:
+      raise DICOMHeaderError("File is too short to be a DICOM file")
+    return header[4:6].isalpha() and header[4:6].isupper(), "<"
+
+  def _readElementHeader(self, f, header, explicit, endian):
+    group, element = struct.unpack(endian + "HH", header[:4])
+    tag = group << 16 | element
+    if tag in (self.ITEM, self.ITEM_DELIMITER, self.SEQUENCE_DELIMITER):
+      return tag, None, struct.unpack(endian + "I", header[4:6] + self._readExactly(f, 2))[0]
+    if explicit:
+      vr = header[4:6]
+      if vr in self.LONG_LENGTH_VRS:
+        return tag, vr, struct.unpack(endian + "I", self._readExactly(f, 6)[2:])[0]
+      return tag, vr, struct.unpack(endian + "H", self._readExactly(f, 2))[0]
+    return tag, None, struct.unpack(endian + "I", header[4:6] + self._readExactly(f, 2))[0]
+
+  def _readExactly(self, f, size):
+    data = f.read(size)
+    if len(data) != size:
+      raise DICOMHeaderError("Unexpected end of file")
+    return data
+
+  def _readDataset(self, f, explicit, endian, wanted, values, lastTag):
+    while True:
+      header = f.read(6)
+      if len(header) < 6:
+        return
+      tag = struct.unpack(endian + "HH", header[:4])
+      tag = tag[0] << 16 | tag[1]
+      if tag >= self.PIXEL_DATA or tag > lastTag:
+        return
+      tag, vr, length = self._readElementHeader(f, header, explicit, endian)
+      if length == self.UNDEFINED_LENGTH:
+        self._skipSequence(f, explicit, endian)
+      elif tag in wanted:
+        values[wanted[tag]] = self._decode(self._readExactly(f, length), vr, endian)
+      else:
+        f.seek(length, os.SEEK_CUR)
+
+  def _skipSequence(self, f, explicit, endian):
+    while True:
+      tag, _, length = self._readElementHeader(f, self._readExactly(f, 6), explicit, endian)
+      if tag == self.SEQUENCE_DELIMITER:
+        return
+      if tag != self.ITEM:
+        raise DICOMHeaderError("Unexpected tag %s inside sequence" % normalizeTag(tag))
+      if length == self.UNDEFINED_LENGTH:
+        self._skipItem(f, explicit, endian)
+      else:
+        f.seek(length, os.SEEK_CUR)
+
+  def _skipItem(self, f, explicit, endian):
+    while True:
+      tag, _, length = self._readElementHeader(f, self._readExactly(f, 6), explicit, endian)
+      if tag == self.ITEM_DELIMITER:
+        return
+      if length == self.UNDEFINED_LENGTH:
+        self._skipSequence(f, explicit, endian)
+      else:
+        f.seek(length, os.SEEK_CUR)
+
+  def _decode(self, data, vr, endian):
+    if vr in self.BINARY_VRS:
+      fmt = self.BINARY_VRS[vr]
+      count = len(data) // struct.calcsize(fmt)
+      return "\\".join(str(v) for v in struct.unpack(endian + fmt * count, data[:count * struct.calcsize(fmt)]))
+    return data.decode("latin-1").strip("\x00 ")
+
+
+def readHeaderWithPydicom(path, tags):
+  """Reads the header values of files the minimal reader cannot parse (e.g. deflated ones) with pydicom, which ships
+  with Slicer. Multiple values are joined with a backslash, as they are stored."""
+  try:
+    import pydicom
+  except ImportError:
+    raise DICOMHeaderError("%s: pydicom is not available" % path)
+  try:
+    dataset = pydicom.dcmread(path, stop_before_pixels=True)
+  except Exception as exc:
+    raise DICOMHeaderError("%s: %s" % (path, exc))
+  values = {}
+  for tag in tags:
+    element = dataset.get(tagToInt(tag))
+    value = element.value if element is not None else None
+    if isinstance(value, bytes):
+      value = value.decode("latin-1")
+    elif isinstance(value, (list, tuple)) or type(value).__name__ == "MultiValue":
+      value = "\\".join(str(v) for v in value)
+    values[normalizeTag(tag)] = str(value).strip("\x00 ") if value is not None else ""
+  return values
+
+
+class DICOMMetadataCache(object):
+  """Bounded LRU cache of DICOM header values keyed by (path, mtime, size). Files the minimal reader fails on are read
+  with fallbackReader(path, tags) if given, which returns the values by tag."""
+
+  DEFAULT_MAX_ENTRIES = 50000
+
+  def __init__(self, tags=HEADERTAGS.DEFAULT, maxEntries=DEFAULT_MAX_ENTRIES, fallbackReader=None):
+    self.tags = set(normalizeTag(tag) for tag in tags)
+    self.maxEntries = maxEntries
+    self.fallbackReader = fallbackReader
+    self.reader = DICOMHeaderReader()
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def __len__(self):
+    return len(self._entries)
+
+  def __contains__(self, path):
+    return path in self._entries
+
+  def getValue(self, path, tag, default=""):
+    tag = normalizeTag(tag)
+    value = self.getValues(path, [tag]).get(tag)
+    return value if value else default
+
+  def getValues(self, path, tags=None, allowFallback=True):
+    tags = set(normalizeTag(tag) for tag in tags) if tags else self.tags
+    stat = os.stat(path)
+    key = (stat.st_mtime, stat.st_size)
+    with self._lock:
+      entry = self._entries.get(path)
+      if entry is not None and entry[0] == key and tags.issubset(entry[1]):
+        self._entries.move_to_end(path)
+        self.hits += 1
+        return entry[1]
+      self.tags.update(tags)
+      requested = set(self.tags)
+    values = self._read(path, requested, allowFallback)
+    with self._lock:
+      self.misses += 1
+      self._entries[path] = (key, values)
+      self._entries.move_to_end(path)
+      while len(self._entries) > self.maxEntries:
+        self._entries.popitem(last=False)
+        self.evictions += 1
+    return values
+
+  def _read(self, path, tags, allowFallback=True):
+    with getSharedInstrumentation().span("headerParsing"):
+      return self._readHeader(path, tags, allowFallback)
+
+  def _readHeader(self, path, tags, allowFallback):
+    try:
+      return self.reader.read(path, tags)
+    except (struct.error, ValueError) as exc:
+      error = DICOMHeaderError("%s: %s" % (path, exc))
+    except DICOMHeaderError as exc:
+      error = exc
+    if not (allowFallback and self.fallbackReader):
+      raise error
+    values = self.fallbackReader(path, tags)
+    return {tag: values.get(tag) or "" for tag in tags}
+
+  def invalidate(self, path):
+    with self._lock:
+      self._entries.pop(path, None)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self.hits = self.misses = self.evictions = 0
+
+  def getStatistics(self):
+    with self._lock:
+      return {"entries": len(self._entries), "maxEntries": self.maxEntries, "hits": self.hits,
+              "misses": self.misses, "evictions": self.evictions}
+
+
+_sharedCache = None
+
+
+def getSharedMetadataCache():
+  global _sharedCache
+  if _sharedCache is None:
+    _sharedCache = DICOMMetadataCache()
+  return _sharedCache
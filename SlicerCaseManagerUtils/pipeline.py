@@ -0,0 +1,307 @@
+import os
+import queue
+import shutil
+import threading
+import time
+
+from SlicerCaseManagerUtils.metadata import DICOMHeaderError
+
+
+class RateLimiter(object):
+
+  def __init__(self, minInterval):
+    self.minInterval = minInterval
+    self._last = None
+
+  def ready(self, force=False):
+    now = time.time()
+    if force or self._last is None or now - self._last >= self.minInterval:
+      self._last = now
+      return True
+    return False
+
+  def reset(self):
+    self._last = None
+
+
+def readHeaders(metadataCache, paths, deduplicator=None, cancelled=None):
+  """Returns (path, values or exception) of paths and the number of files which deduplicator(path, values) reported
+  as duplicates; those are left out. Stops early once cancelled() returns True."""
+  results = []
+  duplicates = 0
+  for path in paths:
+    if cancelled and cancelled():
+      break
+    try:
+      values = metadataCache.getValues(path, allowFallback=False)
+      if deduplicator and deduplicator(path, values):
+        duplicates += 1
+        continue
+      results.append((path, values))
+    except (DICOMHeaderError, IOError, OSError, ValueError) as exc:
+      results.append((path, exc))
+  return results, duplicates
+
+
+class HeaderParsingPipeline(object):
+  """Parses DICOM headers of submitted files in batches on a pool of worker threads. Parsed batches are collected
+  with poll() in submission order, so the caller (the GUI thread) only has to do the work that must run there."""
+
+  DEFAULT_BATCH_SIZE = 64
+
+  def __init__(self, metadataCache, batchSize=DEFAULT_BATCH_SIZE, workers=4, deduplicator=None):
+    self.metadataCache = metadataCache
+    self.deduplicator = deduplicator
+    self.batchSize = batchSize
+    self.workerCount = workers
+    self._tasks = queue.Queue()
+    self._lock = threading.Lock()
+    self._results = {}
+    self._nextSubmitted = 0
+    self._nextDelivered = 0
+    self._generation = 0
+    self._busyWorkers = 0
+    self._workers = []
+    self.submittedFiles = 0
+    self.deliveredFiles = 0
+    self.duplicateFiles = 0
+
+  @property
+  def idle(self):
+    with self._lock:
+      return self._nextDelivered == self._nextSubmitted
+
+  def submit(self, filePaths):
+    self._startWorkers()
+    filePaths = list(filePaths)
+    with self._lock:
+      for start in range(0, len(filePaths), self.batchSize):
+        batch = filePaths[start:start + self.batchSize]
+        self._tasks.put((self._generation, self._nextSubmitted, batch))
+        self._nextSubmitted += 1
+        self.submittedFiles += len(batch)
+
+  def poll(self):
+    batches = []
+    with self._lock:
+      while self._nextDelivered in self._results:
+        batch, duplicates = self._results.pop(self._nextDelivered)
+        self._nextDelivered += 1
+        self.deliveredFiles += len(batch) + duplicates
+        self.duplicateFiles += duplicates
+        batches.append(batch)
+    return batches
+
+  def wait(self, timeout=None):
+    start = time.time()
+    while True:
+      with self._lock:
+        if self._nextDelivered + len(self._results) == self._nextSubmitted:
+          return True
+      if timeout is not None and time.time() - start > timeout:
+        return False
+      time.sleep(0.005)
+
+  def cancel(self, timeout=None):
+    """Drops all submitted batches which were not delivered yet and resets the counters. Batches being parsed are
+    abandoned; returns False if their workers did not stop within timeout seconds."""
+    with self._lock:
+      self._generation += 1
+      while True:
+        try:
+          self._tasks.get_nowait()
+        except queue.Empty:
+          break
+      self._results = {}
+      self._nextSubmitted = self._nextDelivered = 0
+      self.submittedFiles = self.deliveredFiles = self.duplicateFiles = 0
+    start = time.time()
+    while True:
+      with self._lock:
+        if not self._busyWorkers:
+          return True
+      if timeout is not None and time.time() - start > timeout:
+        return False
+      time.sleep(0.005)
+
+  def _startWorkers(self):
+    self._workers = [worker for worker in self._workers if worker.is_alive()]
+    while len(self._workers) < self.workerCount:
+      worker = threading.Thread(target=self._work, name="HeaderParsingPipelineWorker")
+      worker.daemon = True
+      worker.start()
+      self._workers.append(worker)
+
+  def _work(self):
+    while True:
+      generation, sequence, batch = self._tasks.get()
+      with self._lock:
+        if generation != self._generation:
+          continue
+        self._busyWorkers += 1
+      results = readHeaders(self.metadataCache, batch, self.deduplicator,
+                            cancelled=lambda: generation != self._generation)
+      with self._lock:
+        self._busyWorkers -= 1
+        if generation == self._generation:
+          self._results[sequence] = results
+
+
+class FileBatch(object):
+
+  def __init__(self, files, generation=0):
+    self.files = list(files)
+    self.generation = generation
+    self.results = None
+    self.duplicates = 0
+    self.receivedTime = time.time()
+    self.indexedTime = None
+    self.loadedTime = None
+
+
+class ReceivePipeline(object):
+  """Connects a DICOM receiver (store-SCP), a header indexing thread and the loader (polled from the GUI thread)
+  through bounded queues. When the loader falls behind, the indexer blocks and offer() stops accepting batches, so
+  back-pressure reaches the receiver instead of queuing without limit."""
+
+  DEFAULT_QUEUE_SIZE = 8
+
+  def __init__(self, metadataCache, maxQueueSize=DEFAULT_QUEUE_SIZE, deduplicator=None):
+    self.metadataCache = metadataCache
+    self.deduplicator = deduplicator
+    self.receivedQueue = queue.Queue(maxQueueSize)
+    self.indexedQueue = queue.Queue(maxQueueSize)
+    self._lock = threading.Lock()
+    self._thread = None
+    self._inFlight = 0
+    self._generation = 0
+    self.resetStatistics()
+
+  @property
+  def idle(self):
+    with self._lock:
+      return self._inFlight == 0
+
+  def offer(self, files, timeout=None):
+    """Hands a batch of received files to the pipeline. Blocks while the pipeline is full unless timeout is given;
+    returns False if the batch was not accepted."""
+    self._startIndexer()
+    with self._lock:
+      self._inFlight += 1
+      batch = FileBatch(files, self._generation)
+    try:
+      self.receivedQueue.put(batch, timeout != 0, timeout)
+    except queue.Full:
+      with self._lock:
+        self._inFlight -= 1
+        self.rejectedBatches += 1
+      return False
+    return True
+
+  def poll(self, maxBatches=None):
+    batches = []
+    while maxBatches is None or len(batches) < maxBatches:
+      try:
+        batch = self.indexedQueue.get_nowait()
+      except queue.Empty:
+        break
+      batch.loadedTime = time.time()
+      with self._lock:
+        self._inFlight -= 1
+        if batch.generation != self._generation:
+          continue
+        self.batches += 1
+        self.files += len(batch.files)
+        self.duplicateFiles += batch.duplicates
+        self.indexLatency += batch.indexedTime - batch.receivedTime
+        totalLatency = batch.loadedTime - batch.receivedTime
+        self.totalLatency += totalLatency
+        self.maxTotalLatency = max(self.maxTotalLatency, totalLatency)
+      batches.append(batch)
+    return batches
+
+  def cancel(self, timeout=None):
+    """Drops all batches which were not loaded yet, including those a receiver is still blocked on. Returns False if
+    the batch being indexed did not finish within timeout seconds; it is dropped when it arrives."""
+    with self._lock:
+      self._generation += 1
+    start = time.time()
+    while True:
+      for batchQueue in (self.receivedQueue, self.indexedQueue):
+        while True:
+          try:
+            batchQueue.get_nowait()
+          except queue.Empty:
+            break
+          with self._lock:
+            self._inFlight -= 1
+      with self._lock:
+        if self._inFlight == 0:
+          return True
+      if timeout is not None and time.time() - start > timeout:
+        return False
+      time.sleep(0.005)
+
+  def resetStatistics(self):
+    with self._lock:
+      self.batches = self.files = self.duplicateFiles = self.rejectedBatches = 0
+      self.indexLatency = self.totalLatency = self.maxTotalLatency = 0.0
+
+  def getStatistics(self):
+    with self._lock:
+      return {"receivedQueueDepth": self.receivedQueue.qsize(), "indexedQueueDepth": self.indexedQueue.qsize(),
+              "batches": self.batches, "files": self.files, "duplicateFiles": self.duplicateFiles,
+              "rejectedBatches": self.rejectedBatches,
+              "averageIndexLatency": self.indexLatency / self.batches if self.batches else 0.0,
+              "averageTotalLatency": self.totalLatency / self.batches if self.batches else 0.0,
+              "maxTotalLatency": self.maxTotalLatency}
+
+  def _startIndexer(self):
+    if not self._thread or not self._thread.is_alive():
+      self._thread = threading.Thread(target=self._index, name="ReceivePipelineIndexer")
+      self._thread.daemon = True
+      self._thread.start()
+
+  def _index(self):
+    while True:
+      batch = self.receivedQueue.get()
+      batch.results, batch.duplicates = readHeaders(self.metadataCache, batch.files, self.deduplicator,
+                                                    cancelled=lambda: batch.generation != self._generation)
+      batch.indexedTime = time.time()
+      self.indexedQueue.put(batch)
+
+
+class LocalStoreSCPStandIn(object):
+  """Stands in for the store-SCP and receiver: copies files into the incoming directory from a thread and offers
+  them to a ReceivePipeline in batches, blocking whenever the pipeline applies back-pressure."""
+
+  def __init__(self, sourceFiles, incomingDirectory, pipeline, batchSize=16, interval=0.0):
+    self.sourceFiles = list(sourceFiles)
+    self.incomingDirectory = incomingDirectory
+    self.pipeline = pipeline
+    self.batchSize = batchSize
+    self.interval = interval
+    self.blockedTime = 0.0
+    self._thread = None
+
+  def start(self):
+    self._thread = threading.Thread(target=self._send, name="LocalStoreSCPStandIn")
+    self._thread.daemon = True
+    self._thread.start()
+
+  def join(self, timeout=None):
+    if self._thread:
+      self._thread.join(timeout)
+
+  def _send(self):
+    for start in range(0, len(self.sourceFiles), self.batchSize):
+      batch = []
+      for sourceFile in self.sourceFiles[start:start + self.batchSize]:
+        destination = os.path.join(self.incomingDirectory, os.path.basename(sourceFile))
+        shutil.copyfile(sourceFile, destination)
+        batch.append(destination)
+      offered = time.time()
+      self.pipeline.offer(batch)
+      self.blockedTime += time.time() - offered
+      if self.interval:
+        time.sleep(self.interval)
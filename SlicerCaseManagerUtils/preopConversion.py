@@ -0,0 +1,25 @@
+"""Converts one preop DICOM series for PreopPreprocessor. Run by Slicer in a separate process:
+
+  Slicer --no-splash --no-main-window --python-script preopConversion.py <jobFile>
+
+The job file is a JSON document with the series "files" and the "outputFile" to write.
+"""
+import json
+import sys
+
+
+def main(jobFile):
+  import slicer
+  from DICOMScalarVolumePlugin import DICOMScalarVolumePluginClass
+  with open(jobFile) as f:
+    job = json.load(f)
+  plugin = DICOMScalarVolumePluginClass()
+  loadables = sorted(plugin.examineFiles(job["files"]), key=lambda loadable: loadable.confidence, reverse=True)
+  if not loadables:
+    return 1
+  volume = plugin.load(loadables[0])
+  return 0 if volume and slicer.util.saveNode(volume, job["outputFile"]) else 1
+
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv[1]))
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+from SlicerCaseManagerUtils.helpers import readJSON, writeJSONAtomically
+from SlicerCaseManagerUtils.metadata import HEADERTAGS, DICOMHeaderError, getSharedMetadataCache
+
+CONVERSION_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preopConversion.py")
+REQUIRED_PREOP_SERIES_PATTERN = "T2.*AX|AX.*T2"
+
+
+def computeContentHash(files, chunkSize=1 << 20):
+  contentHash = hashlib.sha1()
+  for path in sorted(files):
+    contentHash.update(os.path.basename(path).encode("utf-8"))
+    with open(path, "rb") as f:
+      for chunk in iter(lambda: f.read(chunkSize), b""):
+        contentHash.update(chunk)
+  return contentHash.hexdigest()
+
+
+def convertSeries(job, runCommand=subprocess.check_call):
+  """Hashes the series and, unless an output for the same content exists, runs the converter process for it."""
+  start = time.time()
+  result = {"seriesUID": job["seriesUID"], "outputFile": job["outputFile"], "skipped": False, "error": None}
+  try:
+    result["contentHash"] = computeContentHash(job["files"])
+    if result["contentHash"] == job.get("knownHash") and os.path.exists(job["outputFile"]):
+      result["skipped"] = True
+    else:
+      outputDirectory = os.path.dirname(job["outputFile"])
+      if not os.path.exists(outputDirectory):
+        os.makedirs(outputDirectory)
+      jobFile = job["outputFile"] + ".job.json"
+      with open(jobFile, "w") as f:
+        json.dump({"files": job["files"], "outputFile": job["outputFile"]}, f)
+      try:
+        runCommand(job["command"] + [jobFile])
+      finally:
+        os.remove(jobFile)
+      if not os.path.exists(job["outputFile"]):
+        raise RuntimeError("Converter did not write %s" % job["outputFile"])
+  except Exception as exc:
+    result["error"] = str(exc)
+  result["duration"] = time.time() - start
+  return result
+
+
+class PreopPreprocessor(object):
+  """Converts preop DICOM series into the mpReview preprocessed layout, running one converter process per series in
+  parallel. Results are cached by SeriesInstanceUID and content hash, so unchanged series are skipped on re-runs.
+  The headers are grouped into series on a background thread as well, so start() returns immediately."""
+
+  CACHE_FILE_NAME = "preprocessingCache.json"
+
+  def __init__(self, outputDirectory, command, metadataCache=None, workers=None):
+    self.outputDirectory = outputDirectory
+    self.command = list(command)
+    self.metadataCache = metadataCache or getSharedMetadataCache()
+    self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    self.cachePath = os.path.join(outputDirectory, self.CACHE_FILE_NAME)
+    self.cache = readJSON(self.cachePath, default={})
+    self.series = OrderedDict()
+    self.requiredSeries = set()
+    self.results = OrderedDict()
+    self._finished = []
+    self._lock = threading.Lock()
+    self._pool = None
+    self._groupingThread = None
+    self._processes = set()
+    self._cancelled = threading.Event()
+
+  @property
+  def total(self):
+    return len(self.series)
+
+  @property
+  def done(self):
+    return len(self.results)
+
+  @property
+  def running(self):
+    if self._groupingThread is not None and self._groupingThread.is_alive():
+      return True
+    return self._pool is not None and self.done < self.total
+
+  def groupSeries(self, files):
+    series = OrderedDict()
+    for path in sorted(files):
+      try:
+        values = self.metadataCache.getValues(path, allowFallback=False)
+      except (DICOMHeaderError, IOError, OSError) as exc:
+        logging.debug("Skipping %s for preprocessing: %s" % (path, exc))
+        continue
+      seriesUID = values.get(HEADERTAGS.SERIES_INSTANCE_UID)
+      if not seriesUID:
+        continue
+      if seriesUID not in series:
+        seriesNumber = values.get(HEADERTAGS.SERIES_NUMBER) or "0"
+        study = "_".join(v for v in (values.get(HEADERTAGS.STUDY_DATE), values.get(HEADERTAGS.STUDY_TIME)) if v)
+        series[seriesUID] = {
+          "description": values.get(HEADERTAGS.SERIES_DESCRIPTION, ""),
+          "number": seriesNumber,
+          "files": [],
+          "outputFile": os.path.join(self.outputDirectory, values.get(HEADERTAGS.PATIENT_ID) or "unknown",
+                                     study or "unknown", "RESOURCES", seriesNumber, "Reconstructions",
+                                     seriesNumber + ".nrrd")}
+      series[seriesUID]["files"].append(path)
+    return series
+
+  def start(self, files, requiredSeriesPattern=None):
+    self.results = OrderedDict()
+    self._cancelled.clear()
+    self._groupingThread = threading.Thread(target=self._startJobs, args=(list(files), requiredSeriesPattern),
+                                            name="PreopPreprocessorGrouping")
+    self._groupingThread.daemon = True
+    self._groupingThread.start()
+
+  def _startJobs(self, files, requiredSeriesPattern):
+    try:
+      if not os.path.exists(self.outputDirectory):
+        os.makedirs(self.outputDirectory)
+      series = self.groupSeries(files)
+    except (IOError, OSError) as exc:
+      logging.error("Grouping preop series failed: %s" % exc)
+      return
+    pattern = re.compile(requiredSeriesPattern, re.IGNORECASE) if requiredSeriesPattern else None
+    requiredSeries = set(uid for uid, s in series.items() if pattern and pattern.search(s["description"]))
+    jobs = [{"seriesUID": uid, "files": s["files"], "outputFile": s["outputFile"], "command": self.command,
+             "knownHash": self.cache.get(uid, {}).get("contentHash")} for uid, s in series.items()]
+    jobs.sort(key=lambda job: job["seriesUID"] not in requiredSeries)
+    with self._lock:
+      if self._cancelled.is_set():
+        return
+      pool = ThreadPool(min(self.workers, len(jobs)) or 1)
+      self.series = series
+      self.requiredSeries = requiredSeries
+      self._pool = pool
+    for job in jobs:
+      pool.apply_async(convertSeries, (job, self._runCommand), callback=self._onSeriesConverted)
+    pool.close()
+
+  def _runCommand(self, command):
+    with self._lock:
+      if self._cancelled.is_set():
+        raise RuntimeError("Preprocessing was cancelled")
+      process = subprocess.Popen(command)
+      self._processes.add(process)
+    try:
+      returnCode = process.wait()
+    finally:
+      with self._lock:
+        self._processes.discard(process)
+    if returnCode:
+      raise subprocess.CalledProcessError(returnCode, command)
+
+  def _onSeriesConverted(self, result):
+    with self._lock:
+      if not self._cancelled.is_set():
+        self._finished.append(result)
+
+  def cancel(self):
+    """Stops the preprocessing, e.g. when the case is closed: terminates the running converter processes, starts no
+    new ones and drops the results which have not been polled yet. Does not wait for the header grouping."""
+    with self._lock:
+      self._cancelled.set()
+      pool, self._pool = self._pool, None
+      processes = list(self._processes)
+      self._finished = []
+    for process in processes:
+      process.terminate()
+    if pool:
+      pool.terminate()
+
+  def poll(self):
+    with self._lock:
+      finished, self._finished = self._finished, []
+    for result in finished:
+      self.results[result["seriesUID"]] = result
+      if result["error"]:
+        logging.error("Preprocessing series %s failed: %s" % (result["seriesUID"], result["error"]))
+      else:
+        self.cache[result["seriesUID"]] = {"contentHash": result["contentHash"],
+                                           "outputFile": os.path.relpath(result["outputFile"], self.outputDirectory)}
+    if finished:
+      writeJSONAtomically(self.cachePath, self.cache, indent=2)
+    return finished
+
+  def isReady(self, seriesUID):
+    result = self.results.get(seriesUID)
+    return result is not None and not result["error"]
+
+  def isFirstRequiredSeriesReady(self):
+    if self.requiredSeries:
+      return any(self.isReady(uid) for uid in self.requiredSeries)
+    return any(self.isReady(uid) for uid in self.series)
+
+  def getStudyDirectory(self, seriesUID):
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(self.series[seriesUID]["outputFile"]))))
+
+  def getFirstReadyStudyDirectory(self):
+    for uid in sorted(self.series, key=lambda uid: uid not in self.requiredSeries):
+      if self.isReady(uid):
+        return self.getStudyDirectory(uid)
+    return None
+
+  def wait(self):
+    if self._groupingThread:
+      self._groupingThread.join()
+    if self._pool:
+      self._pool.join()
+    return self.poll()
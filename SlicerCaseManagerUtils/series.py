@@ -0,0 +1,144 @@
+import bisect
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from SlicerCaseManagerUtils.instrumentation import getSharedInstrumentation
+
+
+class SeriesFileIndex(Mapping):
+  """Incrementally filled series -> files mapping. Files are added while their header is read once during import,
+  so looking up the loadable files of a series never requires rescanning the data directory."""
+
+  def __init__(self):
+    self._filesBySeries = OrderedDict()
+    self._seriesByFile = {}
+
+  def __getitem__(self, series):
+    return self._filesBySeries[series]
+
+  def __iter__(self):
+    return iter(self._filesBySeries)
+
+  def __len__(self):
+    return len(self._filesBySeries)
+
+  def add(self, series, filePath):
+    previous = self._seriesByFile.get(filePath)
+    if previous == series:
+      return False
+    if previous is not None:
+      self._removeFromSeries(previous, filePath)
+    self._seriesByFile[filePath] = series
+    self._filesBySeries.setdefault(series, []).append(filePath)
+    return True
+
+  def remove(self, filePath):
+    series = self._seriesByFile.pop(filePath, None)
+    if series is not None:
+      self._removeFromSeries(series, filePath)
+    return series
+
+  def _removeFromSeries(self, series, filePath):
+    files = self._filesBySeries[series]
+    files.remove(filePath)
+    if not files:
+      del self._filesBySeries[series]
+
+  def getSeries(self, filePath):
+    return self._seriesByFile.get(filePath)
+
+  def getFiles(self, series):
+    return list(self._filesBySeries.get(series, []))
+
+  def fileCount(self):
+    return len(self._seriesByFile)
+
+  def clear(self):
+    self._filesBySeries.clear()
+    self._seriesByFile.clear()
+
+
+class SeriesRegistry(object):
+  """Series names ("<number>: <description>") kept ordered by series number on insert with O(1) membership tests.
+  Additions and changes are collected until flush(), which notifies listeners with the delta only."""
+
+  def __init__(self):
+    self._series = []
+    self._numbers = []
+    self._members = set()
+    self._added = OrderedDict()
+    self._changed = set()
+    self._listeners = []
+
+  @staticmethod
+  def getSeriesNumber(series):
+    try:
+      return int(series.split(": ")[0])
+    except ValueError:
+      return float("inf")
+
+  def __contains__(self, series):
+    return series in self._members
+
+  def __iter__(self):
+    return iter(self._series)
+
+  def __len__(self):
+    return len(self._series)
+
+  def __getitem__(self, index):
+    return self._series[index]
+
+  def __repr__(self):
+    return repr(self._series)
+
+  def index(self, series):
+    if series not in self._members:
+      raise ValueError("%s is not registered" % series)
+    number = self.getSeriesNumber(series)
+    return self._series.index(series, bisect.bisect_left(self._numbers, number),
+                              bisect.bisect_right(self._numbers, number))
+
+  def add(self, series):
+    if series in self._members:
+      if series not in self._added:
+        self._changed.add(series)
+      return False
+    number = self.getSeriesNumber(series)
+    position = bisect.bisect_right(self._numbers, number)
+    self._numbers.insert(position, number)
+    self._series.insert(position, series)
+    self._members.add(series)
+    self._added[series] = None
+    return True
+
+  def addListener(self, listener):
+    if listener not in self._listeners:
+      self._listeners.append(listener)
+
+  def removeListener(self, listener):
+    if listener in self._listeners:
+      self._listeners.remove(listener)
+
+  def flush(self):
+    """Notifies listeners with (added, changed): added is a list of (index, series) in ascending index order, so
+    inserting them one after the other reproduces the registry order; changed is a list of series."""
+    if not (self._added or self._changed):
+      return
+    with getSharedInstrumentation().span("seriesListRebuild", added=len(self._added), changed=len(self._changed)):
+      self._flush()
+
+  def _flush(self):
+    added = sorted((self.index(series), series) for series in self._added)
+    changed = [series for series in self._series if series in self._changed]
+    self._added = OrderedDict()
+    self._changed = set()
+    for listener in list(self._listeners):
+      listener(added, changed)
+
+  def clear(self):
+    del self._series[:]
+    del self._numbers[:]
+    self._members.clear()
+    self._added = OrderedDict()
+    self._changed = set()
@@ -0,0 +1,339 @@
+import datetime
+import json
+import logging
+import os
+import time
+
+from SlicerCaseManagerUtils.helpers import readJSON, writeJSONAtomically
+
+
+class SessionStore(object):
+  """Session results stored as a small header document (completed flag, timestamps, record counts) next to an
+  append-only file of records. Reading the completion state and saving a new registration result do not depend on
+  the size of the session.
+
+  A legacy results.json is migrated the first time the session is written or loaded, and again only if it is
+  rewritten afterwards. Reading the header never writes anything."""
+
+  HEADER_FILE_NAME = "session.json"
+  RECORDS_FILE_NAME = "records.jsonl"
+  LEGACY_FILE_NAME = "results.json"
+  SCHEMA_VERSION = 1
+  MIN_COMPACTION_LINES = 100
+  COMPACTION_RATIO = 2
+
+  def __init__(self, directory, onHeaderWritten=None):
+    self.directory = directory
+    self.onHeaderWritten = onHeaderWritten
+    self.headerPath = os.path.join(directory, self.HEADER_FILE_NAME)
+    self.recordsPath = os.path.join(directory, self.RECORDS_FILE_NAME)
+    self.legacyPath = os.path.join(directory, self.LEGACY_FILE_NAME)
+
+  @staticmethod
+  def now():
+    return datetime.datetime.now().isoformat()
+
+  def exists(self):
+    return os.path.exists(self.headerPath) or os.path.exists(self.legacyPath)
+
+  def createHeader(self):
+    now = self.now()
+    return {"schemaVersion": self.SCHEMA_VERSION, "completed": False, "created": now, "modified": now,
+            "modifiedTime": time.time(), "counts": {}}
+
+  def readHeader(self):
+    if self.isLegacyDocumentNewer():
+      return self.convertLegacyDocument()[0]
+    header = readJSON(self.headerPath)
+    if header is not None:
+      if header.get("schemaVersion", 0) > self.SCHEMA_VERSION:
+        raise ValueError("Session %s was written with a newer schema version (%s)"
+                         % (self.directory, header["schemaVersion"]))
+      return header
+    return None
+
+  def readHeaderForUpdate(self):
+    if self.isLegacyDocumentNewer():
+      return self.migrateLegacyDocument()
+    return self.readHeader() or self.createHeader()
+
+  def isLegacyDocumentNewer(self):
+    try:
+      legacyModifiedTime = os.path.getmtime(self.legacyPath)
+    except OSError:
+      return False
+    try:
+      return legacyModifiedTime > os.path.getmtime(self.headerPath)
+    except OSError:
+      return True
+
+  def writeHeader(self, header, touch=True):
+    if touch:
+      header["modified"] = self.now()
+      header["modifiedTime"] = time.time()
+    if not os.path.exists(self.directory):
+      os.makedirs(self.directory)
+    writeJSONAtomically(self.headerPath, header, indent=2)
+    if self.onHeaderWritten:
+      self.onHeaderWritten(self, header)
+
+  def isCompleted(self):
+    header = self.readHeader()
+    return header.get("completed", False) if header else None
+
+  def setCompleted(self, completed=True):
+    header = self.readHeaderForUpdate()
+    header["completed"] = completed
+    self.writeHeader(header)
+
+  def setProperties(self, **properties):
+    header = self.readHeaderForUpdate()
+    header.setdefault("properties", {}).update(properties)
+    self.writeHeader(header)
+
+  def append(self, recordType, data, key=None):
+    header = self.readHeaderForUpdate()
+    if not os.path.exists(self.directory):
+      os.makedirs(self.directory)
+    self._appendLines([self.createRecord(recordType, key, data)])
+    counts = header.setdefault("counts", {})
+    counts[recordType] = counts.get(recordType, 0) + 1
+    header["recordLines"] = header.get("recordLines", 0) + 1
+    self.writeHeader(header)
+
+  def createRecord(self, recordType, key, data, time=None):
+    return {"type": recordType, "key": key, "time": time or self.now(), "data": data}
+
+  def _appendLines(self, records):
+    payload = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+    handle = os.open(self.recordsPath, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+      os.write(handle, payload)
+      os.fsync(handle)
+    finally:
+      os.close(handle)
+
+  def readRecords(self, recordType=None):
+    if not os.path.exists(self.recordsPath):
+      return
+    with open(self.recordsPath) as f:
+      for lineNumber, line in enumerate(f, start=1):
+        try:
+          record = json.loads(line)
+        except ValueError:
+          logging.warning("Skipping incomplete record %d of %s" % (lineNumber, self.recordsPath))
+          continue
+        if recordType is None or record["type"] == recordType:
+          yield record
+
+  def load(self):
+    """Returns the header and the records grouped by type. Records stored with a key replace earlier ones in place;
+    lists written by saveDocument() are cut to their saved length."""
+    if self.isLegacyDocumentNewer():
+      self.migrateLegacyDocument()
+    header = self.readHeader()
+    if header is None:
+      return None, {}
+    records = {}
+    positions = {}
+    for record in self.readRecords():
+      items = records.setdefault(record["type"], [])
+      if record["key"] is None:
+        items.append(record["data"])
+        continue
+      position = positions.get((record["type"], record["key"]))
+      if position is None:
+        positions[(record["type"], record["key"])] = len(items)
+        items.append(record["data"])
+      else:
+        items[position] = record["data"]
+    for recordType, length in header.get("documentLists", {}).items():
+      records[recordType] = records.get(recordType, [])[:length]
+    return header, records
+
+  def loadDocument(self):
+    """Returns the session in the shape of the legacy results.json document, or None if there is no session."""
+    header, records = self.load()
+    if header is None:
+      return None
+    data = dict(header.get("properties", {}))
+    data.update(records)
+    data["completed"] = header.get("completed", False)
+    return data
+
+  def saveDocument(self, data, changedItems=None):
+    """Saves a document in the shape of the legacy results.json. Only the list items beyond the saved length of
+    their list and those named in changedItems ({name: [index, ...]}) are appended, keyed by their position, so
+    saving after each registration neither rewrites nor rereads the session. Items changed in place have to be
+    named in changedItems."""
+    header = self.readHeaderForUpdate()
+    changedItems = changedItems or {}
+    records = []
+    properties = {}
+    documentLists = header.setdefault("documentLists", {})
+    for name, value in data.items():
+      if name == "completed":
+        header["completed"] = value
+      elif isinstance(value, list):
+        savedLength = min(documentLists.get(name, 0), len(value))
+        indexes = sorted(set(index for index in changedItems.get(name, []) if 0 <= index < savedLength))
+        indexes += range(savedLength, len(value))
+        records += [self.createRecord(name, index, value[index]) for index in indexes]
+        header.setdefault("counts", {})[name] = len(value)
+        documentLists[name] = len(value)
+      else:
+        properties[name] = value
+    header["properties"] = properties
+    if records:
+      if not os.path.exists(self.directory):
+        os.makedirs(self.directory)
+      self._appendLines(records)
+      header["recordLines"] = header.get("recordLines", 0) + len(records)
+    if self.needsCompaction(header):
+      self.compact(header)
+    self.writeHeader(header)
+
+  def needsCompaction(self, header):
+    recordLines = header.get("recordLines", 0)
+    return recordLines > self.MIN_COMPACTION_LINES and \
+        recordLines > self.COMPACTION_RATIO * sum(header.get("counts", {}).values())
+
+  def compact(self, header):
+    """Rewrites the records file with only the records load() would return. Called before the header is written;
+    a crash in between leaves the previous records file, which loads to the same document."""
+    records = []
+    positions = {}
+    for record in self.readRecords():
+      length = header.get("documentLists", {}).get(record["type"])
+      if length is not None and isinstance(record["key"], int) and record["key"] >= length:
+        continue
+      if record["key"] is None:
+        records.append(record)
+        continue
+      position = positions.get((record["type"], record["key"]))
+      if position is None:
+        positions[(record["type"], record["key"])] = len(records)
+        records.append(record)
+      else:
+        records[position] = record
+    try:
+      self._writeRecords(records)
+      header["recordLines"] = len(records)
+    except (IOError, OSError) as exc:
+      logging.warning("Could not compact session %s: %s" % (self.directory, exc))
+
+  def _writeRecords(self, records):
+    temporaryPath = self.recordsPath + ".tmp"
+    with open(temporaryPath, "w") as f:
+      f.write("".join(json.dumps(record) + "\n" for record in records))
+    os.replace(temporaryPath, self.recordsPath)
+
+  def readLegacyDocument(self):
+    with open(self.legacyPath) as f:
+      return json.load(f)
+
+  def convertLegacyDocument(self):
+    """Returns the header and records of the legacy document without writing them."""
+    data = self.readLegacyDocument()
+    header = self.createHeader()
+    header["modifiedTime"] = os.path.getmtime(self.legacyPath)
+    header["created"] = header["modified"] = datetime.datetime.fromtimestamp(header["modifiedTime"]).isoformat()
+    header["completed"] = data.pop("completed", False)
+    records = []
+    for name, value in data.items():
+      if isinstance(value, list):
+        records += [self.createRecord(name, index, item, header["created"]) for index, item in enumerate(value)]
+        header["counts"][name] = len(value)
+        header.setdefault("documentLists", {})[name] = len(value)
+      else:
+        header.setdefault("properties", {})[name] = value
+    return header, records
+
+  def migrateLegacyDocument(self):
+    header, records = self.convertLegacyDocument()
+    header["recordLines"] = len(records)
+    try:
+      self._writeRecords(records)
+      self.writeHeader(header, touch=False)
+    except (IOError, OSError) as exc:
+      logging.warning("Could not migrate session %s: %s" % (self.directory, exc))
+    return header
+
+
+class SessionIndex(object):
+  """Per-case index of saved sessions (path, created/modified time, completed flag and number of registrations)
+  which is updated whenever a session header is written. synchronize() only lists the output directory to pick up
+  sessions which were added or removed by other means."""
+
+  FILE_NAME = "sessionIndex.json"
+  VERSION = 2
+  REGISTRATION_RECORD_TYPE = "results"
+
+  def __init__(self, outputDirectory):
+    self.outputDirectory = outputDirectory
+    self.path = os.path.join(outputDirectory, self.FILE_NAME)
+    data = readJSON(self.path, default={})
+    self.sessions = data.get("sessions", {}) if data.get("version") == self.VERSION else None
+
+  def exists(self):
+    return self.sessions is not None
+
+  def save(self):
+    if not os.path.exists(self.outputDirectory):
+      os.makedirs(self.outputDirectory)
+    writeJSONAtomically(self.path, {"version": self.VERSION, "sessions": self.sessions or {}}, indent=2)
+
+  def invalidate(self):
+    self.sessions = None
+    if os.path.exists(self.path):
+      os.remove(self.path)
+
+  def relativePath(self, sessionDirectory):
+    return os.path.relpath(sessionDirectory, self.outputDirectory).replace(os.sep, "/")
+
+  def update(self, sessionDirectory, header, save=True):
+    if self.sessions is None:
+      self.sessions = {}
+    self.sessions[self.relativePath(sessionDirectory)] = {
+      "created": header.get("created"),
+      "modified": header.get("modified"),
+      "modifiedTime": header.get("modifiedTime", 0),
+      "completed": header.get("completed", False),
+      "registrations": header.get("counts", {}).get(self.REGISTRATION_RECORD_TYPE, 0)}
+    if save:
+      self.save()
+
+  def listSessionDirectories(self):
+    try:
+      with os.scandir(self.outputDirectory) as entries:
+        return [entry.path for entry in entries if entry.is_dir()]
+    except OSError:
+      return []
+
+  def synchronize(self, storeFactory, save=True):
+    """Adds the sessions which are missing from the index and drops those whose directory is gone. Only the headers
+    of new sessions are read. With save=False the index file is left untouched, e.g. on a background thread."""
+    changed = self.sessions is None
+    sessions = dict(self.sessions or {})
+    current = dict((self.relativePath(d), d) for d in self.listSessionDirectories())
+    for path in set(sessions) - set(current):
+      del sessions[path]
+      changed = True
+    self.sessions = sessions
+    for path in set(current) - set(sessions):
+      header = storeFactory(current[path]).readHeader()
+      if header:
+        self.update(current[path], header, save=False)
+        changed = True
+    if changed and save:
+      self.save()
+    return changed
+
+  def getSessions(self):
+    """Returns (sessionDirectory, entry) tuples, most recently modified first."""
+    return sorted(((os.path.join(self.outputDirectory, path), entry) for path, entry in (self.sessions or {}).items()),
+                  key=lambda item: item[1].get("modifiedTime") or 0, reverse=True)
+
+  def getLatestSession(self):
+    sessions = self.getSessions()
+    return sessions[0] if sessions else (None, None)
@@ -0,0 +1,80 @@
+import os
+
+from SlicerCaseManagerUtils.helpers import readJSON, writeJSONAtomically
+
+
+class CaseSizeAccount(object):
+  """Keeps the byte count of a case up to date as files are received or generated, so the size of a case is known
+  without walking its directory tree. The account is incomplete until the case directory was walked once; output
+  directories written by other processes have to be recorded with recordDirectory()."""
+
+  FILE_NAME = "caseSize.json"
+  VERSION = 1
+
+  def __init__(self, caseDirectory):
+    self.caseDirectory = caseDirectory
+    self.path = os.path.join(caseDirectory, self.FILE_NAME)
+    self.files = {}
+    self.totalSize = 0
+    self.complete = False
+    self.modified = False
+    self.load()
+
+  def load(self):
+    data = readJSON(self.path, default={})
+    if data.get("version") == self.VERSION:
+      self.files = data.get("files", {})
+      self.complete = data.get("complete", False)
+    self.totalSize = sum(self.files.values())
+    self.modified = False
+
+  def save(self):
+    if not self.modified or not os.path.isdir(self.caseDirectory):
+      return
+    writeJSONAtomically(self.path, {"version": self.VERSION, "complete": self.complete, "files": self.files})
+    self.modified = False
+
+  def relativePath(self, path):
+    return os.path.relpath(path, self.caseDirectory).replace(os.sep, "/")
+
+  def record(self, path, size=None):
+    if size is None:
+      try:
+        size = os.path.getsize(path)
+      except OSError:
+        return self.remove(path)
+    relativePath = self.relativePath(path)
+    self.totalSize += size - self.files.get(relativePath, 0)
+    self.files[relativePath] = size
+    self.modified = True
+
+  def remove(self, path):
+    size = self.files.pop(self.relativePath(path), None)
+    if size is not None:
+      self.totalSize -= size
+      self.modified = True
+
+  def recordDirectory(self, directory):
+    prefix = self.relativePath(directory) + "/"
+    for relativePath in [p for p in self.files if p.startswith(prefix)]:
+      self.totalSize -= self.files.pop(relativePath)
+    for path, _, files in os.walk(directory):
+      for name in files:
+        self.record(os.path.join(path, name))
+    self.modified = True
+
+  def rebuild(self):
+    self.files = {}
+    self.totalSize = 0
+    for path, _, files in os.walk(self.caseDirectory):
+      for name in files:
+        if path != self.caseDirectory or name != self.FILE_NAME:
+          self.record(os.path.join(path, name))
+    self.complete = True
+    self.modified = True
+
+  def getTotalSize(self):
+    if not self.complete:
+      self.rebuild()
+      self.save()
+    return self.totalSize
@@ -0,0 +1,153 @@
+import logging
+import os
+import queue
+import re
+import threading
+
+from SlicerCaseManagerUtils.archive import CaseArchive
+from SlicerCaseManagerUtils.manifest import CaseManifest
+from SlicerCaseManagerUtils.metadata import HEADERTAGS, getSharedMetadataCache
+from SlicerCaseManagerUtils.storage import CaseSizeAccount
+
+
+def getDirectorySize(directory):
+  size = 0
+  for path, _, files in os.walk(directory):
+    for name in files:
+      try:
+        size += os.path.getsize(os.path.join(path, name))
+      except OSError:
+        pass
+  return size
+
+
+class CaseSummary(object):
+
+  KEYS = ("patientID", "caseDate", "studyDate", "seriesCount", "completed", "diskSize")
+
+  def __init__(self, caseDirectory, metadataCache=None, completionResolver=None):
+    self.caseDirectory = caseDirectory
+    self.metadataCache = metadataCache or getSharedMetadataCache()
+    self.completionResolver = completionResolver
+
+  def getStamp(self):
+    for name, path in (("manifest", os.path.join(self.caseDirectory, CaseManifest.FILE_NAME)),
+                       ("directory", self.caseDirectory)):
+      try:
+        return "%s:%r" % (name, os.stat(path).st_mtime)
+      except OSError:
+        continue
+    return None
+
+  def compute(self):
+    summary = dict.fromkeys(self.KEYS)
+    summary["caseDate"] = self.getCaseDate()
+    manifest = CaseManifest(self.caseDirectory)
+    sizeAccount = CaseSizeAccount(self.caseDirectory)
+    summary["diskSize"] = sizeAccount.totalSize if sizeAccount.complete else getDirectorySize(self.caseDirectory)
+    if manifest.entries:
+      summary["seriesCount"] = len(set(e["series"] for e in manifest.entries.values() if e.get("series")))
+      sampleFile = os.path.join(self.caseDirectory, sorted(manifest.entries)[0])
+    else:
+      sampleFile = self.findSampleFile()
+    archive = CaseArchive(self.caseDirectory, self.metadataCache)
+    if archive.isPacked():
+      summary.update(archive.getHeaderValues())
+    elif sampleFile:
+      try:
+        values = self.metadataCache.getValues(sampleFile, allowFallback=False)
+        summary["patientID"] = values.get(HEADERTAGS.PATIENT_ID)
+        summary["studyDate"] = values.get(HEADERTAGS.STUDY_DATE)
+      except Exception as exc:
+        logging.debug("Could not read header of %s: %s" % (sampleFile, exc))
+    if self.completionResolver:
+      summary["completed"] = self.completionResolver(self.caseDirectory)
+    return summary
+
+  def getCaseDate(self):
+    match = re.search("([0-9]{8})$", os.path.basename(os.path.normpath(self.caseDirectory)))
+    return match.group(1) if match else None
+
+  def findSampleFile(self):
+    for subDirectory in (os.path.join("DICOM", "Preop"), os.path.join("DICOM", "Intraop")):
+      try:
+        with os.scandir(os.path.join(self.caseDirectory, subDirectory)) as entries:
+          for entry in entries:
+            if entry.is_file() and not entry.name.startswith("."):
+              return entry.path
+      except OSError:
+        continue
+    return None
+
+
+class CaseSummaryLoader(object):
+  """Computes case summaries on a background thread. Requests for the same case are only computed once and the
+  most recently requested cases (e.g. the visible rows of a table) are served first. Summaries of cases whose stamp
+  did not change since knownStamps, and those computed for requests cancelled in the meantime, are not returned."""
+
+  def __init__(self, completionResolver=None, metadataCache=None):
+    self.completionResolver = completionResolver
+    self.metadataCache = metadataCache
+    self._requests = []
+    self._requested = set()
+    self._condition = threading.Condition()
+    self._results = queue.Queue()
+    self._thread = None
+    self._busy = False
+    self._generation = 0
+
+  def request(self, caseDirectories, knownStamps=None):
+    knownStamps = knownStamps or {}
+    with self._condition:
+      for caseDirectory in reversed(list(caseDirectories)):
+        if caseDirectory in self._requested:
+          self._requests = [r for r in self._requests if r[0] != caseDirectory]
+        self._requests.append((caseDirectory, knownStamps.get(caseDirectory), self._generation))
+        self._requested.add(caseDirectory)
+      self._condition.notify()
+    if not self._thread or not self._thread.is_alive():
+      self._thread = threading.Thread(target=self._work, name="CaseSummaryLoader")
+      self._thread.daemon = True
+      self._thread.start()
+
+  @property
+  def idle(self):
+    with self._condition:
+      return not self._requests and not self._busy and self._results.empty()
+
+  def cancel(self):
+    with self._condition:
+      self._generation += 1
+      self._requests = []
+      self._requested.clear()
+    self.poll()
+
+  def poll(self):
+    results = []
+    while True:
+      try:
+        results.append(self._results.get_nowait())
+      except queue.Empty:
+        return results
+
+  def _work(self):
+    while True:
+      with self._condition:
+        while not self._requests:
+          self._condition.wait()
+        caseDirectory, knownStamp, generation = self._requests.pop()
+        self._requested.discard(caseDirectory)
+        self._busy = True
+      summary = CaseSummary(caseDirectory, self.metadataCache, self.completionResolver)
+      try:
+        stamp = summary.getStamp()
+        if stamp is None or stamp != knownStamp:
+          result = (caseDirectory, stamp, summary.compute())
+          with self._condition:
+            if generation == self._generation:
+              self._results.put(result)
+      except Exception as exc:
+        logging.warning("Could not summarize case %s: %s" % (caseDirectory, exc))
+      finally:
+        with self._condition:
+          self._busy = False
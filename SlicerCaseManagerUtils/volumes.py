@@ -0,0 +1,120 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class VolumePrefetcher(object):
+  """Warms the operating system's file cache for the files of a series on a background thread, so that loading the
+  volume later does not wait for the disk or network share."""
+
+  CHUNK_SIZE = 1 << 20
+
+  def __init__(self):
+    self._thread = None
+    self._cancel = threading.Event()
+    self.prefetchedFiles = 0
+
+  @property
+  def running(self):
+    return self._thread is not None and self._thread.is_alive()
+
+  def prefetch(self, files):
+    self.cancel()
+    self._cancel.clear()
+    self._thread = threading.Thread(target=self._prefetch, args=(list(files),), name="VolumePrefetcher")
+    self._thread.daemon = True
+    self._thread.start()
+
+  def cancel(self):
+    self._cancel.set()
+    if self._thread:
+      self._thread.join()
+      self._thread = None
+
+  def _prefetch(self, files):
+    for path in files:
+      if self._cancel.is_set():
+        return
+      try:
+        self._prefetchFile(path)
+        self.prefetchedFiles += 1
+      except (IOError, OSError):
+        continue
+
+  def _prefetchFile(self, path):
+    with open(path, "rb") as f:
+      if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        return
+      while f.read(self.CHUNK_SIZE) and not self._cancel.is_set():
+        pass
+
+
+class VolumeCache(object):
+  """Keeps loaded volumes within a memory budget. When the budget is exceeded, the least recently used volumes that
+  are not pinned are released; pinned volumes (e.g. approved or currently displayed) are never evicted."""
+
+  def __init__(self, memoryBudget, sizeOf, release):
+    self.memoryBudget = memoryBudget
+    self.sizeOf = sizeOf
+    self.release = release
+    self.pinned = set()
+    self.residentSize = 0
+    self.evictions = 0
+    self._entries = OrderedDict()
+
+  def __contains__(self, key):
+    return key in self._entries
+
+  def __len__(self):
+    return len(self._entries)
+
+  def get(self, key):
+    entry = self._entries.get(key)
+    if entry is None:
+      return None
+    self._entries.move_to_end(key)
+    return entry[0]
+
+  def put(self, key, volume):
+    """Adds a volume. Older unpinned volumes are released to stay within the budget, never the one being added."""
+    self.remove(key)
+    size = self.sizeOf(volume)
+    self._entries[key] = (volume, size)
+    self.residentSize += size
+    self.evict(keep=key)
+
+  def remove(self, key, release=False):
+    entry = self._entries.pop(key, None)
+    if entry is None:
+      return
+    self.residentSize -= entry[1]
+    if release:
+      self.release(entry[0])
+
+  def pin(self, key):
+    self.pinned.add(key)
+
+  def unpin(self, key):
+    self.pinned.discard(key)
+    self.evict()
+
+  def setMemoryBudget(self, memoryBudget):
+    self.memoryBudget = memoryBudget
+    self.evict()
+
+  def evict(self, keep=None):
+    for key in [key for key in self._entries if key not in self.pinned and key != keep]:
+      if self.residentSize <= self.memoryBudget:
+        return
+      self.remove(key, release=True)
+      self.evictions += 1
+
+  def clear(self, release=False):
+    for key in list(self._entries):
+      self.remove(key, release=release)
+    self.pinned.clear()
+
+  def getStatistics(self):
+    return {"volumes": len(self._entries), "pinned": len(self.pinned & set(self._entries)),
+            "residentSize": self.residentSize, "memoryBudget": self.memoryBudget, "evictions": self.evictions}
@@ -0,0 +1,195 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+import sys
+import time
+
+from SlicerCaseManagerUtils.manifest import CaseManifest
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyBackend(object):
+  """Reads inotify events of the watched directories without blocking. Raises OSError if inotify is unavailable."""
+
+  name = "inotify"
+
+  def __init__(self, directories):
+    if not sys.platform.startswith("linux"):
+      raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+    self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if self._fd < 0:
+      raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    self._directories = {}
+    try:
+      for directory in directories:
+        wd = self._libc.inotify_add_watch(self._fd, directory.encode(sys.getfilesystemencoding()), WATCH_MASK)
+        if wd < 0:
+          raise OSError(ctypes.get_errno(), "Cannot watch %s" % directory)
+        self._directories[wd] = directory
+    except OSError:
+      self.close()
+      raise
+
+  def close(self):
+    if self._fd >= 0:
+      os.close(self._fd)
+      self._fd = -1
+
+  def read(self):
+    """Returns (directory, name, mask) of the pending events. directory and name are None after a queue overflow."""
+    events = []
+    while self._fd >= 0:
+      try:
+        data = os.read(self._fd, 64 * 1024)
+      except OSError as exc:
+        if exc.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+          break
+        raise
+      offset = 0
+      while offset + EVENT_HEADER.size <= len(data):
+        wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+        name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+        offset += EVENT_HEADER.size + length
+        if mask & IN_Q_OVERFLOW:
+          events.append((None, None, mask))
+        elif not mask & (IN_ISDIR | IN_IGNORED) and wd in self._directories:
+          events.append((self._directories[wd], name.decode(sys.getfilesystemencoding()), mask))
+    return events
+
+
+class DirectoryWatcher(object):
+  """Reports files which appear in the watched directories after start(), each once and only when it has been
+  completely written: inotify reports them once they were closed (or moved in) and not modified for settleTime
+  seconds. Where inotify is not available, the directories are listed every scanInterval seconds and a file is
+  reported once its size and modification time did not change for settleTime. Call poll() regularly, e.g. from a
+  QTimer, to get the paths of new files."""
+
+  IGNORED_SUFFIXES = (".partial", ".tmp", ".part")
+
+  def __init__(self, directories, settleTime=0.5, scanInterval=1.0, usePolling=False):
+    self.directories = [os.path.abspath(d) for d in directories]
+    self.settleTime = settleTime
+    self.scanInterval = scanInterval
+    self.usePolling = usePolling
+    self.backend = None
+    self.existing = set()
+    self.known = set()
+    self.pending = {}
+    self.lastScan = None
+
+  @property
+  def backendName(self):
+    return self.backend.name if self.backend else "polling"
+
+  @property
+  def running(self):
+    return self.lastScan is not None
+
+  def start(self):
+    """Starts watching. Files already present will not be reported, but can still be claimed."""
+    self.stop()
+    if not self.usePolling:
+      try:
+        self.backend = InotifyBackend(self.directories)
+      except (OSError, AttributeError) as exc:
+        logging.info("Watching %s by polling: %s" % (", ".join(self.directories), exc))
+    self.existing = set(self._listFiles())
+    self.known = set()
+    self.lastScan = time.time()
+
+  def stop(self):
+    if self.backend:
+      self.backend.close()
+      self.backend = None
+    self.pending = {}
+    self.lastScan = None
+
+  def claim(self, paths):
+    """Marks paths which were reported by another source (e.g. the DICOM receiver or the import of the files present
+    at start()) as known and returns those of them which had not been reported or claimed yet."""
+    claimed = []
+    for path in paths:
+      path = os.path.abspath(path)
+      self.pending.pop(path, None)
+      if path not in self.known:
+        self.known.add(path)
+        claimed.append(path)
+    return claimed
+
+  def poll(self):
+    if not self.running:
+      return []
+    now = time.time()
+    if self.backend:
+      self._processEvents(now)
+    elif now - self.lastScan >= self.scanInterval:
+      self._scan(now)
+    return self._takeSettledFiles(now)
+
+  def _processEvents(self, now):
+    for directory, name, mask in self.backend.read():
+      if directory is None:
+        logging.debug("inotify queue overflow, listing %s" % ", ".join(self.directories))
+        self._scan(now)
+        continue
+      path = os.path.join(directory, name)
+      if mask & (IN_DELETE | IN_MOVED_FROM):
+        self.pending.pop(path, None)
+      elif path not in self.known and path not in self.existing and not self._isIgnored(name):
+        closed = bool(mask & (IN_CLOSE_WRITE | IN_MOVED_TO)) or self.pending.get(path, (None, False))[1]
+        self.pending[path] = (now, closed)
+
+  def _scan(self, now):
+    self.lastScan = now
+    for path in self._listFiles():
+      if path not in self.known and path not in self.existing and path not in self.pending:
+        self.pending[path] = (now, self.backend is None)
+
+  def _takeSettledFiles(self, now):
+    settled = []
+    for path, (changed, closed) in list(self.pending.items()):
+      if not closed or now - changed < self.settleTime:
+        continue
+      try:
+        stat = os.stat(path)
+      except OSError:
+        del self.pending[path]
+        continue
+      if self.backend is None and max(stat.st_mtime, changed) > now - self.settleTime:
+        self.pending[path] = (max(stat.st_mtime, changed), closed)
+        continue
+      del self.pending[path]
+      self.known.add(path)
+      settled.append(path)
+    return sorted(settled)
+
+  def _listFiles(self):
+    for directory in self.directories:
+      try:
+        entries = list(os.scandir(directory))
+      except OSError:
+        continue
+      for entry in entries:
+        if not self._isIgnored(entry.name) and entry.is_file():
+          yield entry.path
+
+  def _isIgnored(self, name):
+    return name.startswith(".") or name in CaseManifest.IGNORED_FILES or name.endswith(self.IGNORED_SUFFIXES)
@@ -0,0 +1,5 @@
+"""Lets pytest import SlicerCaseManagerUtils from the source tree; Slicer puts the module directory on the path."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
@@ -0,0 +1,49 @@
+"""Writes small but valid DICOM Part-10 files (explicit VR little endian) with the header values the case manager
+reads, for the tests and the benchmarks."""
+import struct
+
+from SlicerCaseManagerUtils.metadata import HEADERTAGS, tagToInt
+
+EXPLICIT_VR_LITTLE_ENDIAN = "1.2.840.10008.1.2.1"
+MR_IMAGE_STORAGE = "1.2.840.10008.5.1.4.1.1.4"
+UID_ROOT = "1.2.826.0.1.3680043.9.7433"
+
+VRS = {HEADERTAGS.SOP_INSTANCE_UID: b"UI", HEADERTAGS.STUDY_DATE: b"DA", HEADERTAGS.STUDY_TIME: b"TM",
+       HEADERTAGS.MODALITY: b"CS", HEADERTAGS.SERIES_DESCRIPTION: b"LO", HEADERTAGS.PATIENT_NAME: b"PN",
+       HEADERTAGS.PATIENT_ID: b"LO", HEADERTAGS.PATIENT_BIRTH_DATE: b"DA", HEADERTAGS.STUDY_INSTANCE_UID: b"UI",
+       HEADERTAGS.SERIES_INSTANCE_UID: b"UI", HEADERTAGS.SERIES_NUMBER: b"IS"}
+
+
+def encodeElement(tag, vr, value):
+  if isinstance(value, str):
+    value = value.encode("latin-1")
+    if len(value) % 2:
+      value += b"\x00" if vr == b"UI" else b" "
+  group, element = tagToInt(tag) >> 16, tagToInt(tag) & 0xFFFF
+  if vr in (b"OB", b"OW"):
+    return struct.pack("<HH2sHI", group, element, vr, 0, len(value)) + value
+  return struct.pack("<HH2sH", group, element, vr, len(value)) + value
+
+
+def writeDICOMFile(path, values, pixelBytes=512, pixelValue=0):
+  sopInstanceUID = values[HEADERTAGS.SOP_INSTANCE_UID]
+  meta = encodeElement("0002,0002", b"UI", MR_IMAGE_STORAGE) + \
+         encodeElement("0002,0003", b"UI", sopInstanceUID) + \
+         encodeElement("0002,0010", b"UI", EXPLICIT_VR_LITTLE_ENDIAN)
+  dataset = b"".join(encodeElement(tag, VRS[tag], values[tag]) for tag in sorted(values, key=tagToInt))
+  with open(path, "wb") as f:
+    f.write(b"\x00" * 128 + b"DICM")
+    f.write(encodeElement("0002,0000", b"UL", struct.pack("<I", len(meta))))
+    f.write(meta)
+    f.write(dataset)
+    f.write(encodeElement("7FE0,0010", b"OW", bytearray([pixelValue]) * pixelBytes))
+
+
+def createValues(seriesNumber=1, instanceNumber=1, description="COVER PROSTATE"):
+  seriesUID = "%s.1.%d" % (UID_ROOT, seriesNumber)
+  return {HEADERTAGS.PATIENT_NAME: "Synthetic^001", HEADERTAGS.PATIENT_ID: "SYN00001",
+          HEADERTAGS.PATIENT_BIRTH_DATE: "19500101", HEADERTAGS.STUDY_INSTANCE_UID: UID_ROOT + ".1",
+          HEADERTAGS.STUDY_DATE: "20170101", HEADERTAGS.STUDY_TIME: "130000", HEADERTAGS.MODALITY: "MR",
+          HEADERTAGS.SERIES_INSTANCE_UID: seriesUID, HEADERTAGS.SERIES_NUMBER: str(seriesNumber),
+          HEADERTAGS.SERIES_DESCRIPTION: description,
+          HEADERTAGS.SOP_INSTANCE_UID: "%s.%d" % (seriesUID, instanceNumber)}
@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from SlicerCaseManagerUtils import archive
+from SlicerCaseManagerUtils.archive import CaseArchive, CaseArchiver
+from SlicerCaseManagerUtils.metadata import DICOMMetadataCache
+
+from syntheticDICOM import createValues, writeDICOMFile
+
+
+class CaseArchiveTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.intraopDirectory = os.path.join(self.directory, "DICOM", "Intraop")
+    os.makedirs(self.intraopDirectory)
+    for instanceNumber in (1, 2):
+      writeDICOMFile(os.path.join(self.intraopDirectory, "%d.dcm" % instanceNumber), createValues(1, instanceNumber))
+    self.archive = CaseArchive(self.directory, DICOMMetadataCache())
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testUnpackKeepsArchive(self):
+    modifiedTime = os.stat(os.path.join(self.intraopDirectory, "1.dcm")).st_mtime
+    self.archive.pack()
+    self.assertTrue(self.archive.isPacked())
+    self.archive.unpack()
+    self.assertTrue(self.archive.isUnpacked())
+    self.assertEqual(os.stat(os.path.join(self.intraopDirectory, "1.dcm")).st_mtime, modifiedTime)
+
+  def testRepackingUnchangedCaseKeepsArchive(self):
+    self.archive.pack()
+    self.archive.unpack()
+    os.utime(self.archive.path, (0, 0))
+    self.archive.pack()
+    self.assertTrue(self.archive.isPacked())
+    self.assertEqual(os.stat(self.archive.path).st_mtime, 0)
+    self.archive.pack()
+    self.assertTrue(self.archive.isPacked())
+
+  def testRepackingModifiedCaseRewritesArchive(self):
+    self.archive.pack()
+    self.archive.unpack()
+    writeDICOMFile(os.path.join(self.intraopDirectory, "3.dcm"), createValues(2, 1, "GUIDANCE"))
+    self.archive.pack()
+    reopened = CaseArchive(self.directory)
+    self.assertIn("DICOM/Intraop/3.dcm", reopened.index["modifiedTimes"])
+    self.assertEqual(sorted(reopened.index["series"]["DICOM/Intraop"]), ["1: COVER PROSTATE", "2: GUIDANCE"])
+
+  def testLazyUnpackExtractsSeriesOnDemand(self):
+    writeDICOMFile(os.path.join(self.intraopDirectory, "3.dcm"), createValues(2, 1, "GUIDANCE"))
+    modifiedTime = os.stat(os.path.join(self.intraopDirectory, "3.dcm")).st_mtime
+    self.archive.pack()
+    self.archive.unpack(lazyDirectories=[CaseArchive.INTRAOP_DIRECTORY])
+    self.assertTrue(self.archive.isLazilyUnpacked())
+    self.assertEqual(os.listdir(self.intraopDirectory), [])
+    self.assertEqual(self.archive.getSeries(), ["1: COVER PROSTATE", "2: GUIDANCE"])
+    self.assertEqual(self.archive.extractSeries("2: GUIDANCE"), [os.path.join(self.intraopDirectory, "3.dcm")])
+    self.assertEqual(os.listdir(self.intraopDirectory), ["3.dcm"])
+    self.assertEqual(os.stat(os.path.join(self.intraopDirectory, "3.dcm")).st_mtime, modifiedTime)
+
+  def testRepackingLazilyUnpackedCaseKeepsArchivedSeries(self):
+    self.archive.pack()
+    self.archive.unpack(lazyDirectories=[CaseArchive.INTRAOP_DIRECTORY])
+    os.utime(self.archive.path, (0, 0))
+    self.archive.pack()
+    self.assertTrue(self.archive.isPacked())
+    self.assertFalse(os.path.exists(self.archive.lazyMarkerPath))
+    self.assertEqual(os.stat(self.archive.path).st_mtime, 0)
+    self.archive.unpack(lazyDirectories=[CaseArchive.INTRAOP_DIRECTORY])
+    writeDICOMFile(os.path.join(self.intraopDirectory, "3.dcm"), createValues(2, 1, "GUIDANCE"))
+    self.archive.pack()
+    reopened = CaseArchive(self.directory)
+    self.assertEqual(sorted(reopened.index["modifiedTimes"]),
+                     ["DICOM/Intraop/1.dcm", "DICOM/Intraop/2.dcm", "DICOM/Intraop/3.dcm"])
+    self.assertEqual(reopened.getSeriesMembers("1: COVER PROSTATE"), ["DICOM/Intraop/1.dcm", "DICOM/Intraop/2.dcm"])
+    reopened.unpack()
+    self.assertFalse(reopened.isLazilyUnpacked())
+    self.assertEqual(sorted(os.listdir(self.intraopDirectory)), ["1.dcm", "2.dcm", "3.dcm"])
+
+
+class CaseArchiverTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.released = threading.Event()
+    self.originalCaseArchive = archive.CaseArchive
+    released = self.released
+
+    class BlockingCaseArchive(object):
+
+      def __init__(self, caseDirectory, metadataCache=None):
+        self.caseDirectory = caseDirectory
+
+      def pack(self):
+        if self.caseDirectory == "blocked":
+          released.wait(5)
+
+    archive.CaseArchive = BlockingCaseArchive
+
+  def tearDown(self):
+    self.released.set()
+    archive.CaseArchive = self.originalCaseArchive
+    shutil.rmtree(self.directory)
+
+  def testWaitsForOneCaseWithTimeout(self):
+    archiver = CaseArchiver()
+    archiver.archive("blocked")
+    archiver.archive("other")
+    self.assertTrue(archiver.wait("unknown", timeout=0))
+    self.assertFalse(archiver.wait("blocked", timeout=0.05))
+    self.released.set()
+    self.assertTrue(archiver.wait("other", timeout=5))
+    self.assertTrue(archiver.wait(timeout=5))
+    self.assertEqual(sorted(caseDirectory for caseDirectory, error in archiver.poll()), ["blocked", "other"])
+
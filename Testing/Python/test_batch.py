@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from SlicerCaseManagerUtils.batch import createCases, main, runBatch
+from SlicerCaseManagerUtils.catalog import formatCaseName
+from SlicerCaseManagerUtils.helpers import readJSON
+
+from syntheticDICOM import createValues, writeDICOMFile
+
+
+class BatchTest(unittest.TestCase):
+
+  def setUp(self):
+    self.rootDirectory = tempfile.mkdtemp()
+    self.caseDirectory = os.path.join(self.rootDirectory, formatCaseName(1))
+    self.intraopDirectory = os.path.join(self.caseDirectory, "DICOM", "Intraop")
+    os.makedirs(self.intraopDirectory)
+    for instanceNumber in range(1, 4):
+      writeDICOMFile(os.path.join(self.intraopDirectory, "%d.dcm" % instanceNumber), createValues(1, instanceNumber))
+    with open(os.path.join(self.intraopDirectory, "broken.dcm"), "wb") as f:
+      f.write(b"not a DICOM file")
+
+  def tearDown(self):
+    shutil.rmtree(self.rootDirectory)
+
+  def testCreateCasesContinuesCaseNumbers(self):
+    caseDirectories = createCases(self.rootDirectory, 2)
+    self.assertEqual([os.path.basename(d) for d in caseDirectories], [formatCaseName(2), formatCaseName(3)])
+    for caseDirectory in caseDirectories:
+      self.assertTrue(os.path.isdir(os.path.join(caseDirectory, "DICOM", "Preop")))
+      self.assertTrue(os.path.isdir(os.path.join(caseDirectory, "DICOM", "Intraop")))
+
+  def testImportCountsParsedInstancesOnly(self):
+    summary = runBatch([self.caseDirectory], workers=1)
+    self.assertEqual(summary["failedCases"], 0)
+    result = summary["cases"][0]
+    self.assertIsNone(result["error"])
+    self.assertEqual((result["files"], result["importedFiles"], result["unreadableFiles"], result["series"]),
+                     (3, 3, 1, 1))
+    self.assertEqual(set(result["stages"]), {"create", "import", "manifest"})
+
+  def testRerunCountsUnchangedInstances(self):
+    runBatch([self.caseDirectory], workers=1)
+    result = runBatch([self.caseDirectory], workers=1)["cases"][0]
+    self.assertEqual((result["files"], result["importedFiles"], result["unreadableFiles"], result["series"]),
+                     (3, 0, 0, 1))
+
+  def testProcessesCasesInParallel(self):
+    caseDirectories = [self.caseDirectory] + createCases(self.rootDirectory, 2)
+    summary = runBatch(caseDirectories, workers=3)
+    self.assertEqual(summary["workers"], 3)
+    self.assertEqual([result["files"] for result in summary["cases"]], [3, 0, 0])
+
+  def testMainWritesSummary(self):
+    summaryPath = os.path.join(self.rootDirectory, "summary.json")
+    self.assertEqual(main(["--summary", summaryPath, self.caseDirectory]), 0)
+    self.assertEqual(readJSON(summaryPath)["cases"][0]["importedFiles"], 3)
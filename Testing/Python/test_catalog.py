@@ -0,0 +1,45 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from SlicerCaseManagerUtils.catalog import CaseCatalog, formatCaseName
+
+
+class CaseCatalogTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    for name in ("Case001-20170101", "Case003-20170103", "NotACase"):
+      os.mkdir(os.path.join(self.directory, name))
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testListsMatchingCaseDirectories(self):
+    catalog = CaseCatalog(self.directory)
+    self.assertEqual(catalog.getCaseNames(), ["Case001-20170101", "Case003-20170103"])
+    self.assertEqual(catalog.getNextCaseNumber(), 4)
+    self.assertTrue(catalog.exists("Case003-20170103"))
+
+  def testPicksUpNewCasesAfterReload(self):
+    CaseCatalog(self.directory)
+    os.mkdir(os.path.join(self.directory, "Case004-20170104"))
+    os.utime(self.directory, (0, 0))
+    self.assertIn("Case004-20170104", CaseCatalog(self.directory).getCaseNames())
+
+  def testSetCompletedUpdatesCachedSummary(self):
+    catalog = CaseCatalog(self.directory)
+    catalog.setSummary("Case001-20170101", {"seriesCount": 3, "completed": False}, 1.0)
+    catalog.setCompleted("Case001-20170101")
+    self.assertTrue(catalog.isCompleted("Case001-20170101"))
+    self.assertEqual(catalog.getSummary("Case001-20170101"), ({"seriesCount": 3, "completed": True}, 1.0))
+    self.assertTrue(CaseCatalog(self.directory).getSummary("Case001-20170101")[0]["completed"])
+
+  def testFormattedCaseNamesAreListed(self):
+    name = formatCaseName(5, datetime.date(2017, 1, 5))
+    self.assertEqual(name, "Case005-20170105")
+    os.mkdir(os.path.join(self.directory, name))
+    os.utime(self.directory, (0, 0))
+    self.assertIn(name, CaseCatalog(self.directory).getCaseNames())
@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from SlicerCaseManagerUtils.database import CaseDICOMDatabase
+from SlicerCaseManagerUtils.metadata import HEADERTAGS
+
+from syntheticDICOM import createValues, writeDICOMFile
+
+
+class CaseDICOMDatabaseTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.intraopDirectory = os.path.join(self.directory, "DICOM", "Intraop")
+    os.makedirs(self.intraopDirectory)
+    self.files = []
+    for seriesNumber in (1, 2):
+      values = createValues(seriesNumber)
+      path = os.path.join(self.intraopDirectory, "%d.dcm" % seriesNumber)
+      writeDICOMFile(path, values)
+      self.files.append((path, values))
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testStoresFilesOfTheCase(self):
+    database = CaseDICOMDatabase(self.directory)
+    self.assertEqual(database.addFiles(self.files), 2)
+    database.close()
+    database = CaseDICOMDatabase(self.directory)
+    self.assertEqual(database.getFiles(), [path for path, values in self.files])
+    self.assertEqual(database.getFiles(self.files[1][1][HEADERTAGS.SERIES_INSTANCE_UID]), [self.files[1][0]])
+    database.close()
+
+  def testSkipsVanishedFiles(self):
+    os.remove(self.files[0][0])
+    database = CaseDICOMDatabase(self.directory)
+    self.assertEqual(database.addFiles(self.files), 1)
+    self.assertEqual(database.getFiles(), [self.files[1][0]])
+    database.close()
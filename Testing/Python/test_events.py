@@ -0,0 +1,42 @@
+import os
+import unittest
+
+from SlicerCaseManagerUtils.events import EventChannel, FileIndexed, ImageDataReceived, StatusChanged
+
+
+class EventChannelTest(unittest.TestCase):
+
+  def setUp(self):
+    self.delivered = []
+    self.scheduled = []
+    self.channel = EventChannel(scheduler=lambda delay, function: self.scheduled.append(function))
+
+  def testThrottledSubscriptionKeepsLatestPayload(self):
+    self.channel.subscribe(FileIndexed, self.delivered.append, minInterval=60)
+    for current in range(1, 4):
+      self.channel.publish(FileIndexed("%d.dcm" % current, 3, current))
+    self.assertEqual(self.delivered, [FileIndexed("1.dcm", 3, 1)])
+    self.assertEqual(len(self.scheduled), 1)
+    self.scheduled[0]()
+    self.assertEqual(self.delivered[-1], FileIndexed("3.dcm", 3, 3))
+    self.channel.publish(FileIndexed("4.dcm", 4, 4), force=True)
+    self.assertEqual(len(self.delivered), 3)
+
+  def testBatchSubscriptionCollectsPayloads(self):
+    self.channel.subscribe(StatusChanged, self.delivered.append, minInterval=60, batch=True)
+    for status in ("a", "b", "c"):
+      self.channel.publish(StatusChanged(status))
+    self.channel.flush()
+    self.assertEqual(self.delivered, [[StatusChanged("a")], [StatusChanged("b"), StatusChanged("c")]])
+
+  def testFlushingProgressKeepsItAheadOfReceivedData(self):
+    self.channel.subscribe(FileIndexed, self.delivered.append, minInterval=60)
+    self.channel.subscribe(ImageDataReceived, self.delivered.append)
+    self.channel.publish(FileIndexed("1.dcm", 2, 1))
+    self.channel.publish(FileIndexed("2.dcm", 2, 2))
+    self.channel.flush(FileIndexed)
+    self.channel.publish(ImageDataReceived(["1.dcm", "2.dcm"]))
+    self.assertEqual(self.delivered, [FileIndexed("1.dcm", 2, 1), FileIndexed("2.dcm", 2, 2),
+                                      ImageDataReceived(["1.dcm", "2.dcm"])])
+    self.scheduled[0]()
+    self.assertEqual(len(self.delivered), 3)
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from SlicerCaseManagerUtils.instances import InstanceIndex
+from SlicerCaseManagerUtils.metadata import HEADERTAGS
+
+from syntheticDICOM import createValues, writeDICOMFile
+
+
+class InstanceIndexTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.values = createValues()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def writeFile(self, name, values, pixelBytes=512, pixelValue=0):
+    path = os.path.join(self.directory, name)
+    writeDICOMFile(path, values, pixelBytes, pixelValue)
+    return path
+
+  def testRemovesRepeatedSend(self):
+    index = InstanceIndex(self.directory)
+    self.assertFalse(index.isDuplicate(self.writeFile("1.dcm", self.values), self.values))
+    repeated = self.writeFile("2.dcm", self.values)
+    self.assertTrue(index.isDuplicate(repeated, self.values))
+    self.assertFalse(os.path.exists(repeated))
+    self.assertEqual(index.duplicates, 1)
+
+  def testKeepsInstancesWhichDiffer(self):
+    index = InstanceIndex(self.directory)
+    index.isDuplicate(self.writeFile("1.dcm", self.values), self.values)
+    resized = self.writeFile("2.dcm", self.values, pixelBytes=1024)
+    self.assertFalse(index.isDuplicate(resized, self.values))
+    values = dict(self.values)
+    values[HEADERTAGS.SERIES_DESCRIPTION] = "COVER TEMPLATE"
+    renamed = self.writeFile("3.dcm", values)
+    self.assertFalse(index.isDuplicate(renamed, values))
+    self.assertTrue(os.path.exists(resized) and os.path.exists(renamed))
+
+  def testKeepsInstanceWithSameHeaderButDifferentPixelData(self):
+    index = InstanceIndex(self.directory)
+    stored = self.writeFile("1.dcm", self.values)
+    index.isDuplicate(stored, self.values)
+    changed = self.writeFile("2.dcm", self.values, pixelValue=7)
+    self.assertEqual(os.path.getsize(changed), os.path.getsize(stored))
+    self.assertFalse(index.isDuplicate(changed, self.values))
+    self.assertTrue(os.path.exists(changed))
+    self.assertEqual(index.duplicates, 0)
+
+  def testRegistersReplacementOfRemovedInstance(self):
+    index = InstanceIndex(self.directory)
+    index.isDuplicate(self.writeFile("1.dcm", self.values), self.values)
+    os.remove(os.path.join(self.directory, "1.dcm"))
+    replacement = self.writeFile("2.dcm", self.values)
+    self.assertFalse(index.isDuplicate(replacement, self.values))
+    self.assertTrue(index.isDuplicate(self.writeFile("3.dcm", self.values), self.values))
+
+  def testRecognizesRepeatedSendAfterReload(self):
+    index = InstanceIndex(self.directory)
+    index.isDuplicate(self.writeFile("1.dcm", self.values), self.values)
+    index.save()
+    self.assertTrue(InstanceIndex(self.directory).isDuplicate(self.writeFile("2.dcm", self.values), self.values))
+
@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from SlicerCaseManagerUtils.instrumentation import NULL_SPAN, Instrumentation, Stopwatch
+
+
+class FakeClock(object):
+
+  def __init__(self):
+    self.now = 100.0
+
+  def __call__(self):
+    return self.now
+
+
+class InstrumentationTest(unittest.TestCase):
+
+  def setUp(self):
+    self.caseDirectory = tempfile.mkdtemp()
+    self.instrumentation = Instrumentation(enabled=True)
+
+  def tearDown(self):
+    self.instrumentation.stopTrace()
+    shutil.rmtree(self.caseDirectory)
+
+  def getTracePath(self):
+    return os.path.join(self.caseDirectory, Instrumentation.TRACE_DIRECTORY_NAME, Instrumentation.TRACE_FILE_NAME)
+
+  def readTrace(self):
+    with open(self.getTracePath()) as f:
+      return [json.loads(line) for line in f]
+
+  def testDisabledInstrumentationRecordsNothing(self):
+    instrumentation = Instrumentation()
+    self.assertIs(instrumentation.span("headerParsing"), NULL_SPAN)
+    with instrumentation.span("headerParsing"):
+      instrumentation.count("receivedFiles", 3)
+    self.assertEqual(instrumentation.getStatistics(), {"spans": {}, "counters": {}})
+
+  def testCollectsSpansAndCounters(self):
+    self.instrumentation.record("headerParsing", 0.25)
+    self.instrumentation.record("headerParsing", 0.75)
+    self.instrumentation.count("receivedFiles", 3)
+    self.instrumentation.count("receivedFiles")
+    statistics = self.instrumentation.getStatistics()
+    self.assertEqual(statistics["spans"]["headerParsing"], {"count": 2, "total": 1.0, "max": 0.75, "last": 0.75})
+    self.assertEqual(statistics["counters"], {"receivedFiles": 4})
+    self.instrumentation.reset()
+    self.assertEqual(self.instrumentation.getStatistics(), {"spans": {}, "counters": {}})
+
+  def testSpanRecordsError(self):
+    self.instrumentation.startTrace(self.caseDirectory)
+    with self.assertRaises(ValueError):
+      with self.instrumentation.span("dicomIndexing", files=2):
+        raise ValueError()
+    self.assertEqual(self.instrumentation.getStatistics()["spans"]["dicomIndexing"]["count"], 1)
+    entry = self.readTrace()[0]
+    self.assertEqual((entry["span"], entry["files"], entry["error"]), ("dicomIndexing", 2, "ValueError"))
+
+  def testTraceIsCreatedWithFirstSpan(self):
+    self.instrumentation.startTrace(self.caseDirectory)
+    self.assertFalse(os.path.exists(self.getTracePath()))
+    self.instrumentation.record("timeToInteractive", 1.5, case="Case001")
+    self.assertEqual([(e["span"], e["duration"], e["case"]) for e in self.readTrace()],
+                     [("timeToInteractive", 1.5, "Case001")])
+
+  def testStopTraceEndsTracing(self):
+    self.instrumentation.startTrace(self.caseDirectory)
+    self.instrumentation.record("headerParsing", 0.1)
+    self.instrumentation.stopTrace()
+    self.instrumentation.record("headerParsing", 0.2)
+    self.assertEqual(len(self.readTrace()), 1)
+    self.assertEqual(self.instrumentation.getStatistics()["spans"]["headerParsing"]["count"], 2)
+
+  def testStartTraceSwitchesCase(self):
+    otherCaseDirectory = os.path.join(self.caseDirectory, "other")
+    self.instrumentation.startTrace(otherCaseDirectory)
+    self.instrumentation.record("headerParsing", 0.1)
+    self.instrumentation.startTrace(self.caseDirectory)
+    self.instrumentation.record("headerParsing", 0.2)
+    self.assertEqual([entry["duration"] for entry in self.readTrace()], [0.2])
+    self.instrumentation.startTrace(None)
+    self.instrumentation.record("headerParsing", 0.3)
+    self.assertEqual(len(self.readTrace()), 1)
+
+
+class StopwatchTest(unittest.TestCase):
+
+  def setUp(self):
+    self.clock = FakeClock()
+    self.stopwatch = Stopwatch(clock=self.clock)
+
+  def answerDialog(self, seconds, answer=True):
+    self.clock.now += seconds
+    return answer
+
+  def testMeasuresTimeUntilStopped(self):
+    self.assertIsNone(self.stopwatch.stop())
+    self.stopwatch.start()
+    self.assertTrue(self.stopwatch.running)
+    self.clock.now += 2.5
+    self.assertEqual(self.stopwatch.stop(), 2.5)
+    self.assertFalse(self.stopwatch.running)
+    self.assertIsNone(self.stopwatch.stop())
+
+  def testExcludesDialogTime(self):
+    self.stopwatch.start()
+    self.clock.now += 1.0
+    self.assertTrue(self.stopwatch.runExcluded(self.answerDialog, 30.0))
+    self.clock.now += 0.5
+    self.assertEqual(self.stopwatch.stop(), 1.5)
+
+  def testExcludesDialogTimeOnError(self):
+    self.stopwatch.start()
+
+    def failingDialog():
+      self.clock.now += 10.0
+      raise RuntimeError()
+
+    with self.assertRaises(RuntimeError):
+      self.stopwatch.runExcluded(failingDialog)
+    self.assertEqual(self.stopwatch.stop(), 0.0)
+
+  def testCancelledStopwatchReportsNothing(self):
+    self.stopwatch.start()
+    self.stopwatch.cancel()
+    self.assertFalse(self.stopwatch.runExcluded(self.answerDialog, 5.0, answer=False))
+    self.assertIsNone(self.stopwatch.stop())
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from SlicerCaseManagerUtils.layout import CaseLayout
+from SlicerCaseManagerUtils.manifest import CaseManifest
+
+
+class CaseLayoutTest(unittest.TestCase):
+
+  def setUp(self):
+    self.rootDirectory = tempfile.mkdtemp()
+    self.caseDirectory = os.path.join(self.rootDirectory, "Case001-20170101")
+
+  def tearDown(self):
+    shutil.rmtree(self.rootDirectory)
+
+  def testKeepsOnlyLeafDirectories(self):
+    layout = CaseLayout(directories=["DICOM", "DICOM/Preop/", "/DICOM/Intraop", ""],
+                        placeholderFiles={"Notes/README.txt": "notes"})
+    self.assertEqual(layout.directories, ["DICOM/Intraop", "DICOM/Preop", "Notes"])
+    self.assertEqual(CaseLayout(directories={""}).directories, [])
+
+  def testMaterializeCreatesTree(self):
+    layout = CaseLayout(directories=["DICOM/Preop", "DICOM/Intraop"],
+                        placeholderFiles={"Notes/README.txt": "notes", "Notes/empty.bin": b""})
+    self.assertEqual(layout.materialize(self.caseDirectory), self.caseDirectory)
+    for directory in ("DICOM/Preop", "DICOM/Intraop", "Notes"):
+      self.assertTrue(os.path.isdir(os.path.join(self.caseDirectory, *directory.split("/"))))
+    with open(os.path.join(self.caseDirectory, "Notes", "README.txt")) as f:
+      self.assertEqual(f.read(), "notes")
+    self.assertTrue(os.path.exists(os.path.join(self.caseDirectory, CaseManifest.FILE_NAME)))
+
+  def testMaterializeExistingCase(self):
+    layout = CaseLayout(directories=["DICOM/Preop"], placeholderFiles={"Notes/README.txt": "notes"},
+                        createManifest=False)
+    layout.materialize(self.caseDirectory)
+    with self.assertRaises(OSError):
+      layout.materialize(self.caseDirectory)
+    with open(os.path.join(self.caseDirectory, "Notes", "README.txt"), "w") as f:
+      f.write("edited")
+    layout.withDirectories(["DICOM/Preop", "DICOM/Intraop"]).materialize(self.caseDirectory, existOk=True)
+    self.assertTrue(os.path.isdir(os.path.join(self.caseDirectory, "DICOM", "Intraop")))
+    with open(os.path.join(self.caseDirectory, "Notes", "README.txt")) as f:
+      self.assertEqual(f.read(), "edited")
+    self.assertFalse(os.path.exists(os.path.join(self.caseDirectory, CaseManifest.FILE_NAME)))
+
+  def testWithDirectoriesKeepsPlaceholdersAndManifestSetting(self):
+    layout = CaseLayout(directories=["DICOM/Preop"], placeholderFiles={"Notes/README.txt": "notes"},
+                        createManifest=False).withDirectories({""})
+    self.assertEqual(layout.directories, ["Notes"])
+    self.assertEqual(layout.placeholderFiles, {"Notes/README.txt": "notes"})
+    self.assertFalse(layout.createManifest)
+
+  def testCreateCasesKeepsOrder(self):
+    names = ["Case%03d-20170101" % number for number in range(1, 6)]
+    caseDirectories = CaseLayout(directories=["DICOM/Preop"]).createCases(self.rootDirectory, names, workers=3)
+    self.assertEqual(caseDirectories, [os.path.join(self.rootDirectory, name) for name in names])
+    for caseDirectory in caseDirectories:
+      self.assertTrue(os.path.isdir(os.path.join(caseDirectory, "DICOM", "Preop")))
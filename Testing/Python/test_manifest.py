@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from SlicerCaseManagerUtils.manifest import CaseManifest
+
+
+def writeFile(path, size=16):
+  with open(path, "wb") as f:
+    f.write(b"\x00" * size)
+  return path
+
+
+class CaseManifestTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.intraopDirectory = os.path.join(self.directory, "DICOM", "Intraop")
+    os.makedirs(self.intraopDirectory)
+    self.files = [writeFile(os.path.join(self.intraopDirectory, "%d.dcm" % number)) for number in range(3)]
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def recordAll(self, manifest):
+    for path in self.files:
+      manifest.record(path, "1: COVER PROSTATE")
+    manifest.save()
+
+  def testReloadedManifestReportsOnlyChangedFiles(self):
+    self.recordAll(CaseManifest(self.directory))
+    writeFile(self.files[1], size=32)
+    writeFile(os.path.join(self.intraopDirectory, "new.dcm"))
+    os.remove(self.files[2])
+    manifest = CaseManifest(self.directory)
+    changed, unchanged = manifest.scan(self.intraopDirectory)
+    self.assertEqual(changed, ["1.dcm", "new.dcm"])
+    self.assertEqual(unchanged, [("0.dcm", "1: COVER PROSTATE")])
+    self.assertTrue(manifest.modified)
+    self.assertIsNone(manifest.get(self.files[2]))
+
+  def testFailedWriteKeepsPreviousManifest(self):
+    manifest = CaseManifest(self.directory)
+    self.recordAll(manifest)
+    with open(manifest.path) as f:
+      saved = f.read()
+    manifest.record(self.files[0], "2: GUIDANCE", unserializable=object())
+    self.assertRaises(TypeError, manifest.save)
+    with open(manifest.path) as f:
+      self.assertEqual(f.read(), saved)
+    self.assertEqual(sorted(os.listdir(self.directory)), ["DICOM", CaseManifest.FILE_NAME])
+
+  def testRecoversFromCorruptManifest(self):
+    with open(os.path.join(self.directory, CaseManifest.FILE_NAME), "w") as f:
+      f.write('{"version": 1, "files": {')
+    manifest = CaseManifest(self.directory)
+    self.assertEqual(manifest.entries, {})
+    changed, unchanged = manifest.scan(self.intraopDirectory)
+    self.assertEqual((changed, unchanged), (["0.dcm", "1.dcm", "2.dcm"], []))
+    self.recordAll(manifest)
+    self.assertEqual(len(CaseManifest(self.directory).entries), 3)
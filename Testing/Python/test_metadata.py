@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from SlicerCaseManagerUtils.metadata import DICOMHeaderError, DICOMMetadataCache, HEADERTAGS, normalizeTag, \
+  readHeaderWithPydicom
+
+from syntheticDICOM import createValues, writeDICOMFile
+
+try:
+  import pydicom
+except ImportError:
+  pydicom = None
+
+
+class DICOMMetadataCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, "image.dcm")
+    writeDICOMFile(self.path, createValues(seriesNumber=5, description="T2 AX"))
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testNormalizeTag(self):
+    self.assertEqual(normalizeTag("(0008,103e)"), "0008,103E")
+    self.assertEqual(normalizeTag(0x0020000E), "0020,000E")
+
+  def testReadsRequestedTags(self):
+    cache = DICOMMetadataCache()
+    self.assertEqual(cache.getValue(self.path, HEADERTAGS.SERIES_DESCRIPTION), "T2 AX")
+    self.assertEqual(cache.getValue(self.path, HEADERTAGS.SERIES_NUMBER), "5")
+    self.assertEqual(cache.getValue(self.path, "0018,0050", default="missing"), "missing")
+
+  def testCachesUntilFileChanges(self):
+    cache = DICOMMetadataCache()
+    cache.getValues(self.path)
+    cache.getValues(self.path)
+    self.assertEqual((cache.hits, cache.misses), (1, 1))
+    writeDICOMFile(self.path, createValues(seriesNumber=6, description="T2 AX"), pixelBytes=1024)
+    self.assertEqual(cache.getValue(self.path, HEADERTAGS.SERIES_NUMBER), "6")
+    self.assertEqual(cache.misses, 2)
+
+  def testEvictsLeastRecentlyUsedEntries(self):
+    cache = DICOMMetadataCache(maxEntries=1)
+    otherPath = os.path.join(self.directory, "other.dcm")
+    writeDICOMFile(otherPath, createValues(instanceNumber=2))
+    cache.getValues(self.path)
+    cache.getValues(otherPath)
+    self.assertNotIn(self.path, cache)
+    self.assertEqual(cache.evictions, 1)
+
+  def testRaisesOrFallsBackOnUnparsableFiles(self):
+    path = os.path.join(self.directory, "broken.dcm")
+    with open(path, "wb") as f:
+      f.write(b"\x00" * 128 + b"DICM" + b"\x08\x00\x60\x00OB")
+    cache = DICOMMetadataCache()
+    self.assertRaises(DICOMHeaderError, cache.getValues, path)
+    cache.fallbackReader = lambda path, tags: {HEADERTAGS.MODALITY: "fallback"}
+    values = cache.getValues(path, [HEADERTAGS.MODALITY, HEADERTAGS.SERIES_NUMBER])
+    self.assertEqual(values[HEADERTAGS.MODALITY], "fallback")
+    self.assertEqual(values[HEADERTAGS.SERIES_NUMBER], "")
+
+  @unittest.skipIf(pydicom is None, "pydicom is not available")
+  def testPydicomFallbackReadsRequestedTags(self):
+    values = readHeaderWithPydicom(self.path, [HEADERTAGS.SERIES_DESCRIPTION, HEADERTAGS.SERIES_NUMBER, "0018,0050"])
+    self.assertEqual(values, {HEADERTAGS.SERIES_DESCRIPTION: "T2 AX", HEADERTAGS.SERIES_NUMBER: "5", "0018,0050": ""})
+
+  def testPydicomFallbackRaisesHeaderErrors(self):
+    path = os.path.join(self.directory, "empty.dcm")
+    open(path, "wb").close()
+    self.assertRaises(DICOMHeaderError, readHeaderWithPydicom, path, [HEADERTAGS.MODALITY])
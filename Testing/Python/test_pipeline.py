@@ -0,0 +1,161 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from SlicerCaseManagerUtils.metadata import DICOMMetadataCache, HEADERTAGS
+from SlicerCaseManagerUtils.pipeline import HeaderParsingPipeline, LocalStoreSCPStandIn, RateLimiter, ReceivePipeline
+
+from syntheticDICOM import createValues, writeDICOMFile
+
+
+class BlockingMetadataCache(DICOMMetadataCache):
+
+  def __init__(self):
+    DICOMMetadataCache.__init__(self)
+    self.entered = threading.Event()
+    self.release = threading.Event()
+
+  def getValues(self, path, tags=None, allowFallback=True):
+    self.entered.set()
+    self.release.wait(5)
+    return DICOMMetadataCache.getValues(self, path, tags, allowFallback)
+
+
+class HeaderParsingPipelineTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.files = []
+    for index in range(10):
+      path = os.path.join(self.directory, "%02d.dcm" % index)
+      writeDICOMFile(path, createValues(seriesNumber=index % 3 + 1, instanceNumber=index + 1))
+      self.files.append(path)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def collect(self, pipeline):
+    self.assertTrue(pipeline.wait(5))
+    return [result for batch in pipeline.poll() for result in batch]
+
+  def testDeliversBatchesInSubmissionOrder(self):
+    pipeline = HeaderParsingPipeline(DICOMMetadataCache(), batchSize=3, workers=3)
+    pipeline.submit(self.files)
+    results = self.collect(pipeline)
+    self.assertEqual([path for path, values in results], self.files)
+    self.assertEqual(results[4][1][HEADERTAGS.SERIES_NUMBER], "2")
+    self.assertTrue(pipeline.idle)
+    self.assertEqual((pipeline.submittedFiles, pipeline.deliveredFiles), (10, 10))
+
+  def testReportsUnreadableFiles(self):
+    missing = os.path.join(self.directory, "missing.dcm")
+    pipeline = HeaderParsingPipeline(DICOMMetadataCache(), batchSize=4, workers=2)
+    pipeline.submit(self.files[:2] + [missing])
+    results = dict(self.collect(pipeline))
+    self.assertIsInstance(results[missing], OSError)
+    self.assertIsInstance(results[self.files[0]], dict)
+
+  def testLeavesOutDuplicates(self):
+    pipeline = HeaderParsingPipeline(DICOMMetadataCache(), batchSize=4, workers=2,
+                                     deduplicator=lambda path, values: path.endswith("3.dcm"))
+    pipeline.submit(self.files)
+    results = self.collect(pipeline)
+    self.assertEqual(len(results), 9)
+    self.assertEqual((pipeline.deliveredFiles, pipeline.duplicateFiles), (10, 1))
+
+  def testCancelDropsPendingBatchesAndResetsCounters(self):
+    metadataCache = BlockingMetadataCache()
+    pipeline = HeaderParsingPipeline(metadataCache, batchSize=2, workers=1)
+    pipeline.submit(self.files)
+    self.assertTrue(metadataCache.entered.wait(5))
+    self.assertFalse(pipeline.cancel(timeout=0.05))
+    metadataCache.release.set()
+    self.assertTrue(pipeline.cancel(timeout=5))
+    self.assertTrue(pipeline.idle)
+    self.assertEqual(pipeline.poll(), [])
+    self.assertEqual((pipeline.submittedFiles, pipeline.deliveredFiles), (0, 0))
+    pipeline.submit(self.files[:3])
+    self.assertEqual([path for path, values in self.collect(pipeline)], self.files[:3])
+    self.assertEqual((pipeline.submittedFiles, pipeline.deliveredFiles), (3, 3))
+
+
+class ReceivePipelineTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.sourceDirectory = os.path.join(self.directory, "source")
+    self.incomingDirectory = os.path.join(self.directory, "incoming")
+    os.mkdir(self.sourceDirectory)
+    os.mkdir(self.incomingDirectory)
+    self.files = []
+    for index in range(12):
+      path = os.path.join(self.sourceDirectory, "%02d.dcm" % index)
+      writeDICOMFile(path, createValues(instanceNumber=index + 1))
+      self.files.append(path)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def drain(self, pipeline, delay=0.0, timeout=5):
+    batches = []
+    start = time.time()
+    while time.time() - start < timeout:
+      if delay:
+        time.sleep(delay)
+      batches += pipeline.poll(maxBatches=1)
+      if sum(len(batch.files) for batch in batches) == len(self.files) and pipeline.idle:
+        break
+    return batches
+
+  def testStoreSCPStandInIsThrottledByBoundedQueues(self):
+    pipeline = ReceivePipeline(DICOMMetadataCache(), maxQueueSize=1)
+    sender = LocalStoreSCPStandIn(self.files, self.incomingDirectory, pipeline, batchSize=2)
+    sender.start()
+    batches = self.drain(pipeline, delay=0.05)
+    sender.join(5)
+    received = [path for batch in batches for path, values in batch.results]
+    self.assertEqual([os.path.basename(path) for path in received], [os.path.basename(f) for f in self.files])
+    self.assertTrue(all(path.startswith(self.incomingDirectory) for path in received))
+    self.assertGreater(sender.blockedTime, 0.05)
+    statistics = pipeline.getStatistics()
+    self.assertEqual((statistics["batches"], statistics["files"]), (6, 12))
+    self.assertTrue(pipeline.idle)
+
+  def testOfferWithoutWaitingRejectsWhenFull(self):
+    pipeline = ReceivePipeline(DICOMMetadataCache(), maxQueueSize=1)
+    offered = [pipeline.offer([path], timeout=0) for path in self.files[:6]]
+    self.assertIn(False, offered)
+    self.assertEqual(pipeline.getStatistics()["rejectedBatches"], offered.count(False))
+
+  def testCancelDropsQueuedBatches(self):
+    pipeline = ReceivePipeline(DICOMMetadataCache(), maxQueueSize=1)
+    sender = LocalStoreSCPStandIn(self.files, self.incomingDirectory, pipeline, batchSize=2)
+    sender.start()
+    time.sleep(0.1)
+    self.assertTrue(pipeline.cancel(timeout=5))
+    pipeline.resetStatistics()
+    sender.join(5)
+    self.assertTrue(pipeline.cancel(timeout=5))
+    self.assertEqual(pipeline.poll(), [])
+    self.assertTrue(pipeline.idle)
+    pipeline.offer(self.files[:3])
+    batches = []
+    start = time.time()
+    while not batches and time.time() - start < 5:
+      batches = pipeline.poll()
+    self.assertEqual(batches[0].files, self.files[:3])
+    self.assertEqual(pipeline.getStatistics()["files"], 3)
+
+
+class RateLimiterTest(unittest.TestCase):
+
+  def testLimitsUnlessForced(self):
+    limiter = RateLimiter(60)
+    self.assertTrue(limiter.ready())
+    self.assertFalse(limiter.ready())
+    self.assertTrue(limiter.ready(force=True))
+    limiter.reset()
+    self.assertTrue(limiter.ready())
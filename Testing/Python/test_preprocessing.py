@@ -0,0 +1,104 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from SlicerCaseManagerUtils.metadata import DICOMMetadataCache
+from SlicerCaseManagerUtils.preprocessing import PreopPreprocessor
+
+from syntheticDICOM import createValues, writeDICOMFile
+
+FAKE_CONVERTER = """
+import json, sys
+with open(sys.argv[1]) as f:
+  job = json.load(f)
+with open(job["outputFile"], "w") as f:
+  f.write("%d files" % len(job["files"]))
+"""
+
+SLOW_CONVERTER = """
+import json, sys, time
+time.sleep(30)
+with open(sys.argv[1]) as f:
+  job = json.load(f)
+with open(job["outputFile"], "w") as f:
+  f.write("%d files" % len(job["files"]))
+"""
+
+
+class BlockingMetadataCache(DICOMMetadataCache):
+
+  def __init__(self):
+    DICOMMetadataCache.__init__(self)
+    self.released = threading.Event()
+
+  def getValues(self, path, *args, **kwargs):
+    self.released.wait(10)
+    return DICOMMetadataCache.getValues(self, path, *args, **kwargs)
+
+
+class PreopPreprocessorTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.outputDirectory = os.path.join(self.directory, "mpReviewPreprocessed")
+    self.command = [sys.executable, "-c", FAKE_CONVERTER]
+    self.files = []
+    for seriesNumber, description in ((1, "T2 SAG"), (2, "T2 AX")):
+      for instanceNumber in range(3):
+        path = os.path.join(self.directory, "%d-%d.dcm" % (seriesNumber, instanceNumber))
+        writeDICOMFile(path, createValues(seriesNumber, instanceNumber + 1, description))
+        self.files.append(path)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testConvertsSeriesInBackground(self):
+    preprocessor = PreopPreprocessor(self.outputDirectory, self.command, metadataCache=DICOMMetadataCache(), workers=2)
+    preprocessor.start(self.files, "T2.*AX|AX.*T2")
+    results = preprocessor.wait()
+    self.assertFalse(preprocessor.running)
+    self.assertEqual(preprocessor.total, 2)
+    self.assertEqual([result["error"] for result in results], [None, None])
+    self.assertTrue(preprocessor.isFirstRequiredSeriesReady())
+    self.assertEqual(preprocessor.getFirstReadyStudyDirectory(),
+                     os.path.join(self.outputDirectory, "SYN00001", "20170101_130000"))
+    with open(preprocessor.series[next(iter(preprocessor.requiredSeries))]["outputFile"]) as f:
+      self.assertEqual(f.read(), "3 files")
+
+  def testSkipsUnchangedSeries(self):
+    for expected in ([False, False], [True, True]):
+      preprocessor = PreopPreprocessor(self.outputDirectory, self.command, metadataCache=DICOMMetadataCache())
+      preprocessor.start(self.files)
+      self.assertEqual([result["skipped"] for result in preprocessor.wait()], expected)
+
+  def testCancelTerminatesConverters(self):
+    preprocessor = PreopPreprocessor(self.outputDirectory, [sys.executable, "-c", SLOW_CONVERTER],
+                                     metadataCache=DICOMMetadataCache(), workers=1)
+    preprocessor.start(self.files)
+    deadline = time.time() + 10
+    while not preprocessor._processes and time.time() < deadline:
+      time.sleep(0.01)
+    processes = list(preprocessor._processes)
+    self.assertEqual(len(processes), 1)
+    preprocessor.cancel()
+    self.assertFalse(preprocessor.running)
+    for process in processes:
+      self.assertIsNotNone(process.wait(5))
+    time.sleep(0.2)
+    self.assertFalse(preprocessor._processes)
+    self.assertEqual(preprocessor.poll(), [])
+    self.assertFalse(any(os.path.exists(s["outputFile"]) for s in preprocessor.series.values()))
+
+  def testCancelBeforeGroupingStartsNoConverters(self):
+    metadataCache = BlockingMetadataCache()
+    preprocessor = PreopPreprocessor(self.outputDirectory, self.command, metadataCache=metadataCache)
+    preprocessor.start(self.files)
+    preprocessor.cancel()
+    metadataCache.released.set()
+    self.assertEqual(preprocessor.wait(), [])
+    self.assertFalse(preprocessor.running)
+    self.assertEqual(preprocessor.total, 0)
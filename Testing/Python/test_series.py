@@ -0,0 +1,58 @@
+import os
+import unittest
+
+from SlicerCaseManagerUtils.series import SeriesFileIndex, SeriesRegistry
+
+
+class SeriesFileIndexTest(unittest.TestCase):
+
+  def testMovesFilesBetweenSeries(self):
+    index = SeriesFileIndex()
+    self.assertTrue(index.add("1: COVER PROSTATE", "/a.dcm"))
+    self.assertFalse(index.add("1: COVER PROSTATE", "/a.dcm"))
+    index.add("1: COVER PROSTATE", "/b.dcm")
+    index.add("2: GUIDANCE", "/a.dcm")
+    self.assertEqual(index.getFiles("1: COVER PROSTATE"), ["/b.dcm"])
+    self.assertEqual(index.getSeries("/a.dcm"), "2: GUIDANCE")
+    self.assertEqual(index.remove("/b.dcm"), "1: COVER PROSTATE")
+    self.assertEqual(list(index), ["2: GUIDANCE"])
+    self.assertEqual(index.fileCount(), 1)
+
+
+class SeriesRegistryTest(unittest.TestCase):
+
+  def setUp(self):
+    self.registry = SeriesRegistry()
+    self.notifications = []
+    self.registry.addListener(lambda added, changed: self.notifications.append((added, changed)))
+
+  def testKeepsSeriesOrderedByNumber(self):
+    for series in ("10: GUIDANCE", "2: COVER TEMPLATE", "1: COVER PROSTATE", "2: COVER PROSTATE"):
+      self.registry.add(series)
+    self.assertEqual(list(self.registry), ["1: COVER PROSTATE", "2: COVER TEMPLATE", "2: COVER PROSTATE",
+                                           "10: GUIDANCE"])
+    self.assertEqual(self.registry.index("2: COVER PROSTATE"), 2)
+    self.assertIn("10: GUIDANCE", self.registry)
+    self.assertRaises(ValueError, self.registry.index, "3: GUIDANCE")
+
+  def testFlushReportsDeltaOnly(self):
+    self.registry.add("3: GUIDANCE")
+    self.registry.add("1: COVER PROSTATE")
+    self.registry.add("3: GUIDANCE")
+    self.registry.flush()
+    self.assertEqual(self.notifications, [([(0, "1: COVER PROSTATE"), (1, "3: GUIDANCE")], [])])
+    self.registry.add("3: GUIDANCE")
+    self.registry.add("2: COVER TEMPLATE")
+    self.registry.flush()
+    self.assertEqual(self.notifications[1], ([(1, "2: COVER TEMPLATE")], ["3: GUIDANCE"]))
+    self.registry.flush()
+    self.assertEqual(len(self.notifications), 2)
+
+  def testInsertingAddedSeriesReproducesOrder(self):
+    model = []
+    self.registry.addListener(lambda added, changed: [model.insert(index, series) for index, series in added])
+    for batch in (["5: A", "1: B"], ["3: C", "9: D", "2: E"], ["4: F"]):
+      for series in batch:
+        self.registry.add(series)
+      self.registry.flush()
+    self.assertEqual(model, list(self.registry))
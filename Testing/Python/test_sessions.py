@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from SlicerCaseManagerUtils.sessions import SessionIndex, SessionStore
+
+
+class SessionStoreTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.sessionDirectory = os.path.join(self.directory, "MRgBiopsy")
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def writeLegacyDocument(self, data):
+    if not os.path.exists(self.sessionDirectory):
+      os.makedirs(self.sessionDirectory)
+    with open(os.path.join(self.sessionDirectory, SessionStore.LEGACY_FILE_NAME), "w") as f:
+      json.dump(data, f)
+
+  def countRecords(self, store):
+    return len(list(store.readRecords()))
+
+  def testMissingSession(self):
+    store = SessionStore(self.sessionDirectory)
+    self.assertIsNone(store.isCompleted())
+    self.assertIsNone(store.loadDocument())
+
+  def testAppendAndLoad(self):
+    store = SessionStore(self.sessionDirectory)
+    store.append("results", {"name": "1: COVER PROSTATE"}, key="1")
+    store.append("results", {"name": "2: GUIDANCE"}, key="2")
+    store.append("results", {"name": "1: COVER PROSTATE", "status": "approved"}, key="1")
+    store.setCompleted()
+    header, records = SessionStore(self.sessionDirectory).load()
+    self.assertTrue(header["completed"])
+    self.assertEqual(records["results"], [{"name": "1: COVER PROSTATE", "status": "approved"},
+                                          {"name": "2: GUIDANCE"}])
+
+  def testReadingLegacyHeaderDoesNotWrite(self):
+    self.writeLegacyDocument({"completed": True, "results": [{"name": "1"}], "usePreopData": True})
+    store = SessionStore(self.sessionDirectory)
+    self.assertTrue(store.isCompleted())
+    self.assertEqual(store.readHeader()["counts"], {"results": 1})
+    self.assertEqual(os.listdir(self.sessionDirectory), [SessionStore.LEGACY_FILE_NAME])
+
+  def testMigratesLegacyDocumentOnce(self):
+    self.writeLegacyDocument({"completed": False, "results": [{"name": "1"}, {"name": "2"}], "usePreopData": True})
+    store = SessionStore(self.sessionDirectory)
+    self.assertEqual(store.loadDocument(), {"completed": False, "results": [{"name": "1"}, {"name": "2"}],
+                                            "usePreopData": True})
+    self.assertFalse(store.isLegacyDocumentNewer())
+    store.append("targets", {"name": "T1"})
+    self.assertEqual(SessionStore(self.sessionDirectory).load()[1]["targets"], [{"name": "T1"}])
+
+  def testRemigratesRewrittenLegacyDocument(self):
+    self.writeLegacyDocument({"completed": False, "results": [{"name": "1"}]})
+    SessionStore(self.sessionDirectory).loadDocument()
+    legacyPath = os.path.join(self.sessionDirectory, SessionStore.LEGACY_FILE_NAME)
+    self.writeLegacyDocument({"completed": True, "results": [{"name": "1"}, {"name": "2"}]})
+    os.utime(legacyPath, (time.time() + 10, time.time() + 10))
+    self.assertEqual(SessionStore(self.sessionDirectory).loadDocument()["results"], [{"name": "1"}, {"name": "2"}])
+
+  def testSaveDocumentAppendsChangedItemsOnly(self):
+    store = SessionStore(self.sessionDirectory)
+    document = {"completed": False, "results": [{"name": "1"}, {"name": "2"}], "usePreopData": False}
+    store.saveDocument(document)
+    self.assertEqual(self.countRecords(store), 2)
+    document["results"].append({"name": "3"})
+    document["results"][0] = {"name": "1", "status": "approved"}
+    store.saveDocument(document, changedItems={"results": [0]})
+    self.assertEqual(self.countRecords(store), 4)
+    store.saveDocument(document)
+    self.assertEqual(self.countRecords(store), 4)
+    self.assertEqual(SessionStore(self.sessionDirectory).loadDocument(), document)
+
+  def testSaveDocumentCompactsRecords(self):
+    store = SessionStore(self.sessionDirectory)
+    document = {"completed": False, "results": [{"name": "1"}, {"name": "2"}]}
+    store.saveDocument(document)
+    for revision in range(SessionStore.MIN_COMPACTION_LINES):
+      document["results"][revision % 2] = {"name": str(revision % 2 + 1), "revision": revision}
+      store.saveDocument(document, changedItems={"results": [revision % 2]})
+    self.assertLessEqual(self.countRecords(store), SessionStore.MIN_COMPACTION_LINES)
+    self.assertEqual(SessionStore(self.sessionDirectory).loadDocument(), document)
+
+  def testSaveDocumentShrinksLists(self):
+    store = SessionStore(self.sessionDirectory)
+    store.saveDocument({"results": [{"name": "1"}, {"name": "2"}]})
+    store.saveDocument({"results": [{"name": "1"}], "completed": True})
+    reopened = SessionStore(self.sessionDirectory)
+    self.assertEqual(reopened.loadDocument(), {"results": [{"name": "1"}], "completed": True})
+    reopened.saveDocument({"results": [{"name": "1"}, {"name": "2b"}], "completed": True})
+    self.assertEqual(SessionStore(self.sessionDirectory).loadDocument()["results"], [{"name": "1"}, {"name": "2b"}])
+
+
+class SessionIndexTest(unittest.TestCase):
+
+  def setUp(self):
+    self.outputDirectory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.outputDirectory)
+
+  def createStore(self, sessionDirectory):
+    return SessionStore(os.path.join(sessionDirectory, "MRgBiopsy"))
+
+  def writeSession(self, name, completed=False, legacy=False, modifiedTime=None):
+    sessionDirectory = os.path.join(self.outputDirectory, name)
+    store = self.createStore(sessionDirectory)
+    if legacy:
+      os.makedirs(store.directory)
+      with open(store.legacyPath, "w") as f:
+        json.dump({"completed": completed, "results": [{"name": "1"}]}, f)
+      if modifiedTime:
+        os.utime(store.legacyPath, (modifiedTime, modifiedTime))
+    else:
+      store.saveDocument({"completed": completed, "results": [{"name": "1"}, {"name": "2"}]})
+    return sessionDirectory
+
+  def testSynchronizeAddsAndRemovesSessions(self):
+    first = self.writeSession("first")
+    index = SessionIndex(self.outputDirectory)
+    self.assertTrue(index.synchronize(self.createStore))
+    self.assertEqual([d for d, entry in index.getSessions()], [first])
+    self.assertEqual(index.getSessions()[0][1]["registrations"], 2)
+    second = self.writeSession("second", legacy=True)
+    os.makedirs(os.path.join(self.outputDirectory, "unsaved", "MRgBiopsy"))
+    shutil.rmtree(first)
+    index = SessionIndex(self.outputDirectory)
+    self.assertTrue(index.synchronize(self.createStore))
+    self.assertEqual([d for d, entry in index.getSessions()], [second])
+    self.assertFalse(SessionIndex(self.outputDirectory).synchronize(self.createStore))
+
+  def testOrdersSessionsByModificationTime(self):
+    older = self.writeSession("b-older", legacy=True, modifiedTime=time.time() - 3600)
+    newer = self.writeSession("a-newer", legacy=True, modifiedTime=time.time() - 60)
+    index = SessionIndex(self.outputDirectory)
+    index.synchronize(self.createStore)
+    self.assertEqual([d for d, entry in index.getSessions()], [newer, older])
+    self.createStore(older).loadDocument()
+    index.invalidate()
+    index.synchronize(self.createStore)
+    self.assertEqual(index.getLatestSession()[0], newer)
+
+  def testSynchronizeWithoutSaving(self):
+    self.writeSession("first", completed=True)
+    index = SessionIndex(self.outputDirectory)
+    index.synchronize(self.createStore, save=False)
+    self.assertTrue(index.getLatestSession()[1]["completed"])
+    self.assertFalse(os.path.exists(index.path))
@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from SlicerCaseManagerUtils.storage import CaseSizeAccount
+
+
+def writeFile(path, size):
+  if not os.path.exists(os.path.dirname(path)):
+    os.makedirs(os.path.dirname(path))
+  with open(path, "wb") as f:
+    f.write(b"\x00" * size)
+
+
+class CaseSizeAccountTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testNewCaseStartsIncomplete(self):
+    account = CaseSizeAccount(self.directory)
+    self.assertFalse(account.complete)
+    writeFile(os.path.join(self.directory, "SliceTrackerOutputs", "session", "results.json"), 100)
+    self.assertEqual(account.getTotalSize(), 100)
+    self.assertTrue(account.complete)
+
+  def testRecordsFilesAndDirectories(self):
+    account = CaseSizeAccount(self.directory)
+    account.getTotalSize()
+    dicomFile = os.path.join(self.directory, "DICOM", "Intraop", "1.dcm")
+    writeFile(dicomFile, 10)
+    account.record(dicomFile)
+    outputDirectory = os.path.join(self.directory, "mpReviewPreprocessed")
+    writeFile(os.path.join(outputDirectory, "a.nrrd"), 20)
+    writeFile(os.path.join(outputDirectory, "b.nrrd"), 30)
+    account.recordDirectory(outputDirectory)
+    self.assertEqual(account.getTotalSize(), 60)
+    os.remove(os.path.join(outputDirectory, "b.nrrd"))
+    account.recordDirectory(outputDirectory)
+    account.save()
+    reloaded = CaseSizeAccount(self.directory)
+    self.assertTrue(reloaded.complete)
+    self.assertEqual(reloaded.getTotalSize(), 30)
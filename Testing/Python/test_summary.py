@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from SlicerCaseManagerUtils.metadata import DICOMMetadataCache
+from SlicerCaseManagerUtils.summary import CaseSummaryLoader
+
+from syntheticDICOM import createValues, writeDICOMFile
+
+
+def collectResults(loader, timeout=5):
+  results = []
+  start = time.time()
+  while time.time() - start < timeout:
+    results += loader.poll()
+    if loader.idle:
+      return results
+    time.sleep(0.005)
+  raise AssertionError("Case summary loader did not finish within %d s" % timeout)
+
+
+class CaseSummaryLoaderTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.caseDirectories = []
+    for caseNumber in (1, 2):
+      caseDirectory = os.path.join(self.directory, "Case%03d-2017010%d" % (caseNumber, caseNumber))
+      os.makedirs(os.path.join(caseDirectory, "DICOM", "Preop"))
+      writeDICOMFile(os.path.join(caseDirectory, "DICOM", "Preop", "1.dcm"), createValues())
+      self.caseDirectories.append(caseDirectory)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testLoadsSummaries(self):
+    loader = CaseSummaryLoader(completionResolver=lambda caseDirectory: False, metadataCache=DICOMMetadataCache())
+    loader.request(self.caseDirectories)
+    results = collectResults(loader)
+    self.assertEqual([caseDirectory for caseDirectory, stamp, summary in results], self.caseDirectories)
+    summary = results[0][2]
+    self.assertEqual((summary["patientID"], summary["studyDate"], summary["caseDate"], summary["completed"]),
+                     ("SYN00001", "20170101", "20170101", False))
+    self.assertGreater(summary["diskSize"], 0)
+
+  def testSkipsCasesWithKnownStamp(self):
+    loader = CaseSummaryLoader(metadataCache=DICOMMetadataCache())
+    loader.request(self.caseDirectories)
+    stamps = dict((caseDirectory, stamp) for caseDirectory, stamp, summary in collectResults(loader))
+    os.utime(self.caseDirectories[1], (0, 0))
+    loader.request(self.caseDirectories, knownStamps=stamps)
+    self.assertEqual([caseDirectory for caseDirectory, stamp, summary in collectResults(loader)],
+                     [self.caseDirectories[1]])
+
+  def testDropsResultsOfCancelledRequests(self):
+    entered = threading.Event()
+    released = threading.Event()
+
+    def completionResolver(caseDirectory):
+      entered.set()
+      released.wait(5)
+      return True
+
+    loader = CaseSummaryLoader(completionResolver=completionResolver, metadataCache=DICOMMetadataCache())
+    loader.request(self.caseDirectories)
+    self.assertTrue(entered.wait(5))
+    loader.cancel()
+    released.set()
+    self.assertEqual(collectResults(loader), [])
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from SlicerCaseManagerUtils.volumes import VolumeCache, VolumePrefetcher
+
+
+class VolumeCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.released = []
+    self.cache = VolumeCache(100, sizeOf=lambda volume: volume["size"], release=self.released.append)
+
+  def createVolume(self, name, size):
+    return {"name": name, "size": size}
+
+  def testEvictsLeastRecentlyUsedUnpinnedVolumes(self):
+    for name in ("a", "b", "c"):
+      self.cache.put(name, self.createVolume(name, 40))
+    self.assertEqual([volume["name"] for volume in self.released], ["a"])
+    self.cache.get("b")
+    self.cache.put("d", self.createVolume("d", 40))
+    self.assertEqual([volume["name"] for volume in self.released], ["a", "c"])
+    self.assertEqual(self.cache.residentSize, 80)
+    self.assertEqual(self.cache.evictions, 2)
+
+  def testNeverEvictsPinnedOrAddedVolume(self):
+    self.cache.pin("approved")
+    self.cache.put("approved", self.createVolume("approved", 80))
+    self.cache.put("displayed", self.createVolume("displayed", 60))
+    self.assertEqual(self.released, [])
+    self.assertIn("displayed", self.cache)
+    self.cache.put("next", self.createVolume("next", 10))
+    self.assertEqual([volume["name"] for volume in self.released], ["displayed"])
+    self.cache.unpin("approved")
+    self.cache.setMemoryBudget(50)
+    self.assertEqual([volume["name"] for volume in self.released], ["displayed", "approved"])
+    self.assertEqual(self.cache.getStatistics()["volumes"], 1)
+
+  def testShrinkingBudgetReleasesVolumes(self):
+    self.cache.put("a", self.createVolume("a", 50))
+    self.cache.put("b", self.createVolume("b", 50))
+    self.cache.setMemoryBudget(60)
+    self.assertEqual([volume["name"] for volume in self.released], ["a"])
+
+
+class VolumePrefetcherTest(unittest.TestCase):
+
+  def testPrefetchesReadableFiles(self):
+    directory = tempfile.mkdtemp()
+    try:
+      files = [os.path.join(directory, "%d.dcm" % index) for index in range(3)]
+      for path in files[:2]:
+        with open(path, "wb") as f:
+          f.write(b"\x00" * 1024)
+      prefetcher = VolumePrefetcher()
+      prefetcher.prefetch(files)
+      prefetcher._thread.join(5)
+      self.assertEqual(prefetcher.prefetchedFiles, 2)
+      prefetcher.cancel()
+      self.assertFalse(prefetcher.running)
+    finally:
+      shutil.rmtree(directory)
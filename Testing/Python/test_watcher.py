@@ -0,0 +1,40 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from SlicerCaseManagerUtils.watcher import DirectoryWatcher
+
+
+def writeFile(path, modifiedTime=None):
+  with open(path, "wb") as f:
+    f.write(b"\x00" * 16)
+  if modifiedTime is not None:
+    os.utime(path, (modifiedTime, modifiedTime))
+  return path
+
+
+class DirectoryWatcherTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.existingFiles = [writeFile(os.path.join(self.directory, "%d.dcm" % number)) for number in range(3)]
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testExistingFilesCanBeClaimedOnce(self):
+    watcher = DirectoryWatcher([self.directory], usePolling=True)
+    watcher.start()
+    self.assertEqual(sorted(watcher.claim(self.existingFiles)), self.existingFiles)
+    self.assertEqual(watcher.claim(self.existingFiles), [])
+
+  def testReportsOnlyNewFiles(self):
+    watcher = DirectoryWatcher([self.directory], settleTime=0.0, scanInterval=0.0, usePolling=True)
+    watcher.start()
+    newFile = writeFile(os.path.join(self.directory, "new.dcm"), time.time() - 10)
+    writeFile(os.path.join(self.directory, "ignored.partial"), time.time() - 10)
+    self.assertEqual(watcher.poll(), [newFile])
+    self.assertEqual(watcher.claim([newFile] + self.existingFiles[:1]), self.existingFiles[:1])
+    self.assertEqual(watcher.poll(), [])